@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Declarative vital-sign alert rules.
+
+Rules are loaded from alert_rules.json and compiled into incremental evaluators
+that are fed one reading at a time. Windowed conditions keep O(1) amortized
+state per reading regardless of window length:
+
+    "spo2Avg < 92 for 30s"          condition must hold continuously for 30 s
+    "heartRateAvg rise > 30 in 60s" value rose by more than 30 within 60 s
+    "heartRateAvg drop > 30 in 60s" value fell by more than 30 within 60 s
+    "avg spo2 < 92 over 30s"        30 s moving average below 92
+    "fallDetected"                  flag is set
+
+Per-patient overrides replace any field of a named rule.
+"""
+import os
+import re
+import json
+import time
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+ALERT_RULES_FILE = 'alert_rules.json'
+
+# Vital signs published as 0 when there is no valid reading (see signal_quality.py)
+ZERO_MEANS_NO_READING = {"heartRate", "heartRateAvg", "spo2", "spo2Avg"}
+
+OPERATORS = {
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b
+}
+
+_number = r'(-?\d+(?:\.\d+)?)'
+_duration = r'(\d+(?:\.\d+)?)\s*(?:s|sec|secs|seconds?)?'
+_threshold_re = re.compile(r'^(\w+)\s*(>=|<=|==|!=|>|<)\s*' + _number + r'(?:\s+for\s+' + _duration + r')?$')
+_change_re = re.compile(r'^(\w+)\s+(rise|drop)\s*>\s*' + _number + r'\s+in\s+' + _duration + r'$')
+_average_re = re.compile(r'^avg\s+(\w+)\s*(>=|<=|>|<)\s*' + _number + r'\s+over\s+' + _duration + r'$')
+_flag_re = re.compile(r'^(\w+)$')
+
+
+def coerce_flag(value):
+    """Interpret bool/number/string flags such as fallDetected"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return value > 0
+    if isinstance(value, str):
+        return value.strip().lower() in ('yes', 'yes!', 'true', '1', 'y')
+    return False
+
+
+def parse_condition(text):
+    """Turn a condition string into rule fields"""
+    text = ' '.join(text.split())
+    match = _threshold_re.match(text)
+    if match:
+        field, op, value, duration = match.groups()
+        return {"type": "threshold", "field": field, "op": op, "value": float(value),
+                "for": float(duration) if duration else 0.0}
+    match = _change_re.match(text)
+    if match:
+        field, direction, value, window = match.groups()
+        return {"type": direction, "field": field, "value": float(value), "within": float(window)}
+    match = _average_re.match(text)
+    if match:
+        field, op, value, window = match.groups()
+        return {"type": "average", "field": field, "op": op, "value": float(value), "over": float(window)}
+    match = _flag_re.match(text)
+    if match:
+        return {"type": "flag", "field": match.group(1)}
+    raise ValueError(f"Unrecognised alert condition: {text!r}")
+
+
+class RuleEvaluator:
+    """Base class: tracks cooldown and valid-reading gating for one rule"""
+
+    def __init__(self, rule):
+        self.rule = rule
+        self.name = rule["name"]
+        self.field = rule["field"]
+        self.cooldown = float(rule.get("cooldown", 0))
+        self.require_valid = rule.get("require_valid", True)
+        # Values at or below min_valid mean "no reading" (e.g. HR 0 while the sensor settles)
+        self.min_valid = rule.get("min_valid")
+        self.last_fired = 0.0
+
+    def value_of(self, reading):
+        value = reading.get(self.field)
+        if value is None:
+            return None
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+        if self.min_valid is not None and value <= self.min_valid:
+            return None
+        if value == 0 and self.field in ZERO_MEANS_NO_READING:
+            return None
+        return value
+
+    def update(self, value, now):
+        """Feed one value; return the value that triggered, or None"""
+        raise NotImplementedError
+
+    def reset(self):
+        pass
+
+    def evaluate(self, reading, now):
+        if self.require_valid and not reading.get('validReadings', False):
+            self.reset()
+            return None
+        value = self.value_of(reading)
+        if value is None:
+            self.reset()
+            return None
+        triggered = self.update(value, now)
+        if triggered is None or now - self.last_fired <= self.cooldown:
+            return None
+        self.last_fired = now
+        return triggered
+
+
+class ThresholdEvaluator(RuleEvaluator):
+    """value <op> threshold, optionally held continuously for a duration"""
+
+    def __init__(self, rule):
+        super().__init__(rule)
+        self.compare = OPERATORS[rule.get("op", ">")]
+        self.threshold = float(rule["value"])
+        self.duration = float(rule.get("for", 0))
+        self.since = None
+
+    def reset(self):
+        self.since = None
+
+    def update(self, value, now):
+        if not self.compare(value, self.threshold):
+            self.since = None
+            return None
+        if self.since is None:
+            self.since = now
+        return value if now - self.since >= self.duration else None
+
+
+class FlagEvaluator(RuleEvaluator):
+    """Boolean field is set"""
+
+    def value_of(self, reading):
+        return 1.0 if coerce_flag(reading.get(self.field)) else 0.0
+
+    def update(self, value, now):
+        return True if value else None
+
+
+class ChangeEvaluator(RuleEvaluator):
+    """Rise (or drop) larger than value within a time window.
+
+    A monotonic deque keeps the window minimum (or maximum) so each reading
+    costs amortized O(1) however long the window is.
+    """
+
+    def __init__(self, rule):
+        super().__init__(rule)
+        self.rising = rule["type"] == "rise"
+        self.delta = float(rule["value"])
+        self.window = float(rule["within"])
+        self.extremes = deque()
+
+    def reset(self):
+        self.extremes.clear()
+
+    def update(self, value, now):
+        extremes = self.extremes
+        while extremes and now - extremes[0][0] > self.window:
+            extremes.popleft()
+        # Drop entries that can never again be the window minimum/maximum
+        if self.rising:
+            while extremes and extremes[-1][1] >= value:
+                extremes.pop()
+        else:
+            while extremes and extremes[-1][1] <= value:
+                extremes.pop()
+        extremes.append((now, value))
+
+        change = value - extremes[0][1] if self.rising else extremes[0][1] - value
+        return change if change > self.delta else None
+
+
+class AverageEvaluator(RuleEvaluator):
+    """Moving average over a time window compared against a threshold"""
+
+    def __init__(self, rule):
+        super().__init__(rule)
+        self.compare = OPERATORS[rule.get("op", "<")]
+        self.threshold = float(rule["value"])
+        self.window = float(rule["over"])
+        self.samples = deque()
+        self.total = 0.0
+
+    def reset(self):
+        self.samples.clear()
+        self.total = 0.0
+
+    def update(self, value, now):
+        self.samples.append((now, value))
+        self.total += value
+        while now - self.samples[0][0] > self.window:
+            self.total -= self.samples.popleft()[1]
+        # Only judge once the window is (nearly) full
+        if now - self.samples[0][0] < self.window * 0.9:
+            return None
+        average = self.total / len(self.samples)
+        return average if self.compare(average, self.threshold) else None
+
+
+EVALUATORS = {
+    "threshold": ThresholdEvaluator,
+    "flag": FlagEvaluator,
+    "rise": ChangeEvaluator,
+    "drop": ChangeEvaluator,
+    "average": AverageEvaluator
+}
+
+
+def compile_rule(rule):
+    """Expand a 'when' condition string and build its evaluator"""
+    rule = dict(rule)
+    if "when" in rule:
+        parsed = parse_condition(rule["when"])
+        # Explicit fields in the rule win over the parsed condition
+        for key, value in parsed.items():
+            rule.setdefault(key, value)
+    rule.setdefault("type", "threshold")
+    if rule["type"] not in EVALUATORS:
+        raise ValueError(f"Unknown rule type {rule['type']!r} in rule {rule.get('name')!r}")
+    return EVALUATORS[rule["type"]](rule)
+
+
+class RuleSet:
+    """Rule definitions plus per-patient overrides"""
+
+    def __init__(self, rules, patients=None):
+        self.rules = rules
+        self.patients = patients or {}
+
+    @classmethod
+    def load(cls, path=ALERT_RULES_FILE, default_rules=None):
+        """Load rules from a JSON file, falling back to default_rules"""
+        try:
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    config = json.load(f)
+                logger.info(f"Loaded {len(config.get('rules', []))} alert rules from {path}")
+                return cls(config.get('rules', []), config.get('patients', {}))
+        except Exception as e:
+            logger.error(f"Error loading alert rules: {e}")
+        return cls(default_rules or [])
+
+    def rules_for(self, patient_id=None):
+        overrides = self.patients.get(str(patient_id), {}) if patient_id is not None else {}
+        rules = []
+        for rule in self.rules:
+            override = overrides.get(rule["name"])
+            if override is False or (override and override.get("enabled") is False):
+                continue
+            merged = dict(rule)
+            if override:
+                # Explicit fields such as "value" take precedence over the parsed "when"
+                merged.update(override)
+            rules.append(merged)
+        return rules
+
+    def engine_for(self, patient_id=None):
+        return AlertRuleEngine(self.rules_for(patient_id))
+
+
+class AlertRuleEngine:
+    """Compiled rules with their incremental state for one patient"""
+
+    def __init__(self, rules):
+        self.evaluators = [compile_rule(rule) for rule in rules]
+
+    def evaluate(self, reading, now=None):
+        """Feed one reading; return [(rule, value)] for rules that fired"""
+        now = now if now is not None else reading.get('last_updated') or time.time()
+        fired = []
+        for evaluator in self.evaluators:
+            try:
+                value = evaluator.evaluate(reading, now)
+            except Exception as e:
+                logger.error(f"Error evaluating alert rule {evaluator.name}: {e}")
+                continue
+            if value is not None:
+                fired.append((evaluator.rule, value))
+        return fired
@@ -29,6 +29,7 @@ long timeInMicro;
 int distanceInCm;
 unsigned long lastBeepTime = 0;
 bool ultrasonicEnabled = true;  // Enable/disable obstacle detection
+bool imuStreamEnabled = true;   // Forward raw IMU batches from the mix device
 
 // Auto brightness settings
 #define MIN_BRIGHTNESS 0    // Minimum display brightness (0-255)
@@ -249,11 +250,31 @@ typedef struct sensor_readings {
 // Create a sensor readings object
 sensor_readings receivedData;
 
+// Raw IMU batch (must match sender)
+#define IMU_BATCH 10
+typedef struct imu_batch {
+  uint32_t startMillis;
+  uint16_t intervalMs;
+  uint16_t count;
+  int16_t samples[IMU_BATCH][6];
+} imu_batch;
+
+imu_batch receivedIMU;
+
 // Flag for new data received
 bool newDataReceived = false;
 
 // Callback function that will be executed when data is received
 void OnDataRecv(const esp_now_recv_info_t* esp_now_info, const uint8_t *incomingData, int len) {
+    // The two packet types are told apart by size
+    if (len == sizeof(imu_batch)) {
+        memcpy(&receivedIMU, incomingData, sizeof(imu_batch));
+        if (imuStreamEnabled) {
+            sendIMUData();
+        }
+        return;
+    }
+    
     memcpy(&receivedData, incomingData, sizeof(sensor_readings));
     newDataReceived = true;
     
@@ -516,6 +537,31 @@ void processCommand(String command) {
         return;
     }
     
+    // Handle scheduled reminder pushed by the web server: reminder Name|Status
+    if (command.startsWith("reminder ")) {
+        String reminderData = command.substring(9);
+        int statusPos = reminderData.indexOf("|");
+
+        if (statusPos > 0) {
+            // Reuse the detected medicine banner on the medicine page
+            detectedMedicine = reminderData.substring(0, statusPos);
+            medicineStatus = reminderData.substring(statusPos + 1);
+            medicineDetected = true;
+            lastMedicineDisplay = millis();
+
+            currentPage = 0;
+            renderPage();
+            lastPageChange = millis();
+            tone(BUZZER_PIN, 3000, 200);
+
+            Serial.print("Reminder: ");
+            Serial.println(detectedMedicine);
+        }
+
+        Serial.println("CMD_END");
+        return;
+    }
+
     // Handle direct page command
     if (command.startsWith("page ")) {
         int newPage = command.substring(5).toInt();
@@ -594,6 +640,12 @@ void processCommand(String command) {
         ultrasonicEnabled = false;
         noTone(BUZZER_PIN); // Stop any current beeping
         Serial.println("Obstacle detection disabled");
+    } else if (command == "imu on") {
+        imuStreamEnabled = true;
+        Serial.println("IMU stream enabled");
+    } else if (command == "imu off") {
+        imuStreamEnabled = false;
+        Serial.println("IMU stream disabled");
     } else if (command == "menu" || command == "0") {
         printTerminalMenu();
     } else if (command.startsWith("med ")) {
@@ -649,6 +701,7 @@ void printTerminalMenu() {
     Serial.println("7 - Show Heart Rate Data");
     Serial.println("8 - Show Ultrasonic Data");
     Serial.println("ultrasonic on/off - Toggle obstacle detection");
+    Serial.println("imu on/off - Toggle the raw IMU stream");
     Serial.println("0 - Show this menu");
     Serial.println("====================================");
     Serial.println("Current Status: Display showing page " + String(currentPage+1) + "/6");
@@ -1502,10 +1555,6 @@ void updateGPS() {
             gpsLat = gps.location.lat();
             gpsLng = gps.location.lng();
             gpsValid = true;
-            // Debug: Print when location is updated
-            Serial.println("GPS Location Updated!");
-            Serial.print("Lat: "); Serial.println(gpsLat, 6);
-            Serial.print("Lng: "); Serial.println(gpsLng, 6);
         }
         
         if (gps.altitude.isUpdated()) {
@@ -1514,10 +1563,41 @@ void updateGPS() {
         
         if (gps.satellites.isUpdated()) {
             gpsSats = gps.satellites.value();
-            // Debug: Print satellite count
-            Serial.print("Satellites: "); Serial.println(gpsSats);
+        }
+        
+        // Push the fix once a second so the web server never has to poll with "6"
+        sendGPSData();
+    }
+}
+
+// One machine-readable line: GPS_DATA:lat,lng,alt,satellites,valid
+void sendGPSData() {
+    Serial.print("GPS_DATA:");
+    Serial.print(gpsLat, 6);
+    Serial.print(",");
+    Serial.print(gpsLng, 6);
+    Serial.print(",");
+    Serial.print(gpsAlt, 1);
+    Serial.print(",");
+    Serial.print(gpsSats);
+    Serial.print(",");
+    Serial.println(gpsValid ? "1" : "0");
+}
+
+// One line per batch: IMU_DATA:startMillis,intervalMs,ax,ay,az,gx,gy,gz,ax,...
+void sendIMUData() {
+    Serial.print("IMU_DATA:");
+    Serial.print(receivedIMU.startMillis);
+    Serial.print(",");
+    Serial.print(receivedIMU.intervalMs);
+    int count = min((int)receivedIMU.count, IMU_BATCH);
+    for (int i = 0; i < count; i++) {
+        for (int j = 0; j < 6; j++) {
+            Serial.print(",");
+            Serial.print(receivedIMU.samples[i][j]);
         }
     }
+    Serial.println();
 }
 
 void updateDisplayBrightness() {
@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+"""
+End-to-end latency and throughput benchmarks for Synapse AR.
+
+Runs the web server's serial pipeline, HTTP API and alert system in-process
+against a simulated wearable (device_simulator.py) and a local fake Telegram
+API (fake_telegram.py), then appends the results to a JSON history file so
+regressions between versions stand out:
+
+    python benchmark.py                    # run everything, append to history
+    python benchmark.py --only serial api  # run a subset
+    python benchmark.py --fail-on-regression
+
+Measured:
+    reading_to_sensor_data   serial line written -> sensor_data updated/published
+    reading_to_api           serial line written -> visible in /api/sensor_data
+    reading_to_alert         fall reading written -> alert received by the Bot API
+    command_rtt              send_command("ping") round trip
+    predict_<model>          /api/predict/<model> latency (models that are loaded)
+    gesture_fps              gesture pipeline frames per second (needs MediaPipe)
+    rps_<server>_<endpoint>  requests per second against a real server process
+                             (serve.py for gevent, synapse_web.py for dev)
+    import_synapse_web       `import synapse_web` in a fresh interpreter; exits 1 if the
+                             median is over --startup-budget or a vision/ML package was
+                             imported (those load on first use)
+"""
+import os
+import sys
+import json
+import math
+import time
+import socket
+import logging
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+
+from device_simulator import SimulatedDevice, FORMAT_TEXT, FORMAT_DIRECT, FORMAT_BOTH
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FILE = 'benchmark_history.json'
+DEFAULT_SAMPLES = 50
+DEFAULT_TOLERANCE = 0.2          # Fractional slowdown reported as a regression
+SAMPLE_TIMEOUT = 5.0             # Seconds to wait for one sample before giving up
+
+BENCHMARKS = ['serial', 'api', 'alerts', 'command', 'predict', 'gesture', 'throughput', 'startup']
+# Benchmarks that don't need the in-process server and simulated device
+STANDALONE_BENCHMARKS = {'gesture', 'throughput', 'startup'}
+
+# Startup budget: seconds for `import synapse_web`, and packages it must not import eagerly
+STARTUP_BUDGET = 1.5
+HEAVY_MODULES = ('cv2', 'mediapipe', 'joblib', 'sklearn', 'pandas', 'numpy')
+STARTUP_PROBE = ("import sys, time, json; start = time.perf_counter(); import synapse_web; "
+                 "print(json.dumps([time.perf_counter() - start, "
+                 "sorted(m for m in sys.modules if m.split('.')[0] in {heavy!r})]))")
+
+# Endpoints hammered by the throughput benchmark, and how to start each server
+THROUGHPUT_ENDPOINTS = ['/api/sensor_data', '/api/heart_rate', '/api/spo2', '/api/gps']
+SERVER_COMMANDS = {
+    "gevent": [sys.executable, 'serve.py'],
+    "dev": [sys.executable, 'synapse_web.py']
+}
+SERVER_START_TIMEOUT = 60.0      # Seconds for the server process to import everything and listen
+
+# Payloads matching the forms on the predictions page
+PREDICTION_PAYLOADS = {
+    "hypertension": {"age": 52, "male": 1, "sysBP": 138, "diaBP": 88, "heartRate": 82},
+    "cardiac": {"Age": 61, "Gender": "Male", "Heart_Rate": 88, "Systolic_BP": 142, "Diastolic_BP": 90, "BMI": 27.3},
+    "anxiety": {"heartRate": 96, "spo2": 97, "temperature": 36.9}
+}
+
+
+def summarize(samples, unit="ms"):
+    """Percentile summary of latency samples given in seconds"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    scale = 1000.0 if unit == "ms" else 1.0
+
+    def percentile(p):
+        # Nearest-rank percentile
+        rank = max(1, math.ceil(p / 100.0 * len(ordered)))
+        return round(ordered[rank - 1] * scale, 3)
+
+    return {
+        "unit": unit,
+        "better": "lower",
+        "n": len(ordered),
+        "mean": round(sum(ordered) / len(ordered) * scale, 3),
+        "min": round(ordered[0] * scale, 3),
+        "p50": percentile(50),
+        "p95": percentile(95),
+        "p99": percentile(99),
+        "max": round(ordered[-1] * scale, 3)
+    }
+
+
+def tagged_reading(index, fall=False):
+    """A normal reading whose heart rate identifies it in the parsed output"""
+    heart_rate = 60 + index % 80
+    return {
+        "heartRate": float(heart_rate),
+        "heartRateAvg": heart_rate,
+        "spo2": 97,
+        "spo2Avg": 97,
+        "temperature": 36.6,
+        "fallDetected": fall,
+        "validReadings": True
+    }
+
+
+def wait_for(predicate, timeout=SAMPLE_TIMEOUT, interval=0.0005):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if predicate():
+            return True
+        time.sleep(interval)
+    return False
+
+
+class BenchmarkContext:
+    """Simulated device connected to an in-process web server"""
+
+    def __init__(self, output_format=FORMAT_TEXT):
+        self.device = SimulatedDevice(output_format=output_format, stream=False).start()
+        logger.info(f"Simulated device on {self.device.port}")
+
+        # Imported here so --only gesture and --help don't pay for the whole web stack
+        import synapse_web
+        self.web = synapse_web
+        self.client = synapse_web.app.test_client()
+        ok, message = synapse_web.connect_to_device(self.device.port)
+        if not ok:
+            raise RuntimeError(f"Could not connect to simulated device: {message}")
+        self.index = 0
+
+    def next_reading(self, fall=False):
+        self.index += 1
+        return tagged_reading(self.index, fall)
+
+    def close(self):
+        self.web.disconnect_device()
+        self.web.device_registry.stop()
+        self.device.stop()
+
+
+def bench_serial(ctx, samples):
+    """Serial line written -> reading parsed into sensor_data and published"""
+    stream = ctx.web.sensor_stream
+    latencies = []
+    with stream.subscribe() as subscription:
+        for _ in range(samples):
+            reading = ctx.next_reading()
+            start = time.perf_counter()
+            ctx.device.emit_reading(reading)
+            deadline = start + SAMPLE_TIMEOUT
+            while time.perf_counter() < deadline:
+                published = subscription.get(timeout=max(0.0, deadline - time.perf_counter()))
+                if published is not None and published.get("heartRate") == reading["heartRate"]:
+                    latencies.append(time.perf_counter() - start)
+                    break
+    return {"reading_to_sensor_data": summarize(latencies)}
+
+
+def bench_api(ctx, samples):
+    """Serial line written -> new values returned by GET /api/sensor_data"""
+    latencies = []
+    for _ in range(samples):
+        reading = ctx.next_reading()
+        start = time.perf_counter()
+        ctx.device.emit_reading(reading)
+
+        def visible():
+            data = ctx.client.get('/api/sensor_data').get_json()
+            return data["sensor_data"].get("heartRate") == reading["heartRate"]
+
+        if wait_for(visible):
+            latencies.append(time.perf_counter() - start)
+    return {"reading_to_api": summarize(latencies)}
+
+
+def bench_alerts(ctx, samples):
+    """Fall reading written -> alert delivered to a local fake Telegram API"""
+    from fake_telegram import FakeTelegramServer
+
+    server = FakeTelegramServer(port=0).start()
+    os.environ['TELEGRAM_API_URL'] = server.api_url
+    import telegram_alerts
+    from alert_rules import RuleSet
+    from notification_queue import NotificationQueue, RateLimiter
+    telegram_alerts.telebot.apihelper.API_URL = server.api_url
+
+    alerts = telegram_alerts.TelegramAlertSystem(stream=ctx.web.sensor_stream)
+    # Measure the pipeline, not the Bot API rate limits or alert cooldowns
+    db_dir = tempfile.mkdtemp(prefix='synapse-bench-')
+    alerts.outbox = NotificationQueue(telegram_alerts.deliver_telegram_message,
+                                      db_path=os.path.join(db_dir, 'outbox.db'),
+                                      rate_limiter=RateLimiter(0.0, 10 ** 6, 10 ** 6))
+    rules = RuleSet([{"name": "fall", "when": "fallDetected", "cooldown": 0}])
+    for patient in alerts.patients.values():
+        patient.outbox = alerts.outbox
+        patient.engine = rules.engine_for()
+
+    latencies = []
+    alerts.start()
+    try:
+        for _ in range(samples):
+            ctx.device.emit_reading(ctx.next_reading())
+            time.sleep(0.05)
+            sent_at = time.time()
+            start = time.perf_counter()
+            ctx.device.emit_reading(ctx.next_reading(fall=True))
+            message = server.wait_for_message("FALL DETECTED", timeout=SAMPLE_TIMEOUT, after=sent_at)
+            if message is not None:
+                latencies.append(time.perf_counter() - start)
+    finally:
+        alerts.stop()
+        server.stop()
+    return {"reading_to_alert": summarize(latencies)}
+
+
+def bench_command(ctx, samples):
+    """Round trip of a terminal command through the serial event loop"""
+    latencies = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        response = ctx.web.send_command("ping")
+        if "pong" in response:
+            latencies.append(time.perf_counter() - start)
+    return {"command_rtt": summarize(latencies)}
+
+
+def bench_predict(ctx, samples):
+    """Latency of each prediction endpoint whose model is loaded"""
+    results = {}
+    for model, payload in PREDICTION_PAYLOADS.items():
+        url = f'/api/predict/{model}'
+        if ctx.client.post(url, json=payload).status_code != 200:
+            logger.info(f"Skipping {url}: model not available")
+            continue
+        latencies = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            response = ctx.client.post(url, json=payload)
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+        results[f"predict_{model}"] = summarize(latencies)
+    return results
+
+
+def bench_gesture(frames, video=None):
+    """Frames per second through the gesture loop's per-frame work (without the window)"""
+    try:
+        import cv2
+        import numpy as np
+        import mediapipe as mp
+    except ImportError:
+        logger.info("Skipping gesture benchmark: OpenCV/MediaPipe not available")
+        return {}
+
+    capture = cv2.VideoCapture(video) if video else None
+    # Without a recording, noise frames at the webcam's resolution still exercise palm detection
+    rng = np.random.default_rng(0)
+    synthetic = [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(8)]
+
+    processed = 0
+    with mp.solutions.hands.Hands(min_detection_confidence=0.5, min_tracking_confidence=0.5,
+                                  max_num_hands=2) as hands:
+        start = time.perf_counter()
+        for i in range(frames):
+            if capture is not None:
+                success, image = capture.read()
+                if not success:
+                    break
+            else:
+                image = synthetic[i % len(synthetic)]
+            image = cv2.flip(image, 1)
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            image.flags.writeable = False
+            hands.process(image)
+            image.flags.writeable = True
+            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+            processed += 1
+        elapsed = time.perf_counter() - start
+
+    if capture is not None:
+        capture.release()
+    if not processed:
+        return {}
+    return {"gesture_fps": {"unit": "fps", "better": "higher", "n": processed,
+                            "value": round(processed / elapsed, 2)}}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(server, port):
+    """Start a web server process and wait until it accepts connections"""
+    process = subprocess.Popen(SERVER_COMMANDS[server] + ['--host', '127.0.0.1', '--port', str(port)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.perf_counter() + SERVER_START_TIMEOUT
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{server} server exited with status {process.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{server} server did not start listening within {SERVER_START_TIMEOUT:g}s")
+
+
+def stop_server(process):
+    """SIGTERM, which both servers handle as a graceful shutdown"""
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def bench_throughput(server, clients, duration):
+    """Requests per second from keep-alive clients against each polling endpoint"""
+    port = free_port()
+    logger.info(f"Starting {server} server on port {port}")
+    process = start_server(server, port)
+    results = {}
+    try:
+        for url in THROUGHPUT_ENDPOINTS:
+            counts = [0] * clients
+            deadline = time.perf_counter() + duration
+
+            def client(i):
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=SAMPLE_TIMEOUT)
+                while time.perf_counter() < deadline:
+                    try:
+                        conn.request('GET', url)
+                        response = conn.getresponse()
+                        response.read()
+                        if response.status == 200:
+                            counts[i] += 1
+                    except (OSError, http.client.HTTPException):
+                        conn.close()
+                        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=SAMPLE_TIMEOUT)
+                conn.close()
+
+            threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(clients)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            results[f"rps_{server}_{url.rsplit('/', 1)[-1]}"] = {
+                "unit": "req/s", "better": "higher", "n": sum(counts),
+                "value": round(sum(counts) / elapsed, 1)
+            }
+    finally:
+        stop_server(process)
+    return results
+
+
+def bench_startup(samples):
+    """Import time of synapse_web in fresh interpreters, plus any heavy package it pulled in"""
+    probe = STARTUP_PROBE.format(heavy=HEAVY_MODULES)
+    times = []
+    heavy = set()
+    for _ in range(samples):
+        output = subprocess.check_output([sys.executable, '-c', probe], stderr=subprocess.DEVNULL, text=True)
+        # The last line is ours; the module may print availability notices before it
+        elapsed, modules = json.loads(output.strip().splitlines()[-1])
+        times.append(elapsed)
+        heavy.update(modules)
+    result = summarize(times)
+    result["heavy_modules"] = sorted(heavy)
+    return {"import_synapse_web": result}
+
+
+def over_budget(results, budget):
+    """Reasons the startup result breaks the budget (empty if it doesn't)"""
+    result = results.get("import_synapse_web")
+    if not result:
+        return []
+    problems = []
+    if result["p50"] > budget * 1000:
+        problems.append(f"import synapse_web took {result['p50']:.0f}ms (budget {budget * 1000:.0f}ms)")
+    if result["heavy_modules"]:
+        problems.append(f"import synapse_web loaded {', '.join(result['heavy_modules'])}")
+    return problems
+
+
+def headline(result):
+    """The number compared between runs"""
+    return result["value"] if "value" in result else result["p50"]
+
+
+def compare(results, previous, tolerance):
+    """Metrics that got worse than the previous run by more than tolerance"""
+    regressions = []
+    for name, result in results.items():
+        before = (previous or {}).get("results", {}).get(name)
+        if not result or not before:
+            continue
+        old, new = headline(before), headline(result)
+        if not old:
+            continue
+        change = (new - old) / old
+        if result.get("better") == "higher":
+            change = -change
+        if change > tolerance:
+            regressions.append((name, old, new, change))
+    return regressions
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return {"runs": []}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def run(args):
+    selected = args.only or BENCHMARKS
+    results = {}
+
+    if set(selected) - STANDALONE_BENCHMARKS:
+        ctx = BenchmarkContext(args.format)
+        try:
+            for name in selected:
+                if name in STANDALONE_BENCHMARKS:
+                    continue
+                logger.info(f"Running {name} benchmark")
+                samples = args.alert_samples if name == 'alerts' else args.samples
+                results.update(globals()[f"bench_{name}"](ctx, samples))
+        finally:
+            ctx.close()
+
+    if 'gesture' in selected:
+        logger.info("Running gesture benchmark")
+        results.update(bench_gesture(args.frames, args.video))
+
+    if 'throughput' in selected:
+        logger.info("Running throughput benchmark")
+        results.update(bench_throughput(args.server, args.clients, args.duration))
+
+    if 'startup' in selected:
+        logger.info("Running startup benchmark")
+        results.update(bench_startup(args.startup_samples))
+
+    return {
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "revision": git_revision(),
+        "label": args.label,
+        "host": socket.gethostname(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"samples": args.samples, "format": args.format, "benchmarks": selected,
+                   "server": args.server, "clients": args.clients},
+        "results": results
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark Synapse AR latency and throughput')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, help='Benchmarks to run (default: all)')
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES, help='Samples per latency benchmark')
+    parser.add_argument('--alert-samples', type=int, default=20, help='Samples for the alert benchmark')
+    parser.add_argument('--frames', type=int, default=200, help='Frames for the gesture benchmark')
+    parser.add_argument('--video', help='Video file to feed the gesture benchmark instead of synthetic frames')
+    parser.add_argument('--format', choices=[FORMAT_TEXT, FORMAT_DIRECT, FORMAT_BOTH], default=FORMAT_TEXT,
+                        help='Sensor format sent by the simulated device')
+    parser.add_argument('--server', choices=sorted(SERVER_COMMANDS), default='gevent',
+                        help='Server the throughput benchmark runs against')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent clients for the throughput benchmark')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per endpoint for the throughput benchmark')
+    parser.add_argument('--startup-samples', type=int, default=5, help='Interpreters started by the startup benchmark')
+    parser.add_argument('--startup-budget', type=float, default=STARTUP_BUDGET,
+                        help='Seconds import synapse_web may take before the run fails')
+    parser.add_argument('--history', default=HISTORY_FILE, help='JSON file results are appended to')
+    parser.add_argument('--label', help='Free-form label stored with this run')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Slowdown versus the previous run reported as a regression (0.2 = 20%%)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 on regressions')
+    parser.add_argument('--no-save', action='store_true', help="Don't append this run to the history")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    history = load_history(args.history)
+    previous = history["runs"][-1] if history["runs"] else None
+    entry = run(args)
+
+    print(f"\n{'metric':<26}{'n':>6}{'p50':>12}{'p99':>12}{'max':>12}")
+    for name, result in entry["results"].items():
+        if result is None:
+            print(f"{name:<26}{'no samples':>18}")
+        elif "value" in result:
+            print(f"{name:<26}{result['n']:>6}{result['value']:>11.2f} {result['unit']}")
+        else:
+            print(f"{name:<26}{result['n']:>6}{result['p50']:>10.2f}ms{result['p99']:>10.2f}ms{result['max']:>10.2f}ms")
+
+    regressions = compare(entry["results"], previous, args.tolerance)
+    for name, old, new, change in regressions:
+        print(f"REGRESSION {name}: {old} -> {new} ({change:+.0%} worse than {previous.get('revision')})")
+
+    budget_problems = over_budget(entry["results"], args.startup_budget)
+    for problem in budget_problems:
+        print(f"OVER BUDGET {problem}")
+
+    if not args.no_save:
+        history["runs"].append(entry)
+        with open(args.history, 'w') as f:
+            json.dump(history, f, indent=2)
+        print(f"\nSaved run to {args.history}")
+
+    sys.exit(1 if budget_problems or (regressions and args.fail_on_regression) else 0)
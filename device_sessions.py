@@ -0,0 +1,774 @@
+#!/usr/bin/env python3
+"""
+Per-device session registry for the Synapse AR web server.
+
+Every piece of state that used to be a module global in synapse_web.py (serial
+port, sensor_data, gps_data and track, heart-rate buffer, fall latch) lives on a
+DeviceSession keyed by device ID. All ports are driven by one asyncio event
+loop (see serial_transport.py), so 40 wearables cost one thread and a few KB
+each instead of one process per resident.
+
+Sessions expose coroutines (command, telemetry, reconnect) for code running on
+the loop and blocking wrappers (send_command) for Flask handlers and other
+threads. Command replies are delimited by the firmware's CMD_END marker, so
+no caller sleeps for a fixed time waiting on a device.
+
+A DeviceSupervisor task on the same loop watches the system's serial ports for
+hot-plug events and reopens any wanted device that dropped, with backoff, so a
+USB glitch costs seconds of data rather than a manual reconnect.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+
+import serial.tools.list_ports
+
+import metrics
+from gps_feed import GPS_DATA_PREFIX, default_gps_data, parse_gps_line, merge_fix
+from gps_track import TrackStore
+from geofence import GeofenceTracker
+from signal_quality import SignalQuality
+from serial_transport import EventLoopThread, open_serial
+
+logger = logging.getLogger(__name__)
+
+DEVICES_FILE = 'devices.json'
+DEFAULT_DEVICE_ID = 'default'
+
+RESET_DELAY = 2.0                # ESP32 reboots when the port opens; ignore input until then
+COMMAND_TIMEOUT = 4.0            # Seconds to wait for CMD_END
+BUFFER_DURATION = 10             # Seconds of clean samples in the heart rate and SpO2 averages
+FALL_LATCH = 30                  # Seconds a text-format or host-detected fall outlasts a "no fall"
+SUBSCRIBER_QUEUE_SIZE = 256      # Readings buffered per telemetry subscriber
+RECONNECT_BACKOFF = 1.0          # First delay between reconnect attempts
+RECONNECT_BACKOFF_MAX = 30.0     # Longest delay between reconnect attempts
+HOTPLUG_INTERVAL = 1.0           # Seconds between serial port scans
+
+SENSOR_BLOCK_START = "--- Received Sensor Data ---"
+SENSOR_BLOCK_END = "-------------------------"
+COMMAND_END = "CMD_END"
+IMU_DATA_PREFIX = "IMU_DATA:"     # Raw IMU batches, handled by fall_detector.py (imported with NumPy on first use)
+
+# Fields a reading posted over HTTP may carry, the same ones SENSOR_DATA lines do, and their types.
+# The firmware's averages are accepted but replaced, like those on the serial port.
+SENSOR_FIELDS = {"heartRate": float, "heartRateAvg": float, "spo2": int, "spo2Avg": int,
+                 "temperature": float, "fallDetected": bool, "validReadings": bool}
+
+SERIAL_LINES = metrics.counter('synapse_serial_lines_total', 'Lines read from wearable serial ports', ['device'])
+READINGS = metrics.counter('synapse_readings_total', 'Sensor readings parsed', ['device', 'format'])
+PARSE_SECONDS = metrics.histogram('synapse_parse_seconds', 'Time to parse one sensor reading', ['format'])
+PARSE_ERRORS = metrics.counter('synapse_parse_errors_total', 'Sensor readings that failed to parse', ['format'])
+COMMAND_SECONDS = metrics.histogram('synapse_command_seconds', 'Terminal command round trip', ['device'])
+COMMAND_TIMEOUTS = metrics.counter('synapse_command_timeouts_total', 'Commands with no CMD_END in time', ['device'])
+DISCONNECTS = metrics.counter('synapse_device_disconnects_total', 'Serial connections lost', ['device'])
+GPS_FIXES = metrics.counter('synapse_gps_fixes_total', 'GPS_DATA lines received', ['device'])
+IMU_SAMPLES = metrics.counter('synapse_imu_samples_total', 'Raw IMU samples received', ['device'])
+HOST_FALLS = metrics.counter('synapse_host_falls_total', 'Falls detected on the host from the IMU stream', ['device'])
+GEOFENCE_EVENTS = metrics.counter('synapse_geofence_events_total', 'Confirmed geofence entries and exits', ['device', 'event'])
+DEVICES_CONNECTED = metrics.gauge('synapse_devices_connected', 'Wearables with an open serial port')
+
+
+class SensorSnapshot(dict):
+    """Read-only sensor_data published as a whole.
+
+    A session replaces its snapshot (a single reference assignment) after
+    each complete reading instead of mutating it, so readers on any thread
+    get a consistent reading without taking a lock. "sequence" counts the
+    device's readings and tells clients whether anything changed.
+    """
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("sensor_data snapshots are read-only; use DeviceSession.apply_update()")
+
+    __setitem__ = __delitem__ = _readonly
+    update = pop = popitem = clear = setdefault = __ior__ = _readonly
+
+    @property
+    def sequence(self):
+        return self["sequence"]
+
+
+def default_sensor_data():
+    return {
+        "heartRate": 0,
+        "heartRateAvg": 0,
+        "heartRateQuality": 0.0,
+        "spo2": 0,
+        "spo2Avg": 0,
+        "spo2Quality": 0.0,
+        "temperature": 0,
+        "fallDetected": False,
+        "fallConfidence": 0.0,
+        "wandering": False,
+        "geofences": [],
+        "geofenceLocation": None,
+        "validReadings": False,
+        "last_updated": None,
+        "sequence": 0
+    }
+
+
+def load_device_config(path=DEVICES_FILE):
+    """Read devices.json: {"devices": [{"device_id", "port", "patient", "chat_id"}, ...]}"""
+    try:
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                return json.load(f).get('devices', [])
+    except Exception as e:
+        logger.error(f"Error loading device config: {e}")
+    return []
+
+
+class DeviceSession:
+    """Serial connection and telemetry state for one wearable"""
+
+    def __init__(self, device_id, port=None, patient=None, text_parser=None, publish=None, runner=None,
+                 geofences=None, track_dir=None, fall_config=None):
+        self.device_id = device_id
+        self.port = port
+        self.patient = patient or {}
+        self.text_parser = text_parser
+        # publish(reading) is called on the loop for every completed reading
+        self.publish = publish
+        # EventLoopThread used by the blocking wrappers
+        self.runner = runner
+        self.protocol = None
+        self.connected = False
+        self.connected_at = None
+        self.ready_at = 0.0
+        self.last_error = None
+        self.readings = 0
+
+        # Supervisor state: wanted sessions are kept connected
+        self.wanted = False
+        self.next_attempt = 0.0
+        self.backoff = RECONNECT_BACKOFF
+        self.opening = False
+        self.connects = 0
+        self.disconnects = 0
+        self.last_disconnect = None
+        # on_state_change(session) runs on the loop after every connect/disconnect
+        self.on_state_change = None
+
+        # Replaced, never mutated; see SensorSnapshot
+        self.sensor_data = SensorSnapshot(default_sensor_data())
+        self._update_lock = threading.Lock()
+        # Notified on every new snapshot, GPS fix and connection change (for long-polling clients)
+        self._changed = threading.Condition()
+        # Replaced (never mutated) on each fix so readers always see a whole fix
+        self.gps_data = default_gps_data()
+        self.gps_sequence = 0            # Bumped with every new gps_data
+        self.gps_pushed_at = None        # Time of the last GPS_DATA line, None for polling-only firmware
+        spill_path = os.path.join(track_dir, f"{device_id}.csv") if track_dir else None
+        self.track = TrackStore(spill_path=spill_path)
+        self.geofence = GeofenceTracker(geofences, device_id) if geofences else None
+        # Artifact rejection; the averages only include samples it accepts
+        self.quality = SignalQuality(average_window=BUFFER_DURATION)
+        self.heart_rate_buffer = self.quality.averages["heartRate"].buffer
+        self.last_fall_time = 0.0
+        self.last_host_fall = 0.0
+        # Created on the first IMU_DATA line, so devices without the stream cost nothing
+        self.fall_config = fall_config
+        self.fall_detector = None
+
+        self._block_lines = None         # Lines of a sensor block in progress
+        self._reply_lines = None         # Lines of a command reply in progress
+        self._reply_future = None
+        self._command_lock = None        # asyncio.Lock, created on the loop
+        self._subscribers = set()
+
+        # Metric children looked up once instead of on every line
+        self._m_lines = SERIAL_LINES.labels(device_id)
+        self._m_text = READINGS.labels(device_id, 'text')
+        self._m_direct = READINGS.labels(device_id, 'direct')
+        self._m_api = READINGS.labels(device_id, 'api')
+        self._m_command = COMMAND_SECONDS.labels(device_id)
+        self._m_gps = GPS_FIXES.labels(device_id)
+        self._m_imu = IMU_SAMPLES.labels(device_id)
+
+    @property
+    def patient_id(self):
+        return self.patient.get('id', self.device_id)
+
+    # --- Connection (on the loop) --------------------------------------------
+
+    async def open(self, port=None):
+        """Open the serial port; input is ignored until the device has reset"""
+        if self.connected:
+            self.close()
+        self.port = port or self.port
+        self.opening = True
+        try:
+            self.protocol = await open_serial(self.port, self._on_line, self._on_lost)
+        finally:
+            self.opening = False
+        self.connected = True
+        self.connected_at = time.time()
+        self.ready_at = self.connected_at + RESET_DELAY
+        self.last_error = None
+        self._block_lines = None
+        self.connects += 1
+        self.backoff = RECONNECT_BACKOFF
+        logger.info(f"[{self.device_id}] Opened {self.port}")
+        self._state_changed()
+        return self
+
+    def close(self, error=None):
+        was_connected = self.connected
+        self.connected = False
+        self.last_error = str(error) if error else None
+        protocol, self.protocol = self.protocol, None
+        if protocol is not None:
+            protocol.on_lost = None
+            protocol.close()
+        self._finish_reply()
+        if was_connected:
+            self.last_disconnect = time.time()
+            if error:
+                self.disconnects += 1
+                DISCONNECTS.labels(self.device_id).inc()
+            self._state_changed()
+
+    @property
+    def reconnects(self):
+        return max(self.connects - 1, 0)
+
+    @property
+    def uptime(self):
+        return time.time() - self.connected_at if self.connected and self.connected_at else 0.0
+
+    def _state_changed(self):
+        self._notify()
+        if self.on_state_change:
+            try:
+                self.on_state_change(self)
+            except Exception as e:
+                logger.error(f"[{self.device_id}] Error in state change handler: {e}")
+
+    async def reconnect(self, attempts=None, backoff=RECONNECT_BACKOFF, max_backoff=RECONNECT_BACKOFF_MAX):
+        """Reopen the port with exponential backoff; attempts=None retries forever"""
+        attempt = 0
+        while attempts is None or attempt < attempts:
+            attempt += 1
+            try:
+                await self.open()
+                return True
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"[{self.device_id}] Reconnect attempt {attempt} failed: {e}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, max_backoff)
+        return False
+
+    def _on_lost(self, exc):
+        logger.warning(f"[{self.device_id}] Serial connection lost: {exc}")
+        self.protocol = None
+        self.close(exc or "Connection closed")
+
+    # --- Commands ------------------------------------------------------------
+
+    async def command(self, command, timeout=COMMAND_TIMEOUT):
+        """Send a command and return its reply text (up to CMD_END or timeout)"""
+        if self._command_lock is None:
+            self._command_lock = asyncio.Lock()
+        async with self._command_lock:
+            if not self.connected:
+                return "Error: Not connected to any device"
+            wait = self.ready_at - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            self._reply_lines = []
+            self._reply_future = asyncio.get_running_loop().create_future()
+            start = time.perf_counter()
+            try:
+                self.protocol.write_line(command)
+                await asyncio.wait_for(self._reply_future, timeout)
+                self._m_command.observe(time.perf_counter() - start)
+            except asyncio.TimeoutError:
+                COMMAND_TIMEOUTS.labels(self.device_id).inc()
+                logger.warning(f"[{self.device_id}] Timed out waiting for reply to: {command}")
+            except Exception as e:
+                logger.error(f"[{self.device_id}] Error sending command: {e}")
+                return f"Error: {str(e)}"
+            finally:
+                lines, self._reply_lines, self._reply_future = self._reply_lines, None, None
+            return "\n".join(lines)
+
+    def _finish_reply(self):
+        if self._reply_future is not None and not self._reply_future.done():
+            self._reply_future.set_result(None)
+
+    def send_command(self, command, timeout=COMMAND_TIMEOUT):
+        """Blocking wrapper around command() for threads other than the loop"""
+        if not self.connected:
+            return "Error: Not connected to any device"
+        return self.runner.run(self.command(command, timeout), timeout=timeout + RESET_DELAY + 1)
+
+    def send_command_nowait(self, command, callback=None, timeout=COMMAND_TIMEOUT):
+        """Queue a command without waiting; callback(reply) runs on the loop"""
+        future = self.runner.submit(self.command(command, timeout))
+        if callback is not None:
+            def done(f):
+                if not f.cancelled() and f.exception() is None:
+                    callback(f.result())
+            future.add_done_callback(done)
+        return future
+
+    # --- Telemetry -----------------------------------------------------------
+
+    async def telemetry(self, max_pending=SUBSCRIBER_QUEUE_SIZE):
+        """Async iterator over this device's readings as they arrive"""
+        queue = asyncio.Queue(maxsize=max_pending)
+        self._subscribers.add(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers.discard(queue)
+
+    def _on_line(self, line):
+        self._m_lines.inc()
+        now = time.time()
+        if now < self.ready_at:
+            # Boot chatter from the reset
+            return
+        reading = self.handle_line(line, now)
+        if reading is None:
+            return
+        for queue in self._subscribers:
+            if queue.full():
+                # A slow subscriber loses its oldest reading, never blocks the port
+                queue.get_nowait()
+            queue.put_nowait(reading)
+        if self.publish:
+            try:
+                self.publish(reading)
+            except Exception as e:
+                logger.error(f"[{self.device_id}] Error publishing reading: {e}")
+
+    def handle_line(self, line, now=None):
+        """Route one line to the sensor parser or a pending command reply"""
+        now = now or time.time()
+
+        if line.startswith("SENSOR_DATA:"):
+            return self._apply_direct(line, now)
+
+        if line.startswith(IMU_DATA_PREFIX):
+            return self._apply_imu(line, now)
+
+        if line.startswith(GPS_DATA_PREFIX):
+            return self._apply_gps(line, now)
+
+        if line.startswith(SENSOR_BLOCK_START):
+            self._block_lines = []
+            return None
+
+        if self._block_lines is not None:
+            if line.startswith(SENSOR_BLOCK_END):
+                lines, self._block_lines = self._block_lines, None
+                return self._apply_block(lines, now)
+            self._block_lines.append(line)
+            return None
+
+        if self._reply_lines is not None:
+            self._reply_lines.append(line)
+            if line == COMMAND_END:
+                self._finish_reply()
+        return None
+
+    def _apply_direct(self, line, now):
+        start = time.perf_counter()
+        parts = line.split("SENSOR_DATA:")[1].strip().split(',')
+        if len(parts) < 7:
+            return None
+        try:
+            # The firmware's own averages (parts 1 and 3) include artifacts; ours are recomputed
+            update = {
+                "heartRate": float(parts[0]),
+                "spo2": int(parts[2]),
+                "temperature": float(parts[4]),
+                "validReadings": parts[6] == "1",
+                "last_updated": now
+            }
+        except ValueError as e:
+            PARSE_ERRORS.labels('direct').inc()
+            logger.error(f"[{self.device_id}] Error parsing direct sensor data: {e}")
+            return None
+
+        # Binary "no fall" doesn't clear a fall recently reported in text format
+        fall = parts[5] == "1"
+        if fall or now - self.last_fall_time > FALL_LATCH:
+            update["fallDetected"] = fall
+            if fall:
+                self.last_fall_time = now
+        self.quality.apply(update, now)
+        PARSE_SECONDS.labels('direct').observe(time.perf_counter() - start)
+        self._m_direct.inc()
+        return self.apply_update(update)
+
+    def apply_values(self, values, now=None):
+        """Apply a reading that didn't come over the serial port (posted over HTTP) through the same checks.
+
+        Raises ValueError for fields a wearable doesn't send or values of the wrong type.
+        """
+        now = now or time.time()
+        unknown = set(values) - set(SENSOR_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown sensor fields: {', '.join(sorted(unknown))}")
+        update = {}
+        for field, kind in SENSOR_FIELDS.items():
+            if field not in values or field.endswith("Avg"):
+                continue
+            value = values[field]
+            if kind is bool:
+                if not isinstance(value, bool):
+                    raise ValueError(f"{field} must be true or false")
+            elif isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{field} must be a number")
+            update[field] = kind(value)
+        update["last_updated"] = now
+
+        if update.get("fallDetected", False):
+            self.last_fall_time = now
+        elif "fallDetected" in update and now - self.last_fall_time <= FALL_LATCH:
+            update["fallDetected"] = True
+        self.quality.apply(update, now)
+        self._m_api.inc()
+        return self.apply_update(update)
+
+    def _apply_imu(self, line, now):
+        """Feed a raw IMU batch to the fall detector; returns a reading when it detects a fall"""
+        from fall_detector import FallDetector, parse_imu_line
+
+        start = time.perf_counter()
+        batch = parse_imu_line(line)
+        if batch is None:
+            PARSE_ERRORS.labels('imu').inc()
+            return None
+        if self.fall_detector is None:
+            self.fall_detector = FallDetector(self.fall_config)
+        events = self.fall_detector.process(*batch)
+        PARSE_SECONDS.labels('imu').observe(time.perf_counter() - start)
+        self._m_imu.inc(len(batch[2]))
+        if not events:
+            return None
+        event = max(events, key=lambda e: e["confidence"])
+        self.last_fall_time = self.last_host_fall = now
+        HOST_FALLS.labels(self.device_id).inc()
+        logger.info(f"[{self.device_id}] Fall detected from IMU stream: {event}")
+        return self.apply_update({"fallDetected": True, "fallConfidence": event["confidence"], "last_updated": now})
+
+    def _apply_gps(self, line, now):
+        """Cache a pushed fix; returns a reading only when the geofence state changes"""
+        fix = parse_gps_line(line, now)
+        if fix is None:
+            PARSE_ERRORS.labels('gps').inc()
+            return None
+        self.set_gps_data(merge_fix(self.gps_data, fix))
+        self.gps_pushed_at = now
+        self._m_gps.inc()
+        if fix["valid"]:
+            return self.apply_fix(fix["latitude"], fix["longitude"], fix["altitude"], now)
+        return None
+
+    def set_gps_data(self, gps_data):
+        """Replace the cached GPS state"""
+        self.gps_data = gps_data
+        self.gps_sequence += 1
+        self._notify()
+
+    def apply_fix(self, latitude, longitude, altitude=0.0, now=None):
+        """Add a valid fix to the track and geofence state (also used for polled fixes)"""
+        now = now or time.time()
+        self.track.add(now, latitude, longitude, altitude)
+        if self.geofence is None:
+            return None
+        events = self.geofence.update(latitude, longitude)
+        if not events:
+            return None
+        for name, event in events:
+            GEOFENCE_EVENTS.labels(self.device_id, event).inc()
+            logger.info(f"[{self.device_id}] Geofence {event}: {name}")
+        return self.apply_update(self.geofence.status())
+
+    def _apply_block(self, lines, now):
+        if not lines or self.text_parser is None:
+            return None
+        start = time.perf_counter()
+        parsed = self.text_parser("\n".join(lines))
+        if not parsed:
+            PARSE_ERRORS.labels('text').inc()
+            return None
+        if parsed.get("fallDetected", False):
+            self.last_fall_time = now
+        elif now - self.last_host_fall <= FALL_LATCH:
+            # The firmware's own "No" doesn't clear a fall the host just detected
+            parsed["fallDetected"] = True
+        parsed["last_updated"] = now
+        self.quality.apply(parsed, now)
+        PARSE_SECONDS.labels('text').observe(time.perf_counter() - start)
+        self._m_text.inc()
+        return self.apply_update(parsed)
+
+    def apply_update(self, update):
+        """Publish a new sensor_data snapshot with update merged; returns the tagged reading to publish"""
+        if update.get("fallDetected") is False:
+            update["fallConfidence"] = 0.0
+        # Writers (the serial loop, test updates from Flask) are serialized; readers never wait
+        with self._update_lock:
+            data = dict(self.sensor_data)
+            data.update(update)
+            data["sequence"] = self.sensor_data["sequence"] + 1
+            self.sensor_data = SensorSnapshot(data)
+            self.readings += 1
+        self._notify()
+        return self.latest_reading()
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def wait_for_change(self, changed, timeout):
+        """Block until changed() is true (checked after every update) or timeout; returns changed()"""
+        with self._changed:
+            return self._changed.wait_for(changed, timeout)
+
+    def latest_reading(self):
+        """Copy of the current snapshot tagged with the device and patient"""
+        reading = dict(self.sensor_data)
+        reading["device_id"] = self.device_id
+        reading["patient_id"] = self.patient_id
+        return reading
+
+    @property
+    def state(self):
+        if self.connected:
+            return "connected"
+        return "reconnecting" if self.wanted else "disconnected"
+
+    def status(self):
+        return {
+            "device_id": self.device_id,
+            "patient": self.patient,
+            "port": self.port,
+            "connected": self.connected,
+            "state": self.state,
+            "connected_at": self.connected_at,
+            "uptime": round(self.uptime, 1),
+            "reconnects": self.reconnects,
+            "disconnects": self.disconnects,
+            "last_disconnect": self.last_disconnect,
+            "readings": self.readings,
+            "last_updated": self.sensor_data["last_updated"],
+            "last_error": self.last_error
+        }
+
+
+def list_port_names():
+    return {port.device for port in serial.tools.list_ports.comports()}
+
+
+class DeviceSupervisor:
+    """Keeps wanted sessions connected and reacts to serial hot-plug events"""
+
+    def __init__(self, registry, interval=HOTPLUG_INTERVAL):
+        self.registry = registry
+        self.interval = interval
+        self.ports = None
+        self.hotplug_events = 0
+        self._running = False
+        self._wake = None
+        self._future = None
+
+    def start(self):
+        if self._running:
+            return False
+        self._running = True
+        self._future = self.registry.runner.submit(self.run())
+        return True
+
+    def stop(self):
+        if not self._running:
+            return False
+        self._running = False
+        self.wake()
+        try:
+            self._future.result(timeout=self.interval + 1)
+        except Exception:
+            pass
+        return True
+
+    def wake(self):
+        """Run a pass now instead of at the next interval"""
+        if self._wake is not None:
+            self.registry.runner.call_soon(self._wake.set)
+
+    @staticmethod
+    def port_present(port, ports):
+        # URLs (socket://, loop://) and ptys never show up in the port list
+        return port in ports or "://" in port or os.path.exists(port)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        logger.info("Device supervisor started")
+        while self._running:
+            try:
+                ports = await loop.run_in_executor(None, list_port_names)
+                self._handle_hotplug(ports)
+                due = [
+                    session for session in self.registry.sessions()
+                    if session.wanted and not session.connected and not session.opening and session.port
+                    and time.time() >= session.next_attempt and self.port_present(session.port, ports)
+                ]
+                if due:
+                    await asyncio.gather(*(self._attempt(session) for session in due))
+            except Exception as e:
+                logger.error(f"Error in device supervisor: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+        logger.info("Device supervisor stopped")
+
+    def _handle_hotplug(self, ports):
+        if self.ports is None:
+            # First scan: everything present is the baseline, not a hot-plug
+            self.ports = ports
+            return
+        added, removed = ports - self.ports, self.ports - ports
+        self.ports = ports
+        if not added and not removed:
+            return
+        self.hotplug_events += len(added) + len(removed)
+        for session in self.registry.sessions():
+            if session.port in removed and session.connected:
+                logger.warning(f"[{session.device_id}] {session.port} was unplugged")
+                session.close("Port removed")
+            elif session.port in added and session.wanted:
+                # Replugged: don't wait out the backoff
+                logger.info(f"[{session.device_id}] {session.port} was plugged in")
+                session.next_attempt = 0.0
+                session.backoff = RECONNECT_BACKOFF
+
+    async def _attempt(self, session):
+        try:
+            await session.open()
+            if session.reconnects:
+                logger.info(f"[{session.device_id}] Reconnected to {session.port} "
+                            f"(reconnect #{session.reconnects})")
+        except Exception as e:
+            session.last_error = str(e)
+            session.next_attempt = time.time() + session.backoff
+            logger.warning(f"[{session.device_id}] Could not open {session.port}: {e} "
+                           f"(retrying in {session.backoff:.0f}s)")
+            session.backoff = min(session.backoff * 2, RECONNECT_BACKOFF_MAX)
+
+
+class DeviceRegistry:
+    """All device sessions plus the event loop that serves their ports"""
+
+    def __init__(self, publish=None, text_parser=None, geofences=None, track_dir=None, fall_config=None):
+        # publish(reading) is called for every completed reading, tagged with device_id
+        self.publish = publish
+        self.text_parser = text_parser
+        # GeofenceIndex shared by every session; track_dir holds spilled GPS tracks
+        self.geofences = geofences
+        self.track_dir = track_dir
+        # Settings for host-side fall detection; None loads fall_detection.json when the first IMU batch arrives
+        self.fall_config = fall_config
+        self.runner = EventLoopThread()
+        self.supervisor = DeviceSupervisor(self)
+        self._sessions = {}
+        self._lock = threading.Lock()
+        DEVICES_CONNECTED.set_function(lambda: sum(1 for s in self.sessions() if s.connected))
+
+    def get(self, device_id):
+        return self._sessions.get(device_id)
+
+    def sessions(self):
+        return list(self._sessions.values())
+
+    def add(self, device_id, port=None, patient=None):
+        """Register a device (without opening it); returns the session"""
+        with self._lock:
+            session = self._sessions.get(device_id)
+            if session is None:
+                session = DeviceSession(device_id, port, patient, self.text_parser, self.publish, self.runner,
+                                        self.geofences, self.track_dir, self.fall_config)
+                self._sessions[device_id] = session
+            else:
+                session.port = port or session.port
+                if patient:
+                    session.patient = patient
+        return session
+
+    def connect(self, device_id, port, patient=None):
+        """Open a device's port on the loop; raises if the port can't be opened.
+
+        The supervisor keeps it connected from then on.
+        """
+        session = self.add(device_id, port, patient)
+        session.wanted = True
+        self.supervisor.start()
+        return self.runner.run(session.open(port))
+
+    def request_connect(self, device_id, port=None, patient=None):
+        """Ask the supervisor to open a device in the background; returns at once"""
+        session = self.add(device_id, port, patient)
+        session.wanted = True
+        session.next_attempt = 0.0
+        session.backoff = RECONNECT_BACKOFF
+        self.supervisor.start()
+        self.supervisor.wake()
+        return session
+
+    def disconnect(self, device_id):
+        session = self._sessions.get(device_id)
+        if session is None:
+            return False
+        session.wanted = False
+        if session.connected:
+            self.runner.call_soon(session.close)
+            logger.info(f"[{device_id}] Disconnected from {session.port}")
+            return True
+        return False
+
+    def remove(self, device_id):
+        self.disconnect(device_id)
+        with self._lock:
+            session = self._sessions.pop(device_id, None)
+        if session is None:
+            return False
+        session.track.close()
+        return True
+
+    def load(self, path=DEVICES_FILE):
+        """Register devices from devices.json; the supervisor opens the ones with a port"""
+        for entry in load_device_config(path):
+            device_id = entry.get('device_id')
+            if not device_id:
+                continue
+            if entry.get('port'):
+                self.request_connect(device_id, entry['port'], entry.get('patient'))
+            else:
+                self.add(device_id, patient=entry.get('patient'))
+        return len(self._sessions)
+
+    def snapshot(self):
+        return [session.status() for session in self.sessions()]
+
+    def stop(self):
+        self.supervisor.stop()
+        for session in self.sessions():
+            session.wanted = False
+            if session.connected:
+                self.runner.call_soon(session.close)
+            session.track.close()
+        self.runner.stop()
@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+Virtual Synapse AR wearable for testing without hardware.
+
+The simulator exposes a serial port (a pseudo-terminal on Linux/macOS, or a
+TCP socket usable as pyserial's socket://host:port) that speaks the ar.ino
+terminal protocol: commands such as menu, 1, 2, 6, 7, status, ping,
+button_press, med/sch/emergency and reminder are answered with
+CMD_RECEIVED ... CMD_END just like the firmware, while sensor readings are
+streamed as "--- Received Sensor Data ---" text blocks and/or SENSOR_DATA:
+lines, with a GPS_DATA: fix after each reading.
+
+Readings come from a synthetic generator or from a recording of real serial
+traffic (see --record), replayed at up to 1000x real time:
+
+    python device_simulator.py                       # one device, real time
+    python device_simulator.py --speed 100 --count 5 # five devices, 100x
+    python device_simulator.py --replay capture.log --speed 1000
+    python device_simulator.py --record capture.log --port /dev/ttyUSB0
+
+Point synapse_web.py at the printed port (or devices.json snippet).
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 1.0           # Seconds of device time between readings
+MAX_SPEED = 1000.0               # Fastest supported replay multiplier
+
+FORMAT_TEXT = 'text'             # ar.ino "--- Received Sensor Data ---" blocks
+FORMAT_DIRECT = 'direct'         # SENSOR_DATA:hr,hrAvg,spo2,spo2Avg,temp,fall,valid
+FORMAT_BOTH = 'both'
+
+DEFAULT_MEDICINES = ["DICLOWIN 650 9 PM", "IMEGLYN 1000 8 AM", "Crocin 2 PM", "Dolo 6 PM"]
+DEFAULT_SCHEDULE = ["7 AM - Breakfast", "1.10 PM - Lunch", "8 PM - Dinner", "9 PM - Medicine"]
+
+
+def format_text_block(reading):
+    """Sensor block exactly as ar.ino's OnDataRecv prints it"""
+    return [
+        "",
+        "--- Received Sensor Data ---",
+        f"Heart Rate: {reading['heartRate']:.2f} BPM (Avg: {reading['heartRateAvg']} BPM)",
+        f"SPO2: {reading['spo2']}% (Avg: {reading['spo2Avg']}%)",
+        f"Temperature: {reading['temperature']:.2f}°C",
+        f"Fall Detected: {'YES!' if reading['fallDetected'] else 'No'}",
+        f"Readings Valid: {'Yes' if reading['validReadings'] else 'No'}",
+        "-------------------------"
+    ]
+
+
+def format_direct_line(reading):
+    return (f"SENSOR_DATA:{reading['heartRate']:.0f},{reading['heartRateAvg']},{reading['spo2']},"
+            f"{reading['spo2Avg']},{reading['temperature']:.1f},{int(reading['fallDetected'])},"
+            f"{int(reading['validReadings'])}")
+
+
+def generate_readings(seed=None, fall_every=0, interval=DEFAULT_INTERVAL):
+    """Endless synthetic vitals: (device_time, reading) with an optional fall every fall_every s"""
+    rng = random.Random(seed)
+    heart_rate, spo2, temperature = 75.0, 97.0, 36.6
+    hr_window = []
+    t = 0.0
+    next_fall = fall_every if fall_every else None
+    while True:
+        # Bounded random walks around resting values
+        heart_rate = min(max(heart_rate + rng.gauss(0, 1.5) + (75 - heart_rate) * 0.05, 40), 160)
+        spo2 = min(max(spo2 + rng.gauss(0, 0.4) + (97 - spo2) * 0.1, 85), 100)
+        temperature = min(max(temperature + rng.gauss(0, 0.02) + (36.6 - temperature) * 0.02, 35), 41)
+        hr_window = (hr_window + [heart_rate])[-10:]
+
+        fall = next_fall is not None and t >= next_fall
+        if fall:
+            next_fall += fall_every
+
+        yield t, {
+            "heartRate": heart_rate,
+            "heartRateAvg": int(sum(hr_window) / len(hr_window)),
+            "spo2": int(round(spo2)),
+            "spo2Avg": int(round(spo2)),
+            "temperature": temperature,
+            "fallDetected": fall,
+            "validReadings": True
+        }
+        t += interval
+
+
+def load_recording(path):
+    """Recorded traffic: one "<seconds>\\t<line>" per serial line"""
+    events = []
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for raw in f:
+            raw = raw.rstrip("\n")
+            if not raw:
+                continue
+            offset, _, line = raw.partition("\t")
+            try:
+                events.append((float(offset), line))
+            except ValueError:
+                # Plain captures without timestamps replay at one line per 10 ms
+                events.append((len(events) * 0.01, raw))
+    return events
+
+
+def record_serial(port, path, duration=None, baudrate=115200):
+    """Capture a real device's serial output for later replay"""
+    import serial
+
+    start = time.time()
+    count = 0
+    with serial.Serial(port, baudrate, timeout=1) as ser, open(path, 'w', encoding='utf-8') as out:
+        print(f"Recording {port} to {path} (Ctrl+C to stop)")
+        try:
+            while duration is None or time.time() - start < duration:
+                line = ser.readline()
+                if not line:
+                    continue
+                out.write(f"{time.time() - start:.3f}\t{line.decode('utf-8', errors='replace').rstrip()}\n")
+                count += 1
+        except KeyboardInterrupt:
+            pass
+    print(f"Recorded {count} lines")
+    return count
+
+
+class PtyLink:
+    """Pseudo-terminal pair; clients open .port like any serial device"""
+
+    def __init__(self):
+        import pty
+        import tty
+        self.master, self._slave = pty.openpty()
+        # Raw mode so the line discipline doesn't echo or translate our output
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+
+    def read(self, size=4096):
+        try:
+            return os.read(self.master, size)
+        except OSError:
+            # No client has the port open
+            time.sleep(0.05)
+            return b""
+
+    def write(self, data):
+        os.write(self.master, data)
+
+    def close(self):
+        for fd in (self.master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class TcpLink:
+    """TCP server for pyserial's socket:// URLs (works on every platform)"""
+
+    def __init__(self, port=0):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(('127.0.0.1', port))
+        self.server.listen(1)
+        self.port = f"socket://127.0.0.1:{self.server.getsockname()[1]}"
+        self.client = None
+        self._closed = False
+
+    def read(self, size=4096):
+        if self.client is None:
+            try:
+                self.client, _ = self.server.accept()
+            except OSError:
+                return b""
+        try:
+            data = self.client.recv(size)
+        except OSError:
+            data = b""
+        if not data:
+            self.client = None
+        return data
+
+    def write(self, data):
+        if self.client is None:
+            # Like a UART with nothing attached: output is lost
+            return
+        try:
+            self.client.sendall(data)
+        except OSError:
+            self.client = None
+
+    def close(self):
+        self._closed = True
+        for sock in (self.client, self.server):
+            if sock is not None:
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+
+
+class SimulatedDevice:
+    """ar.ino terminal protocol plus a telemetry stream on a virtual port"""
+
+    def __init__(self, link=None, speed=1.0, output_format=FORMAT_TEXT, replay=None, seed=None,
+                 fall_every=0, interval=DEFAULT_INTERVAL, loop=True, stream=True):
+        self.link = link or (PtyLink() if hasattr(os, 'openpty') else TcpLink())
+        self.speed = min(max(speed, 0.01), MAX_SPEED)
+        self.output_format = output_format
+        self.replay = load_recording(replay) if replay else None
+        self.seed = seed
+        self.fall_every = fall_every
+        self.interval = interval
+        self.loop = loop
+        # With stream=False readings are only sent through emit_reading() (e.g. by benchmarks)
+        self.stream = stream
+
+        self.medicines = list(DEFAULT_MEDICINES)
+        self.schedule = list(DEFAULT_SCHEDULE)
+        self.emergency_contact = "Dr Shravya"
+        self.emergency_number = "+91 8807612060"
+        self.current_page = 4
+        self.gps = {"valid": True, "lat": 13.0827, "lng": 80.2707, "alt": 12.0, "sats": 7}
+        self.last_reading = None
+
+        self.readings_sent = 0
+        self.commands_handled = 0
+        self.running = False
+        self._write_lock = threading.Lock()
+        self._threads = []
+
+    @property
+    def port(self):
+        return self.link.port
+
+    # --- Output --------------------------------------------------------------
+
+    def write_lines(self, lines):
+        # One write per batch so a command reply never interleaves with a sensor block
+        data = "".join(line + "\r\n" for line in lines).encode('utf-8')
+        with self._write_lock:
+            self.link.write(data)
+
+    def emit_reading(self, reading):
+        self.last_reading = reading
+        lines = []
+        if self.output_format in (FORMAT_TEXT, FORMAT_BOTH):
+            lines += format_text_block(reading)
+        if self.output_format in (FORMAT_DIRECT, FORMAT_BOTH):
+            lines.append(format_direct_line(reading))
+        self.write_lines(lines)
+        self.readings_sent += 1
+
+    def emit_gps(self):
+        """GPS_DATA push line, sent once a second like the firmware"""
+        gps = self.gps
+        self.write_lines([f"GPS_DATA:{gps['lat']:.6f},{gps['lng']:.6f},{gps['alt']:.1f},{gps['sats']},"
+                          f"{1 if gps['valid'] else 0}"])
+
+    # --- Commands ------------------------------------------------------------
+
+    def handle_command(self, command):
+        """Reply lines for one command, mirroring ar.ino's processCommand"""
+        command = command.strip()
+        self.commands_handled += 1
+        out = [f"CMD_RECEIVED:{command}"]
+
+        if command in ("B", "button_press"):
+            self.current_page = (self.current_page + 1) % 6
+            out += [f"Page changed to: {self.current_page}", "Page changed successfully"]
+        elif command.startswith("detected_med ") or command.startswith("reminder "):
+            name, sep, status = command.split(" ", 1)[1].partition("|")
+            if sep:
+                if command.startswith("reminder "):
+                    self.current_page = 0
+                    out += [f"Reminder: {name}"]
+                else:
+                    out += [f"Medicine detected: {name}", f"Status: {status}"]
+        elif command.startswith("page "):
+            try:
+                page = int(command[5:])
+            except ValueError:
+                page = -1
+            if 0 <= page < 6:
+                self.current_page = page
+                out.append(f"Switched to page: {page}")
+        elif command == "1":
+            out += ["", "--- Current Medicines ---"]
+            out += [f"{i + 1}. {name}" for i, name in enumerate(self.medicines)]
+            out.append("-------------------------")
+        elif command == "2":
+            out += ["", "--- Current Schedule ---"]
+            out += [f"{i + 1}. {item}" for i, item in enumerate(self.schedule)]
+            out.append("-------------------------")
+        elif command == "6":
+            out += ["", "--- Show GPS Data ---"]
+            if self.gps["valid"]:
+                out += [f"Latitude: {self.gps['lat']:.6f}", f"Longitude: {self.gps['lng']:.6f}",
+                        f"Altitude: {self.gps['alt']:.1f} meters", f"Satellites: {self.gps['sats']}"]
+            else:
+                out.append("GPS signal not acquired yet")
+        elif command in ("7", "hr"):
+            out += ["", "--- Heart Rate Data ---"]
+            reading = self.last_reading
+            if reading and reading["validReadings"]:
+                out += [f"Current BPM: {reading['heartRate']:.0f}", f"Average BPM: {reading['heartRateAvg']}",
+                        f"Valid Readings: YesHR_DATA:{reading['heartRate']:.0f},100"]
+            else:
+                # The firmware prints this without a newline, so it shares a line with CMD_END
+                out += ["Waiting for heart rate data from mix device"]
+                return out + ["HR_DATA:0,0CMD_END"]
+        elif command in ("menu", "0", "help"):
+            out += ["", "====================================",
+                    "   SYNAPSE AR TERMINAL INTERFACE",
+                    "====================================",
+                    "1 - List Medicines", "2 - List Schedule", "3 - Update Medicine",
+                    "4 - Update Schedule", "5 - Update Emergency Contact", "6 - Show GPS Data",
+                    "7 - Show Heart Rate Data", "8 - Show Ultrasonic Data",
+                    "ultrasonic on/off - Toggle obstacle detection", "0 - Show this menu",
+                    "====================================",
+                    f"Current Status: Display showing page {self.current_page + 1}/6",
+                    "Type a command:"]
+        elif command.startswith("med ") or command.startswith("sch "):
+            out += self._update_list(command)
+        elif command.startswith("emergency "):
+            params = command[10:]
+            pos = next((i for i, c in enumerate(params) if c == '+' or c.isdigit()), -1)
+            if pos > 0:
+                self.emergency_contact = params[:pos].strip()
+                self.emergency_number = params[pos:].strip()
+                out += ["Emergency contact updated:", f"Name: {self.emergency_contact}",
+                        f"Number: {self.emergency_number}"]
+            else:
+                out += ["Invalid format. Use: emergency [name] [number]", "Number must start with + or a digit"]
+        elif command == "status":
+            reading = self.last_reading
+            out += ["", "--- Device Status ---", "Device: Synapse AR",
+                    f"Current Page: {self.current_page + 1}",
+                    f"Heart Rate: {reading['heartRate']:.0f} BPM" if reading else "Heart Rate: Not measured",
+                    f"GPS: {'Connected' if self.gps['valid'] else 'Not connected'}",
+                    "Ultrasonic: Enabled (120 cm)",
+                    "===================================="]
+        elif command == "ping":
+            out.append("pong")
+        elif command:
+            out.append("Unknown command. Type 'menu' or 'help' for options.")
+
+        out.append("CMD_END")
+        return out
+
+    def _update_list(self, command):
+        kind, params = command[:3], command[4:]
+        items, label = (self.medicines, "Medicine") if kind == "med" else (self.schedule, "Schedule")
+        index, sep, value = params.partition(" ")
+        if not sep:
+            return [f"Invalid format. Use: {kind} [index] [{'name' if kind == 'med' else 'details'}]"]
+        try:
+            index = int(index) - 1
+        except ValueError:
+            index = -1
+        if not 0 <= index < 4:
+            return ["Invalid index. Use 1-4."]
+        items[index] = value
+        return [f"{label} {index + 1} updated to: {value}"]
+
+    # --- Threads -------------------------------------------------------------
+
+    def _command_loop(self):
+        buffer = b""
+        while self.running:
+            data = self.link.read()
+            if not data:
+                continue
+            buffer += data
+            while True:
+                # The firmware accepts \n or \r as terminators
+                cut = min((i for i in (buffer.find(b"\n"), buffer.find(b"\r")) if i >= 0), default=-1)
+                if cut < 0:
+                    break
+                line, buffer = buffer[:cut], buffer[cut + 1:]
+                command = line.decode('utf-8', errors='replace').strip()
+                if command:
+                    self.write_lines(self.handle_command(command))
+
+    def _telemetry_loop(self):
+        while self.running:
+            start = time.time()
+            if self.replay is not None:
+                for offset, line in self.replay:
+                    if not self._wait_until(start + offset / self.speed):
+                        return
+                    self.write_lines([line])
+                    if line.startswith("-------------------------") or line.startswith("SENSOR_DATA:"):
+                        self.readings_sent += 1
+            else:
+                for offset, reading in generate_readings(self.seed, self.fall_every, self.interval):
+                    if not self._wait_until(start + offset / self.speed):
+                        return
+                    self.emit_reading(reading)
+                    self.emit_gps()
+            if not self.loop:
+                return
+
+    def _wait_until(self, deadline):
+        # Scheduling against the start time keeps high speeds from drifting
+        delay = deadline - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        return self.running
+
+    def start(self):
+        self.running = True
+        targets = (self._command_loop, self._telemetry_loop) if self.stream else (self._command_loop,)
+        for target in targets:
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Simulated device on {self.port} ({self.speed:g}x)")
+        return self
+
+    def stop(self):
+        self.running = False
+        self.link.close()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+
+    def stats(self):
+        return {"port": self.port, "readings_sent": self.readings_sent, "commands_handled": self.commands_handled}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Simulate Synapse AR wearables on virtual serial ports')
+    parser.add_argument('--speed', type=float, default=1.0, help=f'Time multiplier (up to {MAX_SPEED:g}x)')
+    parser.add_argument('--count', type=int, default=1, help='Number of devices to simulate')
+    parser.add_argument('--format', choices=[FORMAT_TEXT, FORMAT_DIRECT, FORMAT_BOTH], default=FORMAT_TEXT,
+                        help='Sensor output format')
+    parser.add_argument('--replay', help='Replay a recording made with --record instead of generating readings')
+    parser.add_argument('--record', help='Record a real device to this file (requires --port)')
+    parser.add_argument('--port', help='Real serial port to record from')
+    parser.add_argument('--duration', type=float, help='Seconds to record')
+    parser.add_argument('--fall-every', type=float, default=0, help='Simulate a fall every N seconds of device time')
+    parser.add_argument('--tcp', action='store_true', help='Serve socket:// ports instead of pseudo-terminals')
+    parser.add_argument('--seed', type=int, help='Random seed for generated readings')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.record:
+        if not args.port:
+            parser.error("--record needs --port")
+        record_serial(args.port, args.record, args.duration)
+        sys.exit(0)
+
+    devices = []
+    for i in range(args.count):
+        link = TcpLink() if args.tcp else None
+        seed = None if args.seed is None else args.seed + i
+        devices.append(SimulatedDevice(link, args.speed, args.format, args.replay, seed, args.fall_every).start())
+
+    config = {"devices": [
+        {"device_id": f"sim-{i + 1}", "port": device.port, "patient": {"id": f"sim-{i + 1}", "name": f"Simulated {i + 1}"}}
+        for i, device in enumerate(devices)
+    ]}
+    print("Simulated devices running. devices.json entry:")
+    print(json.dumps(config, indent=4))
+
+    try:
+        while True:
+            time.sleep(5)
+            for device in devices:
+                logger.info(f"{device.port}: {device.stats()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for device in devices:
+            device.stop()
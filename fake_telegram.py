@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Telegram Bot API.
+
+Point the alert system at it with
+    TELEGRAM_API_URL='http://localhost:8082/bot{0}/{1}' python telegram_alerts.py
+and every sendMessage call is recorded (with its arrival time) instead of being
+delivered. Delays and failures can be injected to exercise retry handling.
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+DEFAULT_PORT = 8082
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        # Keep test output readable
+        pass
+
+    def _read_params(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8') if length else ''
+        content_type = self.headers.get('Content-Type', '')
+        if 'application/json' in content_type:
+            return json.loads(body or '{}')
+        params = {k: v[0] for k, v in parse_qs(body).items()}
+        if '?' in self.path:
+            params.update({k: v[0] for k, v in parse_qs(self.path.split('?', 1)[1]).items()})
+        return params
+
+    def _reply(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, str(value))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.do_POST()
+
+    def do_POST(self):
+        server = self.server
+        # Paths look like /bot<token>/<method>
+        method = self.path.split('?', 1)[0].rstrip('/').rsplit('/', 1)[-1]
+        params = self._read_params()
+
+        if server.delay:
+            time.sleep(server.delay)
+
+        if method == 'getMe':
+            self._reply(200, {"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "FakeBot",
+                                                     "username": "fake_bot"}})
+            return
+        if method == 'getUpdates':
+            self._reply(200, {"ok": True, "result": []})
+            return
+        if method != 'sendMessage':
+            self._reply(200, {"ok": True, "result": True})
+            return
+
+        if server.fail_rate and random.random() < server.fail_rate:
+            server.record_failure()
+            self._reply(429, {"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                              "parameters": {"retry_after": 1}}, headers={"Retry-After": 1})
+            return
+
+        message = server.record_message(params)
+        self._reply(200, {"ok": True, "result": {
+            "message_id": message["message_id"],
+            "date": int(message["received_at"]),
+            "chat": {"id": params.get("chat_id"), "type": "group"},
+            "text": params.get("text", "")
+        }})
+
+
+class FakeTelegramServer(ThreadingHTTPServer):
+    """Threaded HTTP server that records Bot API messages"""
+    daemon_threads = True
+
+    def __init__(self, port=DEFAULT_PORT, delay=0.0, fail_rate=0.0, verbose=False):
+        super().__init__(('127.0.0.1', port), FakeTelegramHandler)
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.verbose = verbose
+        self.messages = []
+        self.failures = 0
+        self._cond = threading.Condition()
+        self._thread = None
+
+    @property
+    def api_url(self):
+        """Value for telebot.apihelper.API_URL / TELEGRAM_API_URL"""
+        return f"http://127.0.0.1:{self.server_address[1]}/bot{{0}}/{{1}}"
+
+    def record_message(self, params):
+        with self._cond:
+            message = {
+                "message_id": len(self.messages) + 1,
+                "chat_id": params.get("chat_id"),
+                "text": params.get("text", ""),
+                "received_at": time.time()
+            }
+            self.messages.append(message)
+            self._cond.notify_all()
+        if self.verbose:
+            print(f"[{time.strftime('%H:%M:%S')}] chat {message['chat_id']}: {message['text']}\n")
+        return message
+
+    def record_failure(self):
+        with self._cond:
+            self.failures += 1
+
+    def wait_for_message(self, contains, timeout=10.0, after=0.0):
+        """Block until a message containing the text arrives; returns it or None"""
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                for message in self.messages:
+                    if message["received_at"] >= after and contains in message["text"]:
+                        return message
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run a local fake Telegram Bot API')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port to listen on')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds to delay every response')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of sendMessage calls answered with 429')
+    args = parser.parse_args()
+
+    server = FakeTelegramServer(args.port, args.delay, args.fail_rate, verbose=True)
+    print(f"Fake Telegram API listening. Use TELEGRAM_API_URL='{server.api_url}'")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
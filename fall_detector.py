@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Host-side fall detection from the wearable's raw IMU stream.
+
+The mix device batches raw MPU6050 samples at 50 Hz and the AR device
+forwards each batch as one line:
+
+    IMU_DATA:<start ms>,<interval ms>,ax,ay,az,gx,gy,gz,ax,ay,...
+
+FallDetector looks for the signature of a fall: a free-fall trough in the
+acceleration magnitude, an impact peak right after it, then inactivity (the
+wearer lying still) in a changed orientation. Each stage is scored from 0 to 1
+and the weighted sum is the event's confidence. Every threshold lives in
+fall_detection.json, so detection can be tuned (and checked against a
+recording with this script) without reflashing the firmware:
+
+    python fall_detector.py capture.log --set impact_g=2.2 --set min_confidence=0.5
+
+Samples go into a preallocated NumPy buffer and each batch is converted and
+scanned with array operations; only candidate impacts, a few per fall, are
+looked at individually.
+"""
+import os
+import json
+import math
+import logging
+import argparse
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+IMU_DATA_PREFIX = "IMU_DATA:"
+FALL_CONFIG_FILE = 'fall_detection.json'
+
+ACCEL_SCALE = 4096.0             # LSB per g at the ±8 g range mix.ino sets (±2 g would clip impacts)
+GYRO_SCALE = 131.07              # LSB per °/s at ±250 °/s
+PRE_FALL_WINDOW = 1.0            # Seconds before the free fall used for the upright orientation
+PEAK_WINDOW = 0.5                # Seconds after the first threshold crossing searched for the peak
+HISTORY = 8.0                    # Seconds of samples kept; must cover every window around an impact
+
+DEFAULT_FALL_CONFIG = {
+    # Calibration offsets from mix.ino (raw units at ±8 g, subtracted before scaling)
+    "accel_offset": [512, 19, 487],
+    "gyro_offset": [-270, 351, -136],
+    "free_fall_g": 0.5,          # Magnitude counted as full free fall
+    "impact_g": 2.5,             # Magnitude that starts a candidate fall
+    "free_fall_window": 1.0,     # Seconds before the impact searched for the trough
+    "settle_time": 1.0,          # Seconds after the impact before inactivity is measured
+    "inactivity_window": 2.0,    # Seconds of inactivity measured
+    "inactivity_std_g": 0.08,    # Magnitude spread counted as fully still
+    "inactivity_dps": 15.0,      # Mean rotation rate counted as fully still
+    "orientation_change_deg": 45.0,
+    "min_confidence": 0.6,       # Events below this are ignored
+    "refractory": 5.0,           # Seconds after an impact before another is considered
+    "weights": {"impact": 0.3, "free_fall": 0.25, "inactivity": 0.3, "orientation": 0.15}
+}
+
+
+def load_fall_config(path=FALL_CONFIG_FILE):
+    """DEFAULT_FALL_CONFIG overridden by fall_detection.json, if present"""
+    config = json.loads(json.dumps(DEFAULT_FALL_CONFIG))
+    try:
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                overrides = json.load(f)
+            for key, value in overrides.items():
+                if key not in config:
+                    logger.warning(f"Unknown fall detection setting: {key}")
+                elif key == "weights":
+                    config["weights"].update(value)
+                else:
+                    config[key] = value
+            logger.info(f"Loaded fall detection settings from {path}")
+    except Exception as e:
+        logger.error(f"Error loading fall detection settings: {e}")
+    return config
+
+
+def parse_imu_line(line):
+    """IMU_DATA line -> (start_ms, interval_ms, raw samples as an (n, 6) array), or None"""
+    fields = line.split(IMU_DATA_PREFIX, 1)[-1].strip().split(',')
+    if len(fields) < 8 or (len(fields) - 2) % 6:
+        return None
+    try:
+        values = np.array(fields, dtype=np.float64)
+    except ValueError:
+        return None
+    return values[0], values[1], values[2:].reshape(-1, 6)
+
+
+def _ramp(value, full, zero):
+    """1.0 at or below `full`, 0.0 at or above `zero`, linear between"""
+    if zero == full:
+        return 1.0 if value <= full else 0.0
+    return float(min(1.0, max(0.0, (zero - value) / (zero - full))))
+
+
+class FallDetector:
+    """Windowed fall detector over one device's IMU samples"""
+
+    def __init__(self, config=None):
+        self.config = config or load_fall_config()
+        self.accel_offset = np.array(self.config["accel_offset"], dtype=np.float64)
+        self.gyro_offset = np.array(self.config["gyro_offset"], dtype=np.float64)
+        self.samples = 0
+        self._capacity = 0
+        self._count = 0
+        self._pending = []               # Impact times waiting for their inactivity window
+        self._refractory_until = -math.inf
+        self._last_time = None
+
+    def _allocate(self, rate):
+        # Twice the history so old samples are dropped in one copy per HISTORY seconds
+        self._keep = max(int(HISTORY * rate), 64)
+        self._capacity = 2 * self._keep
+        self._times = np.empty(self._capacity)
+        self._accel = np.empty((self._capacity, 3))
+        self._magnitude = np.empty(self._capacity)
+        self._rotation = np.empty(self._capacity)
+        self._count = 0
+
+    def reset(self):
+        """Forget all samples (device restarted or the stream jumped)"""
+        self._count = 0
+        self._pending = []
+        self._refractory_until = -math.inf
+        self._last_time = None
+
+    def _append(self, times, accel, magnitude, rotation):
+        n = len(times)
+        if self._count + n > self._capacity:
+            keep = min(self._keep, self._count)
+            drop = self._count - keep
+            for buffer in (self._times, self._accel, self._magnitude, self._rotation):
+                buffer[:keep] = buffer[drop:self._count]
+            self._count = keep
+        end = self._count + n
+        self._times[self._count:end] = times
+        self._accel[self._count:end] = accel
+        self._magnitude[self._count:end] = magnitude
+        self._rotation[self._count:end] = rotation
+        self._count = end
+
+    def _window(self, start, end):
+        """Buffer slice for device times in [start, end)"""
+        times = self._times[:self._count]
+        return slice(np.searchsorted(times, start), np.searchsorted(times, end))
+
+    def process(self, start_ms, interval_ms, raw):
+        """Add one batch of raw samples; returns the fall events it completes"""
+        n = len(raw)
+        if n == 0:
+            return []
+        interval = max(float(interval_ms), 1.0) / 1000.0
+        times = float(start_ms) / 1000.0 + np.arange(n) * interval
+        if self._capacity == 0:
+            self._allocate(1.0 / interval)
+        if self._last_time is not None and times[0] <= self._last_time - 1.0:
+            # millis() went backwards: the wearable rebooted
+            self.reset()
+        self._last_time = float(times[-1])
+
+        accel = (raw[:, :3] - self.accel_offset) / ACCEL_SCALE
+        gyro = (raw[:, 3:] - self.gyro_offset) / GYRO_SCALE
+        magnitude = np.sqrt(np.einsum('ij,ij->i', accel, accel))
+        rotation = np.sqrt(np.einsum('ij,ij->i', gyro, gyro))
+        self._append(times, accel, magnitude, rotation)
+        self.samples += n
+
+        config = self.config
+        for i in np.flatnonzero(magnitude >= config["impact_g"]):
+            if times[i] >= self._refractory_until:
+                self._pending.append(float(times[i]))
+                self._refractory_until = self._pending[-1] + config["refractory"]
+
+        events = []
+        ready = times[-1] - config["settle_time"] - config["inactivity_window"]
+        while self._pending and self._pending[0] <= ready:
+            event = self._evaluate(self._pending.pop(0))
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _evaluate(self, impact):
+        """Score the windows around one impact"""
+        config = self.config
+        magnitude = self._magnitude
+        free_fall_start = impact - config["free_fall_window"]
+        still_start = impact + config["settle_time"]
+        still_end = still_start + config["inactivity_window"]
+
+        peak_window = self._window(impact, impact + PEAK_WINDOW)
+        trough_window = self._window(free_fall_start, impact)
+        upright_window = self._window(free_fall_start - PRE_FALL_WINDOW, free_fall_start)
+        still_window = self._window(still_start, still_end)
+        if still_window.stop - still_window.start < 2:
+            return None
+
+        peak = float(magnitude[peak_window].max())
+        trough = float(magnitude[trough_window].min()) if trough_window.stop > trough_window.start else 1.0
+        spread = float(magnitude[still_window].std())
+        spin = float(self._rotation[still_window].mean())
+        if upright_window.stop > upright_window.start:
+            before = self._accel[upright_window].mean(axis=0)
+            after = self._accel[still_window].mean(axis=0)
+            cosine = np.dot(before, after) / (np.linalg.norm(before) * np.linalg.norm(after) or 1.0)
+            orientation = math.degrees(math.acos(max(-1.0, min(1.0, float(cosine)))))
+        else:
+            orientation = 0.0
+
+        scores = {
+            "impact": min(1.0, peak / (2 * config["impact_g"])),
+            "free_fall": _ramp(trough, config["free_fall_g"], 1.0),
+            "inactivity": (_ramp(spread, config["inactivity_std_g"], 3 * config["inactivity_std_g"]) +
+                           _ramp(spin, config["inactivity_dps"], 3 * config["inactivity_dps"])) / 2,
+            "orientation": min(1.0, orientation / config["orientation_change_deg"])
+        }
+        weights = config["weights"]
+        confidence = sum(weights[name] * score for name, score in scores.items()) / (sum(weights.values()) or 1.0)
+        if confidence < config["min_confidence"]:
+            logger.debug(f"Impact at {impact:.2f}s rejected (confidence {confidence:.2f}, {scores})")
+            return None
+        return {
+            "time": impact,
+            "confidence": round(confidence, 3),
+            "peak_g": round(peak, 2),
+            "trough_g": round(trough, 2),
+            "inactivity_std_g": round(spread, 3),
+            "rotation_dps": round(spin, 1),
+            "orientation_change_deg": round(orientation, 1),
+            "scores": {name: round(score, 3) for name, score in scores.items()}
+        }
+
+
+def main():
+    from device_simulator import load_recording
+
+    parser = argparse.ArgumentParser(description='Run the fall detector over a serial recording')
+    parser.add_argument('recording', help='Capture made with device_simulator.py --record')
+    parser.add_argument('--config', default=FALL_CONFIG_FILE, help='Fall detection settings file')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help='Override one setting, e.g. impact_g=2.2')
+    args = parser.parse_args()
+
+    config = load_fall_config(args.config)
+    for override in args.set:
+        key, _, value = override.partition('=')
+        if key not in config or key == "weights":
+            parser.error(f"Unknown setting: {key}")
+        config[key] = json.loads(value)
+
+    detector = FallDetector(config)
+    events = []
+    for _, line in load_recording(args.recording):
+        if line.startswith(IMU_DATA_PREFIX):
+            batch = parse_imu_line(line)
+            if batch is not None:
+                events.extend(detector.process(*batch))
+    print(f"{detector.samples} samples, {len(events)} falls")
+    for event in events:
+        print(json.dumps(event))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    main()
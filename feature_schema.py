@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Feature schemas shared by the training scripts and the prediction endpoints.
+
+Each model's schema fixes its column order, the request/dataset names each
+input is read from, the derived features and the categorical encodings, and
+turns records into float32 NumPy rows. train_models.py builds the training
+matrices with the same schema the server uses, so a feature can't be
+computed one way in training and another in serving, and the server needs
+no pandas.
+
+Training scripts stamp each model with its schema's version
+(`model.feature_schema_version`); predictors.py refuses a model stamped with
+another version. Bump a schema's version whenever its columns or encodings
+change, then retrain.
+
+Absent inputs take the schema default; values that are present but missing
+(None, NaN) stay NaN so a trained imputer can fill them.
+"""
+import math
+
+import numpy as np
+
+
+def _number(value):
+    if value is None or value == '':
+        return math.nan
+    return float(value)
+
+
+class Numeric:
+    """A numeric input read from the record"""
+
+    def __init__(self, name, default=None, aliases=()):
+        self.name = name
+        self.default = default
+        self.keys = (name, *aliases)
+        self.columns = [name]
+
+    def resolve(self, record, values):
+        for key in self.keys:
+            if key in record:
+                return record[key]
+        return self.default
+
+    def encode(self, value, row, offset):
+        row[offset] = _number(value)
+
+
+class Category(Numeric):
+    """A categorical input, one-hot encoded; unknown values encode as all zeros"""
+
+    def __init__(self, name, categories, default=None, aliases=()):
+        super().__init__(name, default, aliases)
+        self.categories = list(categories)
+        self._index = {category: i for i, category in enumerate(self.categories)}
+        self.columns = [f"{name}={category}" for category in self.categories]
+
+    def encode(self, value, row, offset):
+        row[offset:offset + len(self.categories)] = 0.0
+        i = self._index.get(value if value is None else str(value))
+        if i is not None:
+            row[offset + i] = 1.0
+
+
+class Derived(Numeric):
+    """A numeric feature computed from the inputs resolved before it"""
+
+    def __init__(self, name, function):
+        super().__init__(name)
+        self.function = function
+
+    def resolve(self, record, values):
+        try:
+            return self.function(values)
+        except (TypeError, ValueError):
+            return None
+
+
+class Bucket(Category):
+    """A categorical feature from binning a numeric one into right-closed intervals (as pd.cut)"""
+
+    def __init__(self, name, source, edges, labels):
+        super().__init__(name, labels)
+        self.source = source
+        self.edges = list(edges)
+
+    def resolve(self, record, values):
+        value = _number(values.get(self.source))
+        if math.isnan(value):
+            return None
+        # Values outside the outer edges go to the first/last bucket
+        for edge, label in zip(self.edges[1:], self.categories):
+            if value <= edge:
+                return label
+        return self.categories[-1]
+
+
+class FeatureSchema:
+    """Ordered features of one model"""
+
+    def __init__(self, name, version, features):
+        self.name = name
+        self.version = version
+        self.features = list(features)
+        self.columns = [column for feature in self.features for column in feature.columns]
+        self._offsets = []
+        offset = 0
+        for feature in self.features:
+            self._offsets.append(offset)
+            offset += len(feature.columns)
+
+    def __len__(self):
+        return len(self.columns)
+
+    def resolve(self, record):
+        """Inputs (with defaults) and derived values by feature name, in schema order"""
+        values = {}
+        for feature in self.features:
+            values[feature.name] = feature.resolve(record, values)
+        return values
+
+    def encode(self, values, out=None):
+        """float32 row for resolved values"""
+        row = np.empty(len(self.columns), dtype=np.float32) if out is None else out
+        for feature, offset in zip(self.features, self._offsets):
+            feature.encode(values[feature.name], row, offset)
+        return row
+
+    def row(self, record):
+        """(1, n) float32 matrix for one request, and the resolved values it was built from"""
+        values = self.resolve(record)
+        return self.encode(values).reshape(1, -1), values
+
+    def matrix(self, records):
+        """(len(records), n) float32 matrix, e.g. from DataFrame.to_dict('records')"""
+        matrix = np.empty((len(records), len(self.columns)), dtype=np.float32)
+        for i, record in enumerate(records):
+            self.encode(self.resolve(record), matrix[i])
+        return matrix
+
+
+HYPERTENSION_SCHEMA = FeatureSchema("hypertension", 1, [
+    Numeric('age', 45),
+    Numeric('male', 0),
+    Numeric('sysBP', 120),
+    Numeric('diaBP', 80),
+    Numeric('heartRate', 75)
+])
+
+CARDIAC_SCHEMA = FeatureSchema("cardiac", 1, [
+    Numeric('Age', 45),
+    Category('Sex', ['Female', 'Male'], 'Male', aliases=('Gender',)),
+    Numeric('Heart Rate', 75, aliases=('Heart_Rate',)),
+    Numeric('Diabetes', 0),
+    Numeric('Smoking', 0),
+    Numeric('Obesity', 0),
+    Numeric('Alcohol Consumption', 0),
+    Numeric('BMI', 24.5),
+    Numeric('Systolic BP', 120, aliases=('Systolic_BP',)),
+    Numeric('Diastolic BP', 80, aliases=('Diastolic_BP',)),
+    Derived('Pulse Pressure', lambda v: float(v['Systolic BP']) - float(v['Diastolic BP'])),
+    Derived('Age_BMI', lambda v: float(v['Age']) * float(v['BMI'])),
+    Bucket('Age_Bucket', 'Age', [0, 35, 50, 65, 100], ['young', 'mid', 'senior', 'elder']),
+    Bucket('BMI_Category', 'BMI', [0, 18.5, 24.9, 29.9, 100], ['underweight', 'normal', 'overweight', 'obese'])
+])
+
+ANXIETY_SCHEMA = FeatureSchema("anxiety", 1, [
+    Numeric('Age', 12),
+    Numeric('Number of Siblings', 1, aliases=('Siblings',)),
+    Numeric('Number of Bio. Parents', 2, aliases=('BioParents',)),
+    Numeric('Poverty Status', 0, aliases=('Poverty',)),
+    Numeric('Number of Impairments', 0, aliases=('Impairments',)),
+    Numeric('Number of Type A Stressors', 0, aliases=('StressorsA',)),
+    Numeric('Number of Type B Stressors', 0, aliases=('StressorsB',)),
+    Numeric('Frequency Temper Tantrums', 0, aliases=('Tantrums',)),
+    Numeric('Frequency Irritable Mood', 0, aliases=('Irritable',)),
+    Numeric('Number of Sleep Disturbances', 0, aliases=('Sleep',)),
+    Numeric('Number of Physical Symptoms', 0, aliases=('Physical',)),
+    Numeric('Number of Sensory Sensitivities', 0, aliases=('Sensory',)),
+    Numeric('Family History - Substance Abuse', 0, aliases=('Substance',)),
+    Numeric('Family History - Psychiatric Diagnosis', 0, aliases=('Psychiatric',))
+])
+
+SCHEMAS = {schema.name: schema for schema in (HYPERTENSION_SCHEMA, CARDIAC_SCHEMA, ANXIETY_SCHEMA)}
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Geofences for wander detection.
+
+Fences are loaded from geofences.json:
+
+    {"geofences": [
+        {"name": "home", "type": "circle", "center": [13.0827, 80.2707], "radius": 150},
+        {"name": "main road", "type": "polygon", "kind": "restricted",
+         "points": [[13.081, 80.268], [13.081, 80.274], [13.080, 80.274], [13.080, 80.268]]},
+        {"name": "day centre", "type": "circle", "center": [13.09, 80.28], "radius": 80, "devices": ["room-12"]}
+    ]}
+
+"safe" fences (the default) are places the patient should stay within;
+"restricted" fences are places they should not enter. A patient is wandering
+when outside every safe fence that applies to them, or inside a restricted one.
+
+Fences are bucketed on a coarse lat/lng grid, so each fix only tests the few
+fences whose bounding box covers its cell and hundreds of fences cost
+microseconds per fix. A change of state must hold for CONFIRM_FIXES fixes in
+a row before it counts, so GPS jitter at a fence edge doesn't flap.
+"""
+import os
+import json
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+GEOFENCES_FILE = 'geofences.json'
+GRID_SIZE = 0.01                 # Degrees per index cell (about 1.1 km)
+MAX_INDEXED_CELLS = 10000        # Larger fences are bbox-checked on every fix instead
+CONFIRM_FIXES = 3                # Consecutive fixes before an enter/exit counts
+
+KIND_SAFE = 'safe'
+KIND_RESTRICTED = 'restricted'
+
+METRES_PER_DEGREE = 111320.0
+
+
+class Geofence:
+    """Base class: name, kind, optional device scope and bounding box"""
+
+    def __init__(self, config):
+        self.name = config["name"]
+        self.kind = config.get("kind", KIND_SAFE)
+        if self.kind not in (KIND_SAFE, KIND_RESTRICTED):
+            raise ValueError(f"Unknown geofence kind {self.kind!r} for {self.name!r}")
+        devices = config.get("devices")
+        self.devices = set(devices) if devices else None
+        self.config = config
+        self.bbox = None             # (min_lat, min_lng, max_lat, max_lng)
+
+    def applies_to(self, device_id):
+        return self.devices is None or device_id in self.devices
+
+    def in_bbox(self, lat, lng):
+        min_lat, min_lng, max_lat, max_lng = self.bbox
+        return min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+
+    def contains(self, lat, lng):
+        raise NotImplementedError
+
+
+class CircleFence(Geofence):
+    def __init__(self, config):
+        super().__init__(config)
+        self.lat, self.lng = (float(v) for v in config["center"])
+        self.radius = float(config["radius"])
+        self._cos_lat = math.cos(math.radians(self.lat))
+        dlat = self.radius / METRES_PER_DEGREE
+        dlng = self.radius / (METRES_PER_DEGREE * max(self._cos_lat, 1e-6))
+        self.bbox = (self.lat - dlat, self.lng - dlng, self.lat + dlat, self.lng + dlng)
+        self._radius_sq = self.radius * self.radius
+
+    def contains(self, lat, lng):
+        y = (lat - self.lat) * METRES_PER_DEGREE
+        x = (lng - self.lng) * METRES_PER_DEGREE * self._cos_lat
+        return x * x + y * y <= self._radius_sq
+
+
+class PolygonFence(Geofence):
+    def __init__(self, config):
+        super().__init__(config)
+        self.points = [(float(lat), float(lng)) for lat, lng in config["points"]]
+        if len(self.points) < 3:
+            raise ValueError(f"Polygon geofence {self.name!r} needs at least 3 points")
+        lats = [p[0] for p in self.points]
+        lngs = [p[1] for p in self.points]
+        self.bbox = (min(lats), min(lngs), max(lats), max(lngs))
+
+    def contains(self, lat, lng):
+        # Ray casting
+        inside = False
+        points = self.points
+        j = len(points) - 1
+        for i in range(len(points)):
+            lat_i, lng_i = points[i]
+            lat_j, lng_j = points[j]
+            if (lat_i > lat) != (lat_j > lat):
+                crossing = lng_i + (lat - lat_i) * (lng_j - lng_i) / (lat_j - lat_i)
+                if lng < crossing:
+                    inside = not inside
+            j = i
+        return inside
+
+
+FENCE_TYPES = {
+    "circle": CircleFence,
+    "polygon": PolygonFence
+}
+
+
+def build_fence(config):
+    fence_type = config.get("type", "circle")
+    if fence_type not in FENCE_TYPES:
+        raise ValueError(f"Unknown geofence type {fence_type!r} for {config.get('name')!r}")
+    return FENCE_TYPES[fence_type](config)
+
+
+def _cell(value):
+    return int(math.floor(value / GRID_SIZE))
+
+
+class GeofenceIndex:
+    """All configured fences with a grid index for the spatial precheck"""
+
+    def __init__(self, fences=()):
+        self.fences = list(fences)
+        self._grid = {}
+        self._unindexed = []
+        for fence in self.fences:
+            min_lat, min_lng, max_lat, max_lng = fence.bbox
+            lat_cells = range(_cell(min_lat), _cell(max_lat) + 1)
+            lng_cells = range(_cell(min_lng), _cell(max_lng) + 1)
+            if len(lat_cells) * len(lng_cells) > MAX_INDEXED_CELLS:
+                self._unindexed.append(fence)
+                continue
+            for lat_cell in lat_cells:
+                for lng_cell in lng_cells:
+                    self._grid.setdefault((lat_cell, lng_cell), []).append(fence)
+
+    @classmethod
+    def load(cls, path=GEOFENCES_FILE):
+        """Fences from a JSON file; an empty index if it is missing or invalid"""
+        fences = []
+        try:
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    config = json.load(f)
+                for entry in config.get('geofences', []):
+                    try:
+                        fences.append(build_fence(entry))
+                    except (KeyError, TypeError, ValueError) as e:
+                        logger.error(f"Skipping geofence {entry.get('name')!r}: {e}")
+                logger.info(f"Loaded {len(fences)} geofences from {path}")
+        except Exception as e:
+            logger.error(f"Error loading geofences: {e}")
+        return cls(fences)
+
+    def __len__(self):
+        return len(self.fences)
+
+    def candidates(self, lat, lng):
+        """Fences whose bounding box holds the point"""
+        cell = self._grid.get((_cell(lat), _cell(lng)), ())
+        return [fence for fence in (*cell, *self._unindexed) if fence.in_bbox(lat, lng)]
+
+    def containing(self, lat, lng, device_id=None):
+        return [fence for fence in self.candidates(lat, lng)
+                if fence.applies_to(device_id) and fence.contains(lat, lng)]
+
+    def describe(self, device_id=None):
+        """Fence configs (for drawing on the map) that apply to a device"""
+        return [fence.config for fence in self.fences if fence.applies_to(device_id)]
+
+
+class GeofenceTracker:
+    """Confirmed inside/outside state of one device, updated fix by fix"""
+
+    def __init__(self, index, device_id, confirm=CONFIRM_FIXES):
+        self.index = index
+        self.device_id = device_id
+        self.confirm = max(1, confirm)
+        self.inside = None               # Names of fences we are confirmed inside; None before the first fix
+        self.location = None             # Fix that confirmed the current state
+        self._pending = None
+        self._pending_count = 0
+        self.has_safe = any(f.kind == KIND_SAFE and f.applies_to(device_id) for f in index.fences)
+        self._kinds = {f.name: f.kind for f in index.fences}
+
+    def update(self, lat, lng):
+        """Feed one fix; returns [(fence name, "enter"|"exit")] once a change is confirmed"""
+        current = frozenset(f.name for f in self.index.containing(lat, lng, self.device_id))
+        if current == self.inside:
+            self._pending, self._pending_count = None, 0
+            return []
+        if current == self._pending:
+            self._pending_count += 1
+        else:
+            self._pending, self._pending_count = current, 1
+        # The first fix sets the baseline without waiting
+        if self.inside is not None and self._pending_count < self.confirm:
+            return []
+
+        previous = self.inside or frozenset()
+        self.inside = current
+        self.location = [lat, lng]
+        self._pending, self._pending_count = None, 0
+        events = [(name, "exit") for name in sorted(previous - current)]
+        events += [(name, "enter") for name in sorted(current - previous)]
+        return events
+
+    @property
+    def wandering(self):
+        if self.inside is None:
+            return False
+        in_restricted = any(self._kinds.get(name) == KIND_RESTRICTED for name in self.inside)
+        in_safe = any(self._kinds.get(name) == KIND_SAFE for name in self.inside)
+        return in_restricted or (self.has_safe and not in_safe)
+
+    def status(self):
+        """Fields merged into the device's sensor_data"""
+        return {
+            "wandering": self.wandering,
+            "geofences": sorted(self.inside or ()),
+            "geofenceLocation": self.location
+        }
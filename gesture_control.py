@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Hand-gesture page switching for the web server's camera.
+
+Importing this module loads OpenCV and MediaPipe (over a second and a few
+hundred MB), so synapse_web.py only imports it when gesture detection is
+first started. Pinching the index finger and thumb together switches the AR
+display to its next page.
+"""
+import math
+import time
+import logging
+
+import cv2
+import numpy as np
+import mediapipe as mp
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+GESTURE_FRAME_SECONDS = metrics.histogram('synapse_gesture_frame_seconds', 'Gesture pipeline time per camera frame')
+GESTURE_SWITCHES = metrics.counter('synapse_gesture_page_switches_total', 'Page switches triggered by gestures')
+
+
+# Function to generate dotted line for gesture visualization
+def drawline(img, pt1, pt2, color, thickness=1, style='dotted', gap=20):
+    dist = ((pt1[0] - pt2[0]) ** 2 + (pt1[1] - pt2[1]) ** 2) ** .5
+    pts = []
+    for i in np.arange(0, dist, gap):
+        r = i / dist
+        x = int((pt1[0] * (1 - r) + pt2[0] * r) + .5)
+        y = int((pt1[1] * (1 - r) + pt2[1] * r) + .5)
+        p = (x, y)
+        pts.append(p)
+    if style == 'dotted':
+        for p in pts:
+            cv2.circle(img, p, thickness, color, -1)
+    else:
+        s = pts[0]
+        e = pts[0]
+        i = 0
+        for p in pts:
+            s = e
+            e = p
+            if i % 2 == 1:
+                cv2.line(img, s, e, color, thickness)
+            i += 1
+
+
+# Function to draw page indicators
+def draw_page_indicators(img, current_page, max_pages):
+    start_x = 10
+    y = 70
+    circle_radius = 10
+    spacing = 30
+    
+    for i in range(max_pages):
+        center = (start_x + i * spacing, y)
+        if i == current_page:
+            cv2.circle(img, center, circle_radius, (0, 255, 0), -1)  # Filled circle for current page
+        else:
+            cv2.circle(img, center, circle_radius, (128, 128, 128), 2)  # Empty circle for other pages
+
+
+def run(stop_event, switch_page, current_page, max_pages):
+    """Camera loop until stop_event is set or 'q' is pressed in the preview window.
+    
+    switch_page() is called on a pinch; current_page() gives the page shown in
+    the overlay.
+    """
+    logger.info("Starting gesture detection loop")
+    
+    # Mediapipe setup
+    mp_drawing = mp.solutions.drawing_utils
+    hand_mpDraw = mp.solutions.drawing_utils
+    mp_hands = mp.solutions.hands
+    
+    # Initialize camera
+    cap = cv2.VideoCapture(0)  # Try 0 first, can be changed to other camera indices
+    if not cap.isOpened():
+        logger.error("Failed to open camera with index 0, trying index 1")
+        cap = cv2.VideoCapture(1)
+        if not cap.isOpened():
+            logger.error("Failed to open camera with index 1, trying index 2")
+            cap = cv2.VideoCapture(2)
+            if not cap.isOpened():
+                logger.error("Failed to open any camera")
+                return
+    
+    distance = -1
+    last_switch_time = 0  # For debouncing
+    
+    # Start MediaPipe Hands
+    with mp_hands.Hands(
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5,
+            max_num_hands=2) as hands:
+            
+        while not stop_event.is_set() and cap.isOpened():
+            # Read frame
+            success, image = cap.read()
+            if not success:
+                logger.error("Failed to read frame from camera")
+                time.sleep(0.1)
+                continue
+            frame_start = time.perf_counter()
+                
+            # Process image
+            image = cv2.flip(image, 1)
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            image.flags.writeable = False
+            results = hands.process(image)
+            image.flags.writeable = True
+            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+            
+            # Draw instructions and page indicators
+            cv2.putText(image, "Join index finger and thumb to switch pages", (10, 30),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            draw_page_indicators(image, current_page(), max_pages)
+            cv2.putText(image, f"Current Page: {current_page()}", (10, 100),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            
+            # Process hand landmarks
+            if results.multi_hand_landmarks:
+                for hand_landmarks in results.multi_hand_landmarks:
+                    lmList = []
+                    for id, lm in enumerate(hand_landmarks.landmark):
+                        h, w, c = image.shape
+                        cx, cy = int(lm.x * w), int(lm.y * h)
+                        lmList.append([id, cx, cy])
+                        tips = [0, 4, 8, 12, 16, 20]
+                        if id in tips:
+                            cv2.circle(image, (cx, cy), 15, (0, 255, 0), cv2.FILLED)
+                    
+                    # Check if we have enough landmarks for index and thumb
+                    if len(lmList) > 8:
+                        # Calculate distance between index and thumb
+                        distance = math.hypot(lmList[8][1] - lmList[4][1], lmList[8][2] - lmList[4][2])
+                        
+                        # Check if fingers are close enough to trigger page switch
+                        current_time = time.time()
+                        if distance < 50 and (current_time - last_switch_time) > 1.0:
+                            logger.info(f"Fingers close! Distance: {distance}")
+                            
+                            switch_page()
+                            GESTURE_SWITCHES.inc()
+                                
+                            last_switch_time = current_time
+                        
+                        # Draw line between index and thumb
+                        drawline(image, (lmList[4][1], lmList[4][2]), (lmList[8][1], lmList[8][2]), (0, 0, 255),
+                               thickness=1, style='dotted', gap=10)
+                        
+                        # Add distance text to screen
+                        cv2.putText(image, f"Distance: {int(distance)}", (10, 150),
+                                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                    
+                    # Draw landmarks
+                    mp_drawing.draw_landmarks(
+                        image, hand_landmarks, mp_hands.HAND_CONNECTIONS,
+                        landmark_drawing_spec=hand_mpDraw.DrawingSpec(color=(0, 255, 0)),
+                        connection_drawing_spec=hand_mpDraw.DrawingSpec(color=(255, 0, 0)))
+            
+            # Display the frame
+            cv2.imshow('AR Gesture Control', image)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+            GESTURE_FRAME_SECONDS.observe(time.perf_counter() - frame_start)
+                
+            # Small delay to prevent high CPU usage
+            time.sleep(0.01)
+    
+    # Release resources
+    cap.release()
+    cv2.destroyAllWindows()
+    logger.info("Gesture detection loop stopped")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+GPS fix parsing shared by the serial sessions and the web server.
+
+The firmware pushes one line per second without being asked:
+
+    GPS_DATA:<lat>,<lng>,<alt m>,<satellites>,<valid 0/1>
+
+Sessions cache the latest fix as it arrives, so /api/gps is served from memory
+instead of blocking on a "6" command. parse_gps_response() still reads the
+"6" command reply (and the older unsolicited debug prints) for firmware that
+predates the push line.
+"""
+import re
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+GPS_DATA_PREFIX = "GPS_DATA:"
+NOT_ACQUIRED = "GPS signal not acquired yet"
+
+# Shown on the map until the first fix (Chennai)
+DEFAULT_LATITUDE = 13.0827
+DEFAULT_LONGITUDE = 80.2707
+
+
+def default_gps_data():
+    return {
+        "latitude": DEFAULT_LATITUDE,
+        "longitude": DEFAULT_LONGITUDE,
+        "altitude": 0.0,
+        "satellites": 0,
+        "valid": False,
+        "last_updated": None
+    }
+
+
+def parse_gps_line(line, now=None):
+    """Parse a GPS_DATA: push line into a fix dict, or None if malformed"""
+    parts = line.split(GPS_DATA_PREFIX, 1)[-1].strip().split(',')
+    if len(parts) < 5:
+        return None
+    try:
+        fix = {
+            "latitude": float(parts[0]),
+            "longitude": float(parts[1]),
+            "altitude": float(parts[2]),
+            "satellites": int(parts[3]),
+            "valid": parts[4].strip() == "1",
+            "last_updated": now or time.time()
+        }
+    except ValueError:
+        return None
+    if fix["latitude"] == 0 and fix["longitude"] == 0:
+        fix["valid"] = False
+    return fix
+
+
+def merge_fix(previous, fix):
+    """New GPS state from a fix: a fix without a position keeps the last good coordinates"""
+    updated = dict(previous)
+    updated["satellites"] = fix["satellites"]
+    updated["last_updated"] = fix["last_updated"]
+    if fix["valid"]:
+        updated.update(fix)
+    elif not previous.get("valid"):
+        updated["valid"] = False
+    return updated
+
+
+def parse_gps_response(response, previous=None):
+    """Parse a "6" command reply (or pushed lines) relative to the previous GPS state"""
+    updated_data = dict(previous) if previous is not None else default_gps_data()
+
+    try:
+        # Pushed lines carry the whole fix
+        fixes = [parse_gps_line(line) for line in response.split('\n') if line.strip().startswith(GPS_DATA_PREFIX)]
+        fixes = [fix for fix in fixes if fix]
+        if fixes:
+            return merge_fix(updated_data, fixes[-1])
+
+        # Check if GPS signal is not acquired yet; a previous good position is kept
+        if NOT_ACQUIRED in response:
+            logger.debug("Device reports GPS signal not acquired yet")
+            updated_data["last_updated"] = time.time()
+
+            # For better user experience, provide default coordinates
+            if updated_data["latitude"] == 0 and updated_data["longitude"] == 0:
+                updated_data["latitude"] = DEFAULT_LATITUDE
+                updated_data["longitude"] = DEFAULT_LONGITUDE
+            return updated_data
+
+        # Satellites-only response (partial data)
+        if "Satellites:" in response and len(response) < 50:
+            sat_match = re.search(r'\d+', response.split("Satellites:")[1])
+            if sat_match:
+                updated_data["satellites"] = int(sat_match.group())
+            # Update timestamp but don't mark as valid without coordinates
+            updated_data["last_updated"] = time.time()
+            if updated_data["latitude"] == 0 and updated_data["longitude"] == 0:
+                updated_data["latitude"] = DEFAULT_LATITUDE
+                updated_data["longitude"] = DEFAULT_LONGITUDE
+            return updated_data
+
+        found_coords = False
+        for line in response.split('\n'):
+            line = line.strip()
+            try:
+                # "Lat:"/"Lng:" come from the older firmware's debug prints
+                if line.startswith("Latitude:") or line.startswith("Lat:"):
+                    updated_data["latitude"] = float(line.split(":", 1)[1])
+                    found_coords = True
+                elif line.startswith("Longitude:") or line.startswith("Lng:"):
+                    updated_data["longitude"] = float(line.split(":", 1)[1])
+                    found_coords = True
+                elif line.startswith("Altitude:"):
+                    # Extract just the number from "X.X meters"
+                    updated_data["altitude"] = float(line.split(":", 1)[1].split()[0])
+                elif line.startswith("Satellites:"):
+                    updated_data["satellites"] = int(line.split(":", 1)[1])
+                elif line.startswith("$GPGGA"):
+                    # Altitude from a raw NMEA GGA sentence
+                    fields = line.split(',')
+                    if len(fields) >= 10 and fields[9]:
+                        updated_data["altitude"] = float(fields[9])
+            except (ValueError, IndexError):
+                logger.warning(f"Failed to parse GPS line: {line}")
+
+        if found_coords and updated_data["latitude"] != 0 and updated_data["longitude"] != 0:
+            updated_data["valid"] = True
+            updated_data["last_updated"] = time.time()
+        elif found_coords:
+            logger.warning("Got GPS data but coordinates are 0,0")
+        else:
+            logger.warning("GPS response didn't contain recognizable coordinate format")
+    except Exception as e:
+        logger.error(f"Error parsing GPS data: {e}")
+        # Keep existing data on parsing error
+
+    return updated_data
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Recent GPS track per wearable.
+
+TrackStore keeps the last TRACK_CAPACITY fixes in flat arrays (32 bytes per fix
+rather than a dict each) used as a ring buffer. Fixes pushed out of the ring
+can be appended to a CSV file so a whole day's route survives. Near-duplicate
+fixes from a patient sitting still are dropped.
+
+simplify() reduces a track with Douglas-Peucker before it is sent to the map.
+"""
+import os
+import math
+import logging
+import threading
+from array import array
+
+logger = logging.getLogger(__name__)
+
+TRACK_CAPACITY = 3600            # Fixes kept in memory (an hour at one per second)
+MIN_DISTANCE = 2.0               # Metres a fix must move to be stored...
+MAX_GAP = 60.0                   # ...unless this many seconds passed since the last stored fix
+SPILL_FLUSH_EVERY = 60           # Spilled fixes buffered before a flush
+SIMPLIFY_TOLERANCE = 5.0         # Metres; default Douglas-Peucker tolerance for the map
+
+EARTH_RADIUS = 6371000.0
+_DEG = math.pi / 180.0
+
+
+def distance_m(lat1, lng1, lat2, lng2):
+    """Equirectangular distance in metres; accurate to well under 1% at track scales"""
+    x = (lng2 - lng1) * _DEG * math.cos((lat1 + lat2) * 0.5 * _DEG)
+    y = (lat2 - lat1) * _DEG
+    return EARTH_RADIUS * math.hypot(x, y)
+
+
+class TrackStore:
+    """Ring buffer of (time, lat, lng, alt) fixes with optional disk spill"""
+
+    def __init__(self, capacity=TRACK_CAPACITY, spill_path=None, min_distance=MIN_DISTANCE, max_gap=MAX_GAP):
+        self.capacity = capacity
+        self.spill_path = spill_path
+        self.min_distance = min_distance
+        self.max_gap = max_gap
+        self._times = array('d', bytes(8 * capacity))
+        self._lats = array('d', bytes(8 * capacity))
+        self._lngs = array('d', bytes(8 * capacity))
+        self._alts = array('d', bytes(8 * capacity))
+        self._start = 0
+        self._count = 0
+        self._spill = None
+        self._spilled = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def add(self, t, lat, lng, alt=0.0):
+        """Store a fix; returns False if it was too close to the previous one"""
+        with self._lock:
+            if self._count:
+                last = (self._start + self._count - 1) % self.capacity
+                if (t - self._times[last] < self.max_gap and
+                        distance_m(self._lats[last], self._lngs[last], lat, lng) < self.min_distance):
+                    return False
+            if self._count == self.capacity:
+                self._spill_oldest()
+                index = self._start
+                self._start = (self._start + 1) % self.capacity
+            else:
+                index = (self._start + self._count) % self.capacity
+                self._count += 1
+            self._times[index] = t
+            self._lats[index] = lat
+            self._lngs[index] = lng
+            self._alts[index] = alt
+            return True
+
+    def _spill_oldest(self):
+        if not self.spill_path:
+            return
+        i = self._start
+        try:
+            if self._spill is None:
+                os.makedirs(os.path.dirname(self.spill_path) or '.', exist_ok=True)
+                self._spill = open(self.spill_path, 'a')
+            self._spill.write(f"{self._times[i]:.3f},{self._lats[i]:.6f},{self._lngs[i]:.6f},{self._alts[i]:.1f}\n")
+            self._spilled += 1
+            if self._spilled % SPILL_FLUSH_EVERY == 0:
+                self._spill.flush()
+        except OSError as e:
+            logger.error(f"Error spilling GPS track to {self.spill_path}: {e}")
+            self.spill_path = None
+
+    def points(self, since=None):
+        """Fixes in the ring, oldest first, as (t, lat, lng, alt) tuples"""
+        with self._lock:
+            result = []
+            for n in range(self._count):
+                i = (self._start + n) % self.capacity
+                if since is None or self._times[i] >= since:
+                    result.append((self._times[i], self._lats[i], self._lngs[i], self._alts[i]))
+            return result
+
+    def history(self, since=None):
+        """Spilled fixes followed by the ring, for ranges older than the ring holds"""
+        ring = self.points(since)
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return ring
+        if since is not None and self._count and self._times[self._start] <= since:
+            # The ring already reaches back far enough
+            return ring
+        if self._spill is not None:
+            with self._lock:
+                self._spill.flush()
+        spilled = []
+        with open(self.spill_path, 'r') as f:
+            for line in f:
+                try:
+                    t, lat, lng, alt = (float(v) for v in line.split(','))
+                except ValueError:
+                    continue
+                if since is None or t >= since:
+                    spilled.append((t, lat, lng, alt))
+        return spilled + ring
+
+    def close(self):
+        with self._lock:
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+
+
+def simplify(points, tolerance=SIMPLIFY_TOLERANCE):
+    """Douglas-Peucker simplification of (t, lat, lng, ...) points, tolerance in metres"""
+    if len(points) < 3 or tolerance <= 0:
+        return list(points)
+
+    # Project to a local plane in metres around the track's first point
+    cos_lat = math.cos(points[0][1] * _DEG)
+    xs = [p[2] * _DEG * cos_lat * EARTH_RADIUS for p in points]
+    ys = [p[1] * _DEG * EARTH_RADIUS for p in points]
+
+    keep = bytearray(len(points))
+    keep[0] = keep[-1] = 1
+    # Explicit stack: long tracks would overflow the recursion limit
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        x1, y1, x2, y2 = xs[first], ys[first], xs[last], ys[last]
+        dx, dy = x2 - x1, y2 - y1
+        length_sq = dx * dx + dy * dy
+        worst, worst_index = 0.0, None
+        for i in range(first + 1, last):
+            px, py = xs[i] - x1, ys[i] - y1
+            if length_sq == 0:
+                dist = math.hypot(px, py)
+            else:
+                # Distance to the segment, not the infinite line
+                u = max(0.0, min(1.0, (px * dx + py * dy) / length_sq))
+                dist = math.hypot(px - u * dx, py - u * dy)
+            if dist > worst:
+                worst, worst_index = dist, i
+        if worst_index is not None and worst > tolerance:
+            keep[worst_index] = 1
+            stack.append((first, worst_index))
+            stack.append((worst_index, last))
+
+    return [point for point, kept in zip(points, keep) if kept]
@@ -7,12 +7,12 @@ import io
 import absl.logging
 import time
 import threading
-from queue import Queue
+from queue import Queue, Empty, Full
 import mediapipe as mp
 import math
 import serial
 import serial.tools.list_ports
-import datetime
+from medicine_schedule import MedicineScheduleIndex, current_minutes
 
 # Suppress TensorFlow warnings
 absl.logging.set_verbosity(absl.logging.ERROR)
@@ -30,6 +30,16 @@ MEDICINES = {
     "Dolo": {"schedule_time": "6 PM", "taken_today": False, "display": "Dolo - 6 PM"}
 }
 
+# Name index over MEDICINES, built once so detections don't rescan the list
+MEDICINE_INDEX = MedicineScheduleIndex()
+for _name, _info in MEDICINES.items():
+    MEDICINE_INDEX.add(_name, _info["schedule_time"], data=_name)
+
+# Medicine recognition settings
+RECOGNITION_INTERVAL = 2.0      # Minimum seconds between frames offered to Gemini
+RECOGNITION_TIMEOUT = 10.0      # Seconds before a Gemini request is abandoned
+ARDUINO_QUEUE_SIZE = 16         # Pending serial commands before new ones are dropped
+
 def setup_arduino():
     # List all available ports
     ports = list(serial.tools.list_ports.comports())
@@ -155,7 +165,7 @@ class SharedVideoStream:
         self.stopped = True
         self.stream.release()
 
-def process_frame_with_gemini(frame):
+def process_frame_with_gemini(frame, timeout=RECOGNITION_TIMEOUT):
     # Convert frame to PIL Image
     frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     pil_image = Image.fromarray(frame_rgb)
@@ -174,7 +184,8 @@ def process_frame_with_gemini(frame):
             [prompt, {"mime_type": "image/png", "data": img_bytes}],
             generation_config=genai.types.GenerationConfig(
                 temperature=0.1
-            )
+            ),
+            request_options={"timeout": timeout}
         )
         # Clean and truncate the response
         text = response.text.strip()
@@ -186,44 +197,198 @@ def process_frame_with_gemini(frame):
         print(f"Error in API call: {e}")
         return None
 
-def check_medicine_schedule(medicine_name):
-    """Check if the detected medicine should be taken now based on schedule"""
-    # Get current time
-    current_time = datetime.datetime.now().time()
-    current_hour = current_time.hour
+def check_medicine_schedule(medicine_name, now=None):
+    """Check if the detected medicine should be taken now based on schedule.
+
+    Returns (should_take, MEDICINES key, display name, schedule time, status).
+    """
+    # Fuzzy lookup tolerates truncated or misspelled detections
+    entry = MEDICINE_INDEX.lookup(medicine_name)
+    if entry is None:
+        # If medicine not found in our list
+        return False, None, None, None, "Medicine not in schedule."
     
-    # Check if medicine exists in our list
-    medicine_name = medicine_name.upper()
-    for med, info in MEDICINES.items():
-        # Check for partial name match (in case of incomplete detection)
-        if medicine_name in med.upper() or med.upper() in medicine_name:
-            # Parse schedule time
-            schedule_parts = info["schedule_time"].split()
-            hour = int(schedule_parts[0])
-            am_pm = schedule_parts[1].upper()
-            
-            # Convert to 24-hour format
-            if am_pm == "PM" and hour < 12:
-                schedule_hour = hour + 12
-            elif am_pm == "AM" and hour == 12:
-                schedule_hour = 0
+    info = MEDICINES[entry.data]
+    
+    # Window is 2 hours early to 3 hours late, at minute resolution
+    if entry.is_due(current_minutes(now)):
+        status = f"Take this medicine now ({info['schedule_time']})."
+        if info["taken_today"]:
+            status = f"Already taken today ({info['schedule_time']})."
+        return True, entry.data, info["display"], info["schedule_time"], status
+    
+    return False, entry.data, info["display"], info["schedule_time"], f"Should be taken at {info['schedule_time']}."
+
+class ArduinoWriter:
+    """Owns the Arduino serial port so that no other thread ever writes to it.
+
+    Commands are queued and executed in order on a dedicated thread, which keeps
+    slow serial round-trips out of the video loop and away from the UI state lock.
+    """
+    def __init__(self, arduino, max_pending=ARDUINO_QUEUE_SIZE):
+        self.arduino = arduino
+        self.commands = Queue(maxsize=max_pending)
+        self.stopped = False
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def send(self, func, *args):
+        """Queue func(arduino, *args) to run on the writer thread"""
+        if self.arduino is None:
+            return False
+        try:
+            self.commands.put_nowait((func, args))
+            return True
+        except Full:
+            print(f"Arduino command queue full, dropping {func.__name__}")
+            return False
+
+    def run(self):
+        while not self.stopped:
+            try:
+                func, args = self.commands.get(timeout=0.5)
+            except Empty:
+                continue
+            try:
+                func(self.arduino, *args)
+            except Exception as e:
+                print(f"Error in Arduino writer: {e}")
+
+    def stop(self):
+        self.stopped = True
+        if self.thread:
+            self.thread.join(timeout=2.0)
+
+class MedicineRecognitionWorker:
+    """Single long-lived worker that runs Gemini medicine recognition.
+
+    Frames are offered through a size-1 queue: a newer frame replaces one that
+    has not been picked up yet, so the worker always processes the latest view
+    and there is never more than one request in flight.
+    """
+    def __init__(self, shared_state, writer, timeout=RECOGNITION_TIMEOUT):
+        self.shared_state = shared_state
+        self.writer = writer
+        self.timeout = timeout
+        self.frames = Queue(maxsize=1)
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.metrics_lock = threading.Lock()
+        self.metrics = {
+            "submitted": 0,
+            "replaced": 0,
+            "completed": 0,
+            "failed": 0,
+            "last_latency": 0.0,
+            "avg_latency": 0.0,
+            "max_latency": 0.0,
+            "last_queue_wait": 0.0
+        }
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def submit(self, frame):
+        """Offer a frame for recognition, replacing any frame still waiting"""
+        replaced = False
+        try:
+            self.frames.get_nowait()
+            replaced = True
+        except Empty:
+            pass
+        try:
+            self.frames.put_nowait((time.time(), frame))
+        except Full:
+            # Another producer refilled the slot first; keep theirs
+            replaced = True
+        with self.metrics_lock:
+            self.metrics["submitted"] += 1
+            if replaced:
+                self.metrics["replaced"] += 1
+
+    def cancel_pending(self):
+        """Drop the frame waiting for recognition, if any"""
+        try:
+            self.frames.get_nowait()
+        except Empty:
+            pass
+
+    def get_metrics(self):
+        with self.metrics_lock:
+            return dict(self.metrics)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                submitted_at, frame = self.frames.get(timeout=0.5)
+            except Empty:
+                continue
+
+            started_at = time.time()
+            medicine_name = process_frame_with_gemini(frame, timeout=self.timeout)
+            finished_at = time.time()
+
+            # Results that arrive after stop() are discarded
+            if self.stop_event.is_set():
+                break
+
+            self._record(started_at - submitted_at, finished_at - started_at, medicine_name is not None)
+            self._publish(medicine_name)
+
+    def _record(self, queue_wait, latency, succeeded):
+        with self.metrics_lock:
+            m = self.metrics
+            if succeeded:
+                m["completed"] += 1
             else:
-                schedule_hour = hour
-            
-            # Calculate time difference (allowing for up to 2 hours early or 3 hours late)
-            time_diff = current_hour - schedule_hour
-            
-            # If it's within the window for taking medicine
-            if -2 <= time_diff <= 3:
-                status = f"Take this medicine now ({info['schedule_time']})."
-                if info["taken_today"]:
-                    status = f"Already taken today ({info['schedule_time']})."
-                return True, info["display"], info["schedule_time"], status
+                m["failed"] += 1
+            count = m["completed"] + m["failed"]
+            m["last_queue_wait"] = queue_wait
+            m["last_latency"] = latency
+            m["avg_latency"] += (latency - m["avg_latency"]) / count
+            m["max_latency"] = max(m["max_latency"], latency)
+
+    def _publish(self, medicine_name):
+        arduino_update = None
+        medicine_key = None
+        if medicine_name and medicine_name != "No medicine":
+            should_take, medicine_key, display_name, schedule_time, status = check_medicine_schedule(medicine_name)
+
+            if display_name:
+                print(f"Detected: {display_name}")
+                print(f"Recommendation: {status}")
+                arduino_update = (display_name, status)
             else:
-                return False, info["display"], info["schedule_time"], f"Should be taken at {info['schedule_time']}."
-    
-    # If medicine not found in our list
-    return False, None, None, "Medicine not in schedule."
+                print(f"Detected medicine '{medicine_name}' not in schedule")
+                # Send even unscheduled medicine to Arduino
+                arduino_update = (medicine_name, "Medicine not in schedule")
+
+            with self.shared_state.lock:
+                # Store both the medicine name and whether it should be taken
+                self.shared_state.current_medicine = display_name if display_name else medicine_name
+                self.shared_state.medicine_status = status
+                self.shared_state.medicine_key = medicine_key
+        else:
+            with self.shared_state.lock:
+                self.shared_state.current_medicine = medicine_name or "No medicine"
+                self.shared_state.medicine_status = ""
+                self.shared_state.medicine_key = None
+
+        # Serial writes happen on the writer thread, never under the UI lock
+        if arduino_update:
+            self.writer.send(send_medicine_to_arduino, *arduino_update)
+
+    def stop(self):
+        self.stop_event.set()
+        self.cancel_pending()
+        if self.thread:
+            self.thread.join(timeout=1.0)
 
 class SharedState:
     def __init__(self):
@@ -231,51 +396,20 @@ class SharedState:
         self.MAX_PAGES = 6
         self.current_medicine = "Scanning..."
         self.medicine_status = ""
+        self.medicine_key = None  # MEDICINES key of the detected medicine, None if not in the schedule
         self.lock = threading.Lock()
         self.frame_to_show = None
         self.should_quit = False
 
-def integrated_processing_thread(shared_vs, shared_state, arduino):
+def integrated_processing_thread(shared_vs, shared_state, writer, recognizer):
     print("Starting integrated AR system...")
     
     mp_drawing = mp.solutions.drawing_utils
     mp_hands = mp.solutions.hands
     
     last_api_call = 0
-    api_call_interval = 2.0
-    processing = False
     last_switch_time = 0
     
-    def process_frame_async(frame):
-        nonlocal processing
-        medicine_name = process_frame_with_gemini(frame)
-        if medicine_name and medicine_name != "No medicine":
-            should_take, display_name, schedule_time, status = check_medicine_schedule(medicine_name)
-            
-            with shared_state.lock:
-                # Store both the medicine name and whether it should be taken
-                shared_state.current_medicine = display_name if display_name else medicine_name
-                shared_state.medicine_status = status
-                
-                # Print detailed information about the medicine
-                if display_name:
-                    print(f"Detected: {display_name}")
-                    print(f"Recommendation: {status}")
-                    
-                    # Send medicine info to Arduino
-                    send_medicine_to_arduino(arduino, display_name, status)
-                else:
-                    print(f"Detected medicine '{medicine_name}' not in schedule")
-                    
-                    # Send even unscheduled medicine to Arduino
-                    send_medicine_to_arduino(arduino, medicine_name, "Medicine not in schedule")
-        else:
-            with shared_state.lock:
-                shared_state.current_medicine = medicine_name or "No medicine"
-                shared_state.medicine_status = ""
-        
-        processing = False
-    
     with mp_hands.Hands(
             min_detection_confidence=0.5,
             min_tracking_confidence=0.5,
@@ -295,12 +429,11 @@ def integrated_processing_thread(shared_vs, shared_state, arduino):
                 image.flags.writeable = True
                 image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
                 
-                # Process medicine detection
+                # Offer the latest frame to the recognition worker
                 current_time = time.time()
-                if not processing and current_time - last_api_call >= api_call_interval:
-                    processing = True
+                if current_time - last_api_call >= RECOGNITION_INTERVAL:
                     last_api_call = current_time
-                    threading.Thread(target=process_frame_async, args=(frame.copy(),), daemon=True).start()
+                    recognizer.submit(frame)
                 
                 # Draw medicine detection result
                 with shared_state.lock:
@@ -357,7 +490,7 @@ def integrated_processing_thread(shared_vs, shared_state, arduino):
                                 print(f"Gesture detected! Distance: {distance}")
                                 with shared_state.lock:
                                     shared_state.current_page = (shared_state.current_page + 1) % shared_state.MAX_PAGES
-                                switch_page(arduino)
+                                writer.send(switch_page)
                                 last_switch_time = current_time
                             
                             # Draw line between index and thumb
@@ -421,10 +554,14 @@ def main():
         cv2.moveWindow(window_name, 0, 0)
         cv2.resizeWindow(window_name, 1280, 720)
         
+        # Start the serial writer and the medicine recognition worker
+        writer = ArduinoWriter(arduino).start()
+        recognizer = MedicineRecognitionWorker(shared_state, writer).start()
+        
         # Create and start processing thread
         processing_thread = threading.Thread(
             target=integrated_processing_thread, 
-            args=(shared_vs, shared_state, arduino),
+            args=(shared_vs, shared_state, writer, recognizer),
             daemon=True
         )
         processing_thread.start()
@@ -451,19 +588,29 @@ def main():
             # Handle medicine taken confirmation with 't' key
             if key == ord('t'):
                 with shared_state.lock:
-                    med_name = shared_state.current_medicine
-                    if med_name in MEDICINES:
-                        MEDICINES[med_name]["taken_today"] = True
-                        print(f"Marked {med_name} as taken for today")
+                    medicine_key = shared_state.medicine_key
+                if medicine_key is not None:
+                    MEDICINES[medicine_key]["taken_today"] = True
+                    print(f"Marked {medicine_key} as taken for today")
         
         # Wait for processing thread to finish
         processing_thread.join(timeout=1.0)
         
+        recognizer.stop()
+        metrics = recognizer.get_metrics()
+        print(f"Recognition: {metrics['completed']} completed, {metrics['failed']} failed, "
+              f"{metrics['replaced']} frames replaced, avg latency {metrics['avg_latency']:.2f}s, "
+              f"max latency {metrics['max_latency']:.2f}s")
+        
     except Exception as e:
         print(f"Error in main: {e}")
     
     finally:
         # Cleanup
+        if 'recognizer' in locals():
+            recognizer.stop()
+        if 'writer' in locals():
+            writer.stop()
         if 'shared_vs' in locals():
             shared_vs.stop()
         cv2.destroyAllWindows()
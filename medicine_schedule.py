@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Medicine schedule index shared by the web interface and the AR vision pipeline.
+
+Schedule strings such as "DICLOWIN 650 9 PM" or "1.10 PM - Lunch" are parsed
+once into minutes-of-day windows, and medicine names are indexed so that noisy
+OCR/LLM output ("IMEGLYN1000", "Diclowin 65") can be matched without scanning
+the whole list on every detection.
+"""
+import re
+import datetime
+from functools import lru_cache
+
+# Dose window around the scheduled time (in minutes)
+DOSE_WINDOW_BEFORE = 120         # Allow taking up to 2 hours early
+DOSE_WINDOW_AFTER = 180          # Allow taking up to 3 hours late
+
+# Minimum Dice similarity of query and medicine name trigrams. High enough that
+# a different drug with a similar name ("Dollo", "Dolonex" for "Dolo") is not
+# matched: a wrong "take now" is worse than no recommendation
+FUZZY_MATCH_THRESHOLD = 0.75
+MIN_FUZZY_LENGTH = 4             # Shorter (non-exact) queries are never fuzzy matched
+
+# Characters OCR confuses, folded together before fuzzy matching ("D0L0" -> "DOIO")
+_CONFUSABLE = str.maketrans({'0': 'O', '1': 'I', 'L': 'I', '5': 'S', '8': 'B'})
+_strength_re = re.compile(r'^(\d+)(?:MG|MCG|ML|G)?$')
+_trailing_strength_re = re.compile(r'^(.*[A-Z])(\d{2,})$')
+
+MINUTES_PER_DAY = 24 * 60
+
+# "9 PM", "1.10 PM", "8:30am", "21:00"
+TIME_PATTERN = r'(\d{1,2}(?:[.:]\d{2})?\s*[AaPp]\.?[Mm]\.?|\d{1,2}:\d{2})'
+_time_re = re.compile(r'^\s*' + TIME_PATTERN + r'\s*$')
+_entry_re = re.compile(r'^\s*(.*?)\s+' + TIME_PATTERN + r'\s*$')
+_time_parts_re = re.compile(r'(\d{1,2})(?:[.:](\d{2}))?\s*([AP])?')
+_schedule_re = re.compile(r'^\s*' + TIME_PATTERN + r'\s*-\s*(.*)$')
+
+
+@lru_cache(maxsize=256)
+def parse_time_of_day(text):
+    """Convert a time like '9 PM' or '1.10 PM' to minutes since midnight (None if invalid)"""
+    match = _time_re.match(text or "")
+    if not match:
+        return None
+
+    hour_str, minute_str, am_pm = _time_parts_re.match(match.group(1).upper()).groups()
+    hour, minute = int(hour_str), int(minute_str or 0)
+
+    if am_pm:
+        if hour < 1 or hour > 12:
+            return None
+        if am_pm == "P" and hour < 12:
+            hour += 12
+        elif am_pm == "A" and hour == 12:
+            hour = 0
+    if hour > 23 or minute > 59:
+        return None
+
+    return hour * 60 + minute
+
+
+@lru_cache(maxsize=256)
+def parse_medicine_entry(entry):
+    """Split a device medicine string like 'DICLOWIN 650 9 PM' into (name, time text)"""
+    match = _entry_re.match(entry or "")
+    if not match:
+        return (entry or "").strip(), None
+    return match.group(1).strip(), match.group(2).strip()
+
+
+@lru_cache(maxsize=256)
+def parse_schedule_entry(entry):
+    """Split a schedule string like '1.10 PM - Lunch' into (time text, activity)"""
+    match = _schedule_re.match(entry or "")
+    if not match:
+        return None, (entry or "").strip()
+    return match.group(1).strip(), match.group(2).strip()
+
+
+def normalize_name(name):
+    """Canonical form of a medicine name: upper case letters and digits only"""
+    return re.sub(r'[^A-Z0-9]', '', (name or "").upper())
+
+
+def match_parts(name):
+    """(fuzzy matching key, strength) of a medicine name: 'D0L0 650' -> ('DOIO', '650')"""
+    words, strength = [], None
+    for token in re.findall(r'[A-Z0-9]+', (name or "").upper()):
+        match = _strength_re.match(token)
+        if match:
+            strength = strength or match.group(1)
+            continue
+        # "IMEGLYN1000": the dose is written against the name
+        match = _trailing_strength_re.match(token)
+        if match:
+            token, strength = match.group(1), strength or match.group(2)
+        words.append(token.translate(_CONFUSABLE))
+    return ''.join(words), strength
+
+
+def name_trigrams(key):
+    """Padded character trigrams of a normalized name"""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def minutes_until(now_minutes, dose_minutes):
+    """Signed distance from now to the dose, wrapped to the nearest occurrence"""
+    delta = (dose_minutes - now_minutes) % MINUTES_PER_DAY
+    if delta > MINUTES_PER_DAY // 2:
+        delta -= MINUTES_PER_DAY
+    return delta
+
+
+def current_minutes(now=None):
+    """Minutes since midnight for a datetime (defaults to now)"""
+    now = now or datetime.datetime.now()
+    return now.hour * 60 + now.minute
+
+
+class DoseEntry:
+    """A single scheduled dose with its precomputed time window"""
+    __slots__ = ("key", "match_key", "strength", "name", "time_text", "minutes", "window_start",
+                 "window_end", "data")
+
+    def __init__(self, name, time_text, data=None,
+                 window_before=DOSE_WINDOW_BEFORE, window_after=DOSE_WINDOW_AFTER):
+        self.key = normalize_name(name)
+        self.match_key, self.strength = match_parts(name)
+        self.name = name
+        self.time_text = time_text
+        self.minutes = parse_time_of_day(time_text) if time_text else None
+        self.window_start = -window_before
+        self.window_end = window_after
+        self.data = data
+
+    def is_due(self, now_minutes):
+        """True when now falls inside the dose window"""
+        if self.minutes is None:
+            return False
+        # minutes_until is positive before the dose, so flip the sign
+        elapsed = -minutes_until(now_minutes, self.minutes)
+        return self.window_start <= elapsed <= self.window_end
+
+
+class MedicineScheduleIndex:
+    """Name index over scheduled doses with exact and trigram fuzzy lookup"""
+
+    def __init__(self, threshold=FUZZY_MATCH_THRESHOLD, min_length=MIN_FUZZY_LENGTH):
+        self.threshold = threshold
+        self.min_length = min_length
+        self.entries = []
+        self.by_key = {}
+        # Matching key -> its entries (one per strength or time), and trigram -> matching keys
+        self.by_match_key = {}
+        self.gram_counts = {}
+        self.postings = {}
+        self._lookup_cache = {}
+
+    @classmethod
+    def from_strings(cls, medicine_strings, **kwargs):
+        """Build an index from device strings like 'Crocin 2 PM'"""
+        index = cls(**kwargs)
+        for text in medicine_strings:
+            name, time_text = parse_medicine_entry(text)
+            index.add(name, time_text, data=text)
+        return index
+
+    def add(self, name, time_text, data=None):
+        entry = DoseEntry(name, time_text, data)
+        if not entry.key:
+            return None
+        self.entries.append(entry)
+        self.by_key.setdefault(entry.key, entry)
+        if entry.match_key not in self.by_match_key:
+            grams = name_trigrams(entry.match_key)
+            self.gram_counts[entry.match_key] = len(grams)
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(entry.match_key)
+        self.by_match_key.setdefault(entry.match_key, []).append(entry)
+        self._lookup_cache.clear()
+        return entry
+
+    def lookup(self, text):
+        """Return the best matching DoseEntry for a (possibly noisy) name, or None"""
+        key = normalize_name(text)
+        if not key:
+            return None
+
+        entry = self.by_key.get(key)
+        if entry is not None:
+            return entry
+
+        if key in self._lookup_cache:
+            return self._lookup_cache[key]
+
+        match_key, strength = match_parts(text)
+        candidates = self.by_match_key.get(match_key)
+        if candidates is None and len(match_key) >= self.min_length:
+            grams = name_trigrams(match_key)
+            counts = {}
+            for gram in grams:
+                for name in self.postings.get(gram, ()):
+                    counts[name] = counts.get(name, 0) + 1
+
+            best, best_score = None, 0.0
+            for name, shared in counts.items():
+                # Dice: symmetric, so a short name isn't matched by every longer one starting like it
+                score = 2 * shared / (len(grams) + self.gram_counts[name])
+                if score > best_score:
+                    best, best_score = name, score
+            if best_score >= self.threshold:
+                candidates = self.by_match_key[best]
+
+        result = None
+        if candidates:
+            # Prefer the entry with the same strength ("Diclowin 650" over "Diclowin 1000")
+            result = next((entry for entry in candidates if strength and entry.strength == strength), candidates[0])
+        if len(self._lookup_cache) < 1024:
+            self._lookup_cache[key] = result
+        return result
+
+    def due_now(self, now=None):
+        """All entries whose dose window contains the given time"""
+        now_minutes = current_minutes(now)
+        return [entry for entry in self.entries if entry.is_due(now_minutes)]
+
+
+def _check_lookup():
+    """Lookups against the default medicine list: OCR noise matches, other drugs never do"""
+    index = MedicineScheduleIndex.from_strings(
+        ["DICLOWIN 650 9 PM", "IMEGLYN 1000 8 AM", "Crocin 2 PM", "Dolo 6 PM"])
+    expected = {
+        "Dolo": "Dolo", "DOLO 650": "Dolo", "D0L0 650": "Dolo", "Diclowin 65": "DICLOWIN 650",
+        "DIC1OWIN": "DICLOWIN 650", "IMEGLYN1000": "IMEGLYN 1000", "lMEGLYN 1000": "IMEGLYN 1000",
+        "Dolonex": None, "Dolutegravir": None, "Dollo": None, "Do": None,
+        "Dol": None, "Diclofenac": None, "Imeglucose": None, "Crocodile": None, "": None
+    }
+    failures = []
+    for query, name in expected.items():
+        entry = index.lookup(query)
+        found = entry.name if entry else None
+        if found != name:
+            failures.append(f"{query!r}: expected {name!r}, got {found!r}")
+    return failures
+
+
+if __name__ == '__main__':
+    import sys
+    problems = _check_lookup()
+    for problem in problems:
+        print(problem)
+    print("FAILED" if problems else "All lookups OK")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Lightweight in-process metrics for Synapse AR.
+
+Counters, gauges and histograms cheap enough for the serial hot path (well
+under a microsecond per event) and rendered in the Prometheus text format by
+the web server's /metrics endpoint (or serve() for the other processes):
+
+    READINGS = metrics.counter('synapse_readings_total', 'Readings parsed', ['device'])
+    READINGS.labels('room-12').inc()
+
+    start = time.perf_counter()
+    ...
+    PARSE_SECONDS.observe(time.perf_counter() - start)
+
+Updates take no lock. Hot-path events come almost entirely from the serial
+event loop thread, and an increment lost to a rare thread switch is a better
+trade than a lock acquisition on every reading.
+
+SampledLog replaces per-event info logging: it emits one debug line in every N
+events, and nothing at all unless debug logging is enabled.
+"""
+import time
+import logging
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; spans sub-millisecond parsing up to multi-second command timeouts
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named metric family; labelled children are created on first use"""
+    kind = None
+    methods = ()
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        # An unlabelled metric has one child whose methods it exposes directly
+        self._default = None if self.labelnames else self._new_child()
+        if self._default is not None:
+            for method in self.methods:
+                setattr(self, method, getattr(self._default, method))
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Child for one combination of label values; cache it in hot paths"""
+        if self._default is not None:
+            return self._default
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(tuple(str(v) for v in values), self._new_child())
+                self._children[values] = child
+        return child
+
+    def _samples(self):
+        if self._default is not None:
+            yield (), self._default
+        seen = set()
+        for values, child in list(self._children.items()):
+            if id(child) not in seen:
+                seen.add(id(child))
+                yield tuple(str(v) for v in values), child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._samples():
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+
+class _CounterValue:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def render(self, name, labelnames, values):
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(self.value)}"]
+
+
+class _GaugeValue:
+    __slots__ = ('value', 'function')
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set_function(self, function):
+        """Compute the value when scraped instead of on every change"""
+        self.function = function
+
+    def render(self, name, labelnames, values):
+        value = self.value
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception as e:
+                logger.error(f"Error computing gauge {name}: {e}")
+                return []
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(value)}"]
+
+
+class _HistogramValue:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self):
+        """Context manager that observes the elapsed time of its block"""
+        return _Timer(self)
+
+    def render(self, name, labelnames, values):
+        counts, total, count = list(self.counts), self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            labels = _format_labels(labelnames, values, f'le="{_format_value(float(bound))}"')
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _format_labels(labelnames, values)
+        lines.append(f"{name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{name}_count{labels} {count}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Counter(Metric):
+    kind = 'counter'
+    methods = ('inc',)
+
+    def _new_child(self):
+        return _CounterValue()
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+    methods = ('set', 'inc', 'dec', 'set_function')
+
+    def _new_child(self):
+        return _GaugeValue()
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+    methods = ('observe', 'time')
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.bucket_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.bucket_bounds)
+
+
+class Registry:
+    """Named metrics; registering the same name twice returns the existing metric"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, cls, name, documentation, labelnames=(), **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as a {metric.kind}")
+            return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter, name, documentation, labelnames)
+
+
+def gauge(name, documentation, labelnames=()):
+    return REGISTRY.register(Gauge, name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    return REGISTRY.render()
+
+
+class SampledLog:
+    """Log one event in every `every`, only when the level is enabled"""
+
+    def __init__(self, log, every=100, level=logging.DEBUG):
+        self.log = log
+        self.every = every
+        self.level = level
+        self.calls = 0
+
+    def __call__(self, msg, *args):
+        self.calls += 1
+        if self.calls % self.every == 1 or self.every == 1:
+            # Arguments are only formatted when the record is actually emitted
+            if self.log.isEnabledFor(self.level):
+                self.log.log(self.level, msg + " [1 of every %d]", *args, self.every)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(port, host='0.0.0.0'):
+    """Expose /metrics from a background thread, for processes without a web server"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Metrics available on http://{host}:{port}/metrics")
+    return server
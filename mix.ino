@@ -24,6 +24,19 @@ typedef struct sensor_readings {
 // Create a sensor readings object
 sensor_readings sensorData;
 
+// Raw IMU samples for host-side fall detection, IMU_BATCH per ESP-NOW packet
+#define IMU_STREAM_ENABLED 1
+#define IMU_SAMPLE_INTERVAL 20     // ms between samples (50 Hz)
+#define IMU_BATCH 10               // 5 packets per second
+typedef struct imu_batch {
+  uint32_t startMillis;            // Time of the first sample
+  uint16_t intervalMs;             // Average spacing of the samples
+  uint16_t count;
+  int16_t samples[IMU_BATCH][6];   // Raw ax, ay, az, gx, gy, gz
+} imu_batch;
+
+imu_batch imuBatch;
+
 // ESP-NOW peer info
 esp_now_peer_info_t peerInfo;
 
@@ -61,6 +74,9 @@ Adafruit_SSD1306 display(SCREEN_WIDTH, SCREEN_HEIGHT, &I2C_OLED_MAX, OLED_RESET)
 
 // MPU6050 Settings
 const int MPU_ADDR = 0x68;
+// ±8 g, so impacts (typically 3-6 g) don't clip at the ±2 g power-on range
+const uint8_t MPU_ACCEL_RANGE = 0x10;   // ACCEL_CONFIG AFS_SEL=2
+const float ACCEL_LSB_PER_G = 4096.0;   // Must match ACCEL_SCALE in fall_detector.py
 int16_t accelerometer_x, accelerometer_y, accelerometer_z;
 int16_t gyro_x, gyro_y, gyro_z;
 int16_t temperature;
@@ -288,6 +304,10 @@ void setup() {
   I2C_MPU.write(0x6B);
   I2C_MPU.write(0);
   I2C_MPU.endTransmission(true);
+  I2C_MPU.beginTransmission(MPU_ADDR);
+  I2C_MPU.write(0x1C);
+  I2C_MPU.write(MPU_ACCEL_RANGE);
+  I2C_MPU.endTransmission(true);
   
   // Initialize MAX30105 with simple heart rate monitoring setup
   pinMode(pulseLED, OUTPUT);
@@ -795,6 +815,34 @@ void displayMAXDebugPage() {
   }
 }
 
+// Add the latest raw MPU6050 reading to the batch and send it when full
+void sampleIMU(unsigned long now) {
+  static unsigned long lastSample = 0;
+  if (now - lastSample < IMU_SAMPLE_INTERVAL) {
+    return;
+  }
+  lastSample = now;
+  
+  if (imuBatch.count == 0) {
+    imuBatch.startMillis = now;
+  }
+  int16_t* sample = imuBatch.samples[imuBatch.count];
+  sample[0] = accelerometer_x;
+  sample[1] = accelerometer_y;
+  sample[2] = accelerometer_z;
+  sample[3] = gyro_x;
+  sample[4] = gyro_y;
+  sample[5] = gyro_z;
+  imuBatch.count++;
+  
+  if (imuBatch.count == IMU_BATCH) {
+    // The main loop can run slower than 50 Hz while reading the MAX30105
+    imuBatch.intervalMs = (now - imuBatch.startMillis) / (IMU_BATCH - 1);
+    esp_now_send(receiverMacAddress, (uint8_t *)&imuBatch, sizeof(imu_batch));
+    imuBatch.count = 0;
+  }
+}
+
 void updateMPU6050() {
   I2C_MPU.beginTransmission(MPU_ADDR);
   I2C_MPU.write(0x3B);
@@ -809,10 +857,10 @@ void updateMPU6050() {
   gyro_y = I2C_MPU.read()<<8 | I2C_MPU.read();
   gyro_z = I2C_MPU.read()<<8 | I2C_MPU.read();
   
-  // Convert to g (±2g range) - using the reference code's calibration values
-  ax = (accelerometer_x - 2050) / 16384.0;
-  ay = (accelerometer_y - 77) / 16384.0;
-  az = (accelerometer_z - 1947) / 16384.0;
+  // Convert to g (±8g range) - the reference code's calibration values, scaled from ±2g
+  ax = (accelerometer_x - 512) / ACCEL_LSB_PER_G;
+  ay = (accelerometer_y - 19) / ACCEL_LSB_PER_G;
+  az = (accelerometer_z - 487) / ACCEL_LSB_PER_G;
   
   // Convert gyro values using reference code's calibration
   gx = (gyro_x + 270) / 131.07;
@@ -1225,6 +1273,10 @@ void loop() {
   
   // Check temperature periodically
   unsigned long currentTime = millis();
+  
+#if IMU_STREAM_ENABLED
+  sampleIMU(currentTime);
+#endif
   if (currentTime - lastTempCheck >= TEMP_CHECK_INTERVAL) {
     currentTemperature = readTemperature();
     lastTempCheck = currentTime;
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Model bundles: one file per trained model.
+
+A bundle holds the estimator, the preprocessors applied before it (such as
+the anxiety imputer), the feature schema version and columns it was trained
+on, training metadata and a checksum:
+
+    {"format": 1, "name": "cardiac", "version": "20250301-101500", "schema_version": 1,
+     "columns": [...], "metadata": {"accuracy": 0.64, ...}, "sha256": "...", "size": 812345}
+    <joblib payload: {"model": ..., "preprocessors": [...]}>
+
+The JSON header is the first line, so a new version can be recognised without
+unpickling it, and the payload is only unpickled once its SHA-256 matches.
+Bundles are written to a temporary file and renamed into place, so a watcher
+never reads half a file. train_models.py writes models/<name>.bundle;
+predictors.py serves them and hot-swaps new versions. online_learning.py
+writes models/<name>.candidate.bundle instead, which predictors.py renames
+over the serving bundle only once it has passed its trial, keeping the
+version it replaces as models/<name>.previous.bundle.
+"""
+import io
+import os
+import json
+import time
+import shutil
+import hashlib
+
+BUNDLE_FORMAT = 1
+MODEL_DIR = 'models'
+BUNDLE_SUFFIX = '.bundle'
+CANDIDATE_SUFFIX = '.candidate.bundle'
+PREVIOUS_SUFFIX = '.previous.bundle'
+MAX_HEADER_SIZE = 1 << 20
+
+
+class BundleError(Exception):
+    """A bundle file that is corrupt, truncated or in an unknown format"""
+
+
+def bundle_path(name, model_dir=MODEL_DIR):
+    return os.path.join(model_dir, name + BUNDLE_SUFFIX)
+
+
+def candidate_path(name, model_dir=MODEL_DIR):
+    return os.path.join(model_dir, name + CANDIDATE_SUFFIX)
+
+
+def previous_path(name, model_dir=MODEL_DIR):
+    return os.path.join(model_dir, name + PREVIOUS_SUFFIX)
+
+
+class ModelBundle:
+    """A loaded model with its preprocessors and header"""
+
+    def __init__(self, name, model, preprocessors=(), header=None, path=None):
+        self.name = name
+        self.model = model
+        self.preprocessors = list(preprocessors)
+        self.header = header or {}
+        self.path = path
+        self.version = self.header.get("version", "legacy")
+        self.schema_version = self.header.get("schema_version")
+        self.checksum = self.header.get("sha256")
+
+    def predict(self, rows):
+        """(labels, positive-class probabilities or None) for a float32 feature matrix"""
+        for preprocessor in self.preprocessors:
+            rows = preprocessor.transform(rows)
+        labels = self.model.predict(rows)
+        probabilities = self.model.predict_proba(rows)[:, 1] if hasattr(self.model, 'predict_proba') else None
+        return labels, probabilities
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "version": self.version,
+            "schema_version": self.schema_version,
+            "checksum": self.checksum[:12] if self.checksum else None,
+            "metadata": self.header.get("metadata", {})
+        }
+
+
+def save_bundle(path, name, model, preprocessors=(), schema=None, metadata=None, version=None):
+    """Write a bundle atomically; returns its header"""
+    import joblib
+
+    buffer = io.BytesIO()
+    joblib.dump({"model": model, "preprocessors": list(preprocessors)}, buffer)
+    payload = buffer.getvalue()
+    header = {
+        "format": BUNDLE_FORMAT,
+        "name": name,
+        "version": version or time.strftime('%Y%m%d-%H%M%S'),
+        "schema_version": schema.version if schema is not None else None,
+        "columns": list(schema.columns) if schema is not None else None,
+        "metadata": dict(metadata or {}, trained_at=time.strftime('%Y-%m-%dT%H:%M:%S')),
+        "sha256": hashlib.sha256(payload).hexdigest(),
+        "size": len(payload)
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'wb') as f:
+        f.write(json.dumps(header).encode('utf-8') + b'\n')
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+    return header
+
+
+def promote_bundle(candidate, path, previous):
+    """Rename a candidate bundle over the serving one, keeping a copy of the serving one as previous"""
+    if os.path.exists(path):
+        # Copied rather than moved, so the serving path never goes missing
+        temporary = f"{previous}.{os.getpid()}.tmp"
+        shutil.copyfile(path, temporary)
+        os.replace(temporary, previous)
+    os.replace(candidate, path)
+
+
+def _parse_header(line):
+    try:
+        header = json.loads(line)
+    except ValueError as e:
+        raise BundleError(f"Unreadable bundle header: {e}")
+    if not isinstance(header, dict) or header.get("format") != BUNDLE_FORMAT:
+        raise BundleError(f"Unknown bundle format: {header.get('format') if isinstance(header, dict) else header!r}")
+    return header
+
+
+def read_header(path):
+    """A bundle's header, without reading or unpickling the payload"""
+    with open(path, 'rb') as f:
+        return _parse_header(f.readline(MAX_HEADER_SIZE))
+
+
+def load_bundle(path):
+    """Load and verify a bundle; raises BundleError if it is corrupt"""
+    import joblib
+
+    with open(path, 'rb') as f:
+        header = _parse_header(f.readline(MAX_HEADER_SIZE))
+        payload = f.read()
+    if len(payload) != header.get("size"):
+        raise BundleError(f"Truncated bundle: {len(payload)} of {header.get('size')} bytes")
+    if hashlib.sha256(payload).hexdigest() != header.get("sha256"):
+        raise BundleError("Bundle checksum mismatch")
+    objects = joblib.load(io.BytesIO(payload))
+    return ModelBundle(header["name"], objects["model"], objects.get("preprocessors", ()), header, path)
+
+
+def load_legacy(name, paths):
+    """Bare .pkl files from before bundles: the model, then its preprocessors"""
+    import joblib
+
+    model, *preprocessors = (joblib.load(path) for path in paths)
+    header = {"version": "legacy", "schema_version": getattr(model, 'feature_schema_version', None)}
+    return ModelBundle(name, model, preprocessors, header, paths[0])
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Persistent outbound queue for Telegram notifications.
+
+Alerts are written to a small SQLite outbox and delivered by a background
+sender thread, so a slow or failing Bot API never stalls alert evaluation.
+Failed sends are retried with exponential backoff (honouring 429 retry_after),
+each chat is rate limited to stay inside Bot API limits, and alerts that fire
+together for the same chat are coalesced into a single message.
+"""
+import time
+import random
+import sqlite3
+import logging
+import threading
+from collections import deque
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_DB = 'notification_queue.db'
+
+# Delivery policy
+COALESCE_WINDOW = 0.25           # Seconds to wait for related alerts before sending
+MAX_ATTEMPTS = 8                 # Attempts before a message is marked dead
+BACKOFF_BASE = 1.0               # First retry delay in seconds
+BACKOFF_MAX = 300.0              # Longest retry delay in seconds
+MAX_MESSAGE_LENGTH = 4096        # Telegram message size limit
+
+# Bot API limits: about one message per second per chat, 20 per minute in groups
+# and 30 per second overall
+CHAT_MIN_INTERVAL = 1.0
+CHAT_MAX_PER_MINUTE = 20
+GLOBAL_MAX_PER_SECOND = 30
+
+SENT_RETENTION = 24 * 3600       # Seconds delivered messages are kept in the outbox
+
+STATUS_PENDING = 'pending'
+STATUS_SENT = 'sent'
+STATUS_DEAD = 'dead'
+
+DELIVERY_SECONDS = metrics.histogram('synapse_notification_delivery_seconds', 'Enqueue to Bot API delivery',
+                                     buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0))
+DELIVERED = metrics.counter('synapse_notifications_delivered_total', 'Notifications delivered')
+RETRIED = metrics.counter('synapse_notifications_retried_total', 'Failed sends scheduled for retry')
+DEAD = metrics.counter('synapse_notifications_dead_total', 'Notifications given up on')
+QUEUE_DEPTH = metrics.gauge('synapse_notification_queue_depth', 'Notifications waiting to be delivered')
+
+
+def retry_after_from_error(error):
+    """Extract Telegram's retry_after hint (seconds) from a send exception"""
+    result_json = getattr(error, 'result_json', None) or {}
+    parameters = result_json.get('parameters') or {}
+    retry_after = parameters.get('retry_after')
+    return float(retry_after) if retry_after else None
+
+
+def is_permanent_error(error):
+    """Client errors other than rate limiting will not succeed on retry"""
+    code = getattr(error, 'error_code', None)
+    return code is not None and 400 <= code < 500 and code != 429
+
+
+class RateLimiter:
+    """Sliding-window limits per chat plus a global per-second cap"""
+
+    def __init__(self, min_interval=CHAT_MIN_INTERVAL, per_minute=CHAT_MAX_PER_MINUTE,
+                 global_per_second=GLOBAL_MAX_PER_SECOND):
+        self.min_interval = min_interval
+        self.per_minute = per_minute
+        self.global_per_second = global_per_second
+        self.chat_sends = {}
+        self.global_sends = deque()
+
+    def ready_at(self, chat_id, now):
+        """Earliest time a message may be sent to chat_id"""
+        ready = now
+        sends = self.chat_sends.get(chat_id)
+        if sends:
+            while sends and now - sends[0] >= 60:
+                sends.popleft()
+            if sends:
+                ready = max(ready, sends[-1] + self.min_interval)
+            if len(sends) >= self.per_minute:
+                ready = max(ready, sends[0] + 60)
+        while self.global_sends and now - self.global_sends[0] >= 1:
+            self.global_sends.popleft()
+        if len(self.global_sends) >= self.global_per_second:
+            ready = max(ready, self.global_sends[0] + 1)
+        return ready
+
+    def record(self, chat_id, now):
+        self.chat_sends.setdefault(chat_id, deque()).append(now)
+        self.global_sends.append(now)
+
+
+class NotificationQueue:
+    """Durable outbox with a background sender thread"""
+
+    def __init__(self, send_func, db_path=NOTIFICATION_DB, coalesce_window=COALESCE_WINDOW,
+                 max_attempts=MAX_ATTEMPTS, rate_limiter=None):
+        # send_func(chat_id, text, parse_mode) must raise on failure
+        self.send_func = send_func
+        self.coalesce_window = coalesce_window
+        self.max_attempts = max_attempts
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self.metrics = {
+            "enqueued": 0,
+            "delivered": 0,
+            "retried": 0,
+            "dead": 0,
+            "coalesced": 0,
+            "last_latency": 0.0,
+            "avg_latency": 0.0,
+            "max_latency": 0.0
+        }
+
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " chat_id TEXT NOT NULL,"
+            " text TEXT NOT NULL,"
+            " parse_mode TEXT,"
+            " created_at REAL NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " next_attempt REAL NOT NULL,"
+            " status TEXT NOT NULL,"
+            " last_error TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (status, next_attempt)")
+        self._db.commit()
+
+    # --- Producer side -------------------------------------------------------
+
+    def enqueue(self, chat_id, text, parse_mode=None):
+        """Persist a message for delivery and return immediately"""
+        now = time.time()
+        with self._cond:
+            cursor = self._db.execute(
+                "INSERT INTO outbox (chat_id, text, parse_mode, created_at, next_attempt, status)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (str(chat_id), text, parse_mode, now, now + self.coalesce_window, STATUS_PENDING)
+            )
+            self._db.commit()
+            self.metrics["enqueued"] += 1
+            self._cond.notify()
+            return cursor.lastrowid
+
+    def depth(self):
+        """Number of messages waiting to be delivered"""
+        with self._cond:
+            row = self._db.execute("SELECT COUNT(*) FROM outbox WHERE status = ?", (STATUS_PENDING,)).fetchone()
+            return row[0]
+
+    def get_metrics(self):
+        with self._cond:
+            metrics = dict(self.metrics)
+        metrics["depth"] = self.depth()
+        return metrics
+
+    # --- Sender thread -------------------------------------------------------
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return False
+            self._running = True
+            self._db.execute("DELETE FROM outbox WHERE status = ? AND created_at < ?",
+                             (STATUS_SENT, time.time() - SENT_RETENTION))
+            self._db.commit()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        QUEUE_DEPTH.set_function(self.depth)
+        logger.info(f"Notification sender started ({self.depth()} queued)")
+        return True
+
+    def stop(self, drain_timeout=5.0):
+        """Stop the sender, first giving queued messages up to drain_timeout to go out"""
+        deadline = time.time() + drain_timeout
+        while self.depth() and time.time() < deadline:
+            time.sleep(0.1)
+        with self._cond:
+            if not self._running:
+                return False
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+        logger.info("Notification sender stopped")
+        return True
+
+    def _next_batch(self):
+        """Pick the chat whose next message is ready soonest; returns (wait, chat_id, rows)"""
+        now = time.time()
+        rows = self._db.execute(
+            "SELECT id, chat_id, text, parse_mode, created_at, attempts, next_attempt"
+            " FROM outbox WHERE status = ? ORDER BY next_attempt, id",
+            (STATUS_PENDING,)
+        ).fetchall()
+        if not rows:
+            return None, None, []
+
+        best_chat, best_ready = None, None
+        for row in rows:
+            ready = max(row[6], self.rate_limiter.ready_at(row[1], now))
+            if best_ready is None or ready < best_ready:
+                best_chat, best_ready = row[1], ready
+        if best_ready > now:
+            return best_ready - now, None, []
+
+        # Coalesce everything for this chat that is due now or within the window
+        horizon = now + self.coalesce_window
+        batch = [row for row in rows if row[1] == best_chat and row[6] <= horizon]
+        batch.sort(key=lambda row: row[0])
+        return 0, best_chat, batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    wait, chat_id, batch = self._next_batch()
+                    if batch:
+                        break
+                    self._cond.wait(wait)
+                if not self._running:
+                    return
+                self.rate_limiter.record(chat_id, time.time())
+
+            self._deliver(chat_id, batch)
+
+    def _deliver(self, chat_id, batch):
+        # Combine messages that fit together; the rest go out on the next pass
+        combined, included = [], []
+        length = 0
+        parse_mode = batch[0][3]
+        for row in batch:
+            if row[3] != parse_mode:
+                continue
+            extra = len(row[2]) + (2 if combined else 0)
+            if combined and length + extra > MAX_MESSAGE_LENGTH:
+                break
+            combined.append(row[2])
+            included.append(row)
+            length += extra
+        text = "\n\n".join(combined)
+        ids = [row[0] for row in included]
+
+        try:
+            self.send_func(chat_id, text, parse_mode)
+        except Exception as e:
+            self._handle_failure(included, e)
+            return
+
+        now = time.time()
+        with self._cond:
+            self._db.executemany("UPDATE outbox SET status = ?, attempts = attempts + 1 WHERE id = ?",
+                                 [(STATUS_SENT, row_id) for row_id in ids])
+            self._db.commit()
+            m = self.metrics
+            for row in included:
+                latency = now - row[4]
+                m["delivered"] += 1
+                m["last_latency"] = latency
+                m["avg_latency"] += (latency - m["avg_latency"]) / m["delivered"]
+                m["max_latency"] = max(m["max_latency"], latency)
+                DELIVERY_SECONDS.observe(latency)
+                DELIVERED.inc()
+            m["coalesced"] += len(included) - 1
+        logger.info(f"Delivered {len(included)} notification(s) to {chat_id} "
+                    f"({now - included[0][4]:.3f}s after enqueue)")
+
+    def _handle_failure(self, rows, error):
+        now = time.time()
+        retry_after = retry_after_from_error(error)
+        permanent = is_permanent_error(error)
+        updates = []
+        with self._cond:
+            for row in rows:
+                attempts = row[5] + 1
+                if permanent or attempts >= self.max_attempts:
+                    updates.append((STATUS_DEAD, attempts, now, str(error), row[0]))
+                    self.metrics["dead"] += 1
+                    DEAD.inc()
+                    continue
+                # Exponential backoff with jitter, never sooner than Telegram asks
+                delay = min(BACKOFF_BASE * (2 ** (attempts - 1)), BACKOFF_MAX)
+                delay *= random.uniform(0.8, 1.2)
+                if retry_after:
+                    delay = max(delay, retry_after)
+                updates.append((STATUS_PENDING, attempts, now + delay, str(error), row[0]))
+                self.metrics["retried"] += 1
+                RETRIED.inc()
+            self._db.executemany(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                updates
+            )
+            self._db.commit()
+        logger.error(f"Failed to send notification: {error}")
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Online learning: adapt the risk models to our own patients without a full retrain.
+
+The web server keeps running aggregates of each patient's telemetry (count,
+mean, spread, range and an exponentially weighted mean of heart rate, SpO2
+and temperature, from samples signal_quality.py accepted), updated from the
+sensor stream as readings arrive and saved to online_learning/aggregates.json.
+When a clinician records an observed outcome (POST
+/api/models/<name>/outcomes), the model's inputs are completed from the
+patient's aggregates (TELEMETRY_FEATURES) and the labelled example is
+appended to online_learning/<name>.jsonl. Predictions for a device or
+patient fill their inputs the same way.
+
+The learner runs in its own process, so model updates never compete with
+the server for the interpreter:
+
+    python online_learning.py                   # check every 5 minutes
+    python online_learning.py --cpu-share 0.1 --interval 60
+
+(or `python synapse_web.py --online-learning`, which starts it as a child
+process). Once a model has MIN_NEW_EXAMPLES new examples it is updated from
+its bundle: models with partial_fit learn the new examples incrementally;
+random forests are warm-started with ONLINE_TREES trees grown on the most
+recent HISTORY_WINDOW examples, keeping the trees from the full training run
+and at most MAX_ONLINE_TREES added ones. The result is written as a
+candidate bundle (models/<name>.candidate.bundle), never over the serving
+one. The server verifies and shadow-tests it like any retrained model (see
+predictors.py) and only then renames it over models/<name>.bundle, keeping
+the version it replaces; a candidate that disagrees too much with the
+serving model is deleted there, so it never survives a restart. The next
+update builds on a candidate still waiting for its trial, or else on the
+serving bundle.
+
+The learner runs at a lower priority, single-threaded, and sleeps so its CPU
+time stays under --cpu-share of one core.
+"""
+import os
+import sys
+import json
+import math
+import time
+import logging
+import argparse
+import threading
+import subprocess
+
+import metrics
+from model_bundle import MODEL_DIR, bundle_path, candidate_path, load_bundle, save_bundle
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DIR = 'online_learning'
+AGGREGATES_FILE = 'aggregates.json'
+STATE_FILE = 'learner_state.json'
+
+# Telemetry channel -> quality field a sample must pass (None: any non-zero value counts)
+CHANNELS = {"heartRate": "heartRateQuality", "spo2": "spo2Quality", "temperature": None}
+MIN_QUALITY = 0.5                # Lowest heartRateQuality/spo2Quality a sample is aggregated with
+EWMA_ALPHA = 0.05                # Weight of each new sample in the exponentially weighted mean
+SAVE_INTERVAL = 60.0             # Seconds between saves of the aggregates
+
+# Model input -> telemetry channel whose mean fills it when a request doesn't give it
+TELEMETRY_FEATURES = {
+    "hypertension": {"heartRate": "heartRate"},
+    "cardiac": {"Heart Rate": "heartRate"},
+    "anxiety": {}
+}
+MIN_TELEMETRY_SAMPLES = 30       # Samples a channel needs before its mean is used as a model input
+
+LEARN_INTERVAL = 300.0           # Seconds between checks for new examples
+MIN_NEW_EXAMPLES = 20            # New examples a model needs before it is updated
+HISTORY_WINDOW = 5000            # Most recent examples new forest trees are grown on
+ONLINE_TREES = 10                # Trees added to a forest per update
+MAX_ONLINE_TREES = 100           # Added trees kept; the oldest are dropped first
+CPU_SHARE = 0.25                 # Fraction of one core the learner may use on average
+LEARNER_NICE = 10
+
+EXAMPLES_RECORDED = metrics.counter('synapse_online_examples_total', 'Labelled outcomes recorded for online learning',
+                                    ['model'])
+
+
+class RunningStats:
+    """Streaming count, mean, variance (Welford), range and EWMA of one channel"""
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, minimum=None, maximum=None, ewma=None, last=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.minimum = minimum
+        self.maximum = maximum
+        self.ewma = ewma
+        self.last = last
+
+    def add(self, value, now):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+        self.ewma = value if self.ewma is None else self.ewma + EWMA_ALPHA * (value - self.ewma)
+        self.last = now
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "minimum": self.minimum,
+                "maximum": self.maximum, "ewma": self.ewma, "last": self.last}
+
+    def describe(self):
+        return {"count": self.count, "mean": round(self.mean, 2), "std": round(self.std, 2), "min": self.minimum,
+                "max": self.maximum, "ewma": round(self.ewma, 2) if self.ewma is not None else None,
+                "last_updated": self.last}
+
+
+class PatientAggregates:
+    """Per-patient telemetry aggregates, fed from the sensor stream"""
+
+    def __init__(self, history_dir=HISTORY_DIR):
+        self.path = os.path.join(history_dir, AGGREGATES_FILE)
+        self.patients = {}
+        self._last_updated = {}
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+
+    def load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    saved = json.load(f)
+                with self._lock:
+                    self.patients = {patient: {channel: RunningStats(**stats) for channel, stats in channels.items()}
+                                     for patient, channels in saved.items()}
+        except Exception as e:
+            logger.error(f"Error loading telemetry aggregates: {e}")
+        return self
+
+    def save(self):
+        with self._lock:
+            saved = {patient: {channel: stats.to_dict() for channel, stats in channels.items()}
+                     for patient, channels in self.patients.items()}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temporary = f"{self.path}.tmp"
+            with open(temporary, 'w') as f:
+                json.dump(saved, f)
+            os.replace(temporary, self.path)
+        except OSError as e:
+            logger.error(f"Error saving telemetry aggregates: {e}")
+
+    def update(self, reading):
+        """Add a reading's accepted vitals to its patient's aggregates"""
+        patient = reading.get("patient_id") or reading.get("device_id")
+        now = reading.get("last_updated")
+        # Geofence and other non-vitals updates republish the same sample
+        if patient is None or now is None or self._last_updated.get(patient) == now:
+            return
+        self._last_updated[patient] = now
+        with self._lock:
+            channels = self.patients.setdefault(patient, {})
+            for channel, quality in CHANNELS.items():
+                value = reading.get(channel)
+                if not value or (quality is not None and reading.get(quality, 0) < MIN_QUALITY):
+                    continue
+                channels.setdefault(channel, RunningStats()).add(float(value), now)
+
+    def describe(self, patient=None):
+        with self._lock:
+            patients = self.patients if patient is None else {patient: self.patients.get(patient, {})}
+            return {p: {channel: stats.describe() for channel, stats in channels.items()}
+                    for p, channels in patients.items()}
+
+    def features(self, name, patient, record):
+        """record with the model's telemetry inputs it lacks filled from the patient's aggregates"""
+        record = dict(record or {})
+        with self._lock:
+            channels = self.patients.get(patient, {})
+            for feature, channel in TELEMETRY_FEATURES.get(name, {}).items():
+                stats = channels.get(channel)
+                if feature not in record and stats is not None and stats.count >= MIN_TELEMETRY_SAMPLES:
+                    record[feature] = round(stats.mean, 1)
+        return record
+
+    def start(self, stream):
+        """Consume stream in a background thread, saving every SAVE_INTERVAL seconds"""
+        if self._running:
+            return False
+        self._running = True
+        self._thread = threading.Thread(target=self._run, args=(stream,), name="telemetry-aggregates", daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self, stream):
+        saved_at = time.monotonic()
+        with stream.subscribe() as subscription:
+            while self._running:
+                reading = subscription.get(timeout=1.0)
+                if reading is not None:
+                    try:
+                        self.update(reading)
+                    except Exception as e:
+                        logger.error(f"Error aggregating telemetry: {e}")
+                if time.monotonic() - saved_at >= SAVE_INTERVAL:
+                    self.save()
+                    saved_at = time.monotonic()
+
+    def stop(self):
+        if self._running:
+            self._running = False
+            self._thread.join(timeout=2.0)
+            self.save()
+
+
+class ExampleLog:
+    """Labelled examples for each model, one JSON line each in online_learning/<name>.jsonl"""
+
+    def __init__(self, history_dir=HISTORY_DIR):
+        self.history_dir = history_dir
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        return os.path.join(self.history_dir, name + '.jsonl')
+
+    def append(self, name, record, label, patient=None):
+        entry = {"time": time.time(), "patient_id": patient, "record": record, "label": int(label)}
+        with self._lock:
+            os.makedirs(self.history_dir, exist_ok=True)
+            with open(self.path(name), 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+        EXAMPLES_RECORDED.labels(name).inc()
+        return entry
+
+    def read(self, name):
+        """All examples recorded for a model, oldest first; unreadable lines are skipped"""
+        examples = []
+        try:
+            with open(self.path(name), 'r') as f:
+                for line in f:
+                    try:
+                        examples.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            pass
+        return examples
+
+
+class Learner:
+    """Updates models from their example logs and writes candidate bundles"""
+
+    def __init__(self, model_dir=MODEL_DIR, history_dir=HISTORY_DIR):
+        self.model_dir = model_dir
+        self.examples = ExampleLog(history_dir)
+        self.state_path = os.path.join(history_dir, STATE_FILE)
+        # Model name -> number of logged examples already learned from
+        self.learned = {}
+        try:
+            with open(self.state_path, 'r') as f:
+                self.learned = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        temporary = f"{self.state_path}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(self.learned, f)
+        os.replace(temporary, self.state_path)
+
+    def update(self, name):
+        """Learn a model's new examples if there are enough; returns the candidate bundle's header or None"""
+        examples = self.examples.read(name)
+        new = examples[self.learned.get(name, 0):]
+        if len(new) < MIN_NEW_EXAMPLES:
+            return None
+        candidate = candidate_path(name, self.model_dir)
+        # A candidate the server hasn't tried yet already has the earlier updates
+        path = candidate if os.path.exists(candidate) else bundle_path(name, self.model_dir)
+        if not os.path.exists(path):
+            return None
+
+        import numpy as np
+        from feature_schema import SCHEMAS
+
+        bundle = load_bundle(path)
+        schema = SCHEMAS[name]
+        if bundle.schema_version != schema.version:
+            logger.warning(f"Not updating {name}: bundle is for schema v{bundle.schema_version}, "
+                           f"examples use v{schema.version}; retrain it with train_models.py")
+            return None
+
+        def matrix(entries):
+            X = schema.matrix([entry["record"] for entry in entries])
+            for preprocessor in bundle.preprocessors:
+                X = preprocessor.transform(X)
+            return X, np.array([entry["label"] for entry in entries])
+
+        X_new, y_new = matrix(new)
+        # Scored before learning them, so this is the model's accuracy on unseen patients
+        prequential = float(np.mean(bundle.model.predict(X_new) == y_new))
+        model = bundle.model
+        online = dict(bundle.header.get("metadata", {}).get("online", {}))
+
+        if hasattr(model, 'partial_fit'):
+            model.partial_fit(X_new, y_new)
+            method = 'partial_fit'
+        elif hasattr(model, 'warm_start') and hasattr(model, 'estimators_'):
+            X_window, y_window = matrix(examples[-HISTORY_WINDOW:])
+            if set(np.unique(y_window)) != set(model.classes_):
+                # New trees must see every class, or the forest's votes can't be combined
+                logger.info(f"Waiting for more {name} outcomes: recent examples don't cover every class")
+                return None
+            base = online.setdefault("base_trees", len(model.estimators_))
+            model.set_params(warm_start=True, n_estimators=len(model.estimators_) + ONLINE_TREES, n_jobs=1)
+            model.fit(X_window, y_window)
+            if len(model.estimators_) - base > MAX_ONLINE_TREES:
+                model.estimators_ = model.estimators_[:base] + model.estimators_[-MAX_ONLINE_TREES:]
+                model.n_estimators = len(model.estimators_)
+            method = 'warm_start'
+        else:
+            logger.warning(f"Not updating {name}: {type(model).__name__} supports neither partial_fit nor warm_start")
+            self.learned[name] = len(examples)
+            self._save_state()
+            return None
+
+        online.update(method=method, base_version=online.get("base_version", bundle.version),
+                      updates=online.get("updates", 0) + 1, examples=len(examples),
+                      prequential_accuracy=prequential)
+        metadata = dict(bundle.header.get("metadata", {}), online=online)
+        header = save_bundle(candidate, name, model, bundle.preprocessors, schema=schema, metadata=metadata)
+        self.learned[name] = len(examples)
+        self._save_state()
+        logger.info(f"Updated {name} by {method} on {len(new)} new examples ({len(examples)} in all): "
+                    f"candidate version {header['version']}, {prequential:.0%} accurate on them beforehand")
+        return header
+
+    def run(self, interval=LEARN_INTERVAL, cpu_share=CPU_SHARE, once=False):
+        """Check every model every interval seconds, sleeping longer to stay within cpu_share"""
+        while True:
+            started = time.process_time()
+            for name in TELEMETRY_FEATURES:
+                try:
+                    self.update(name)
+                except Exception as e:
+                    logger.error(f"Error updating the {name} model: {e}")
+            if once:
+                return
+            used = time.process_time() - started
+            time.sleep(max(interval, used * (1.0 / cpu_share - 1.0)))
+
+
+_learner_process = None
+
+
+def start_learner(args=()):
+    """Run the learner as a child process of the web server"""
+    global _learner_process
+    if _learner_process is not None and _learner_process.poll() is None:
+        return False
+    _learner_process = subprocess.Popen([sys.executable, os.path.abspath(__file__), *args])
+    logger.info(f"Online learner started (pid {_learner_process.pid})")
+    return True
+
+
+def stop_learner(timeout=5.0):
+    global _learner_process
+    if _learner_process is None:
+        return
+    if _learner_process.poll() is None:
+        _learner_process.terminate()
+        try:
+            _learner_process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            _learner_process.kill()
+    _learner_process = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Update the prediction models from recorded patient outcomes')
+    parser.add_argument('--interval', type=float, default=LEARN_INTERVAL, help='Seconds between checks')
+    parser.add_argument('--cpu-share', type=float, default=CPU_SHARE,
+                        help='Average fraction of one core the learner may use')
+    parser.add_argument('--model-dir', default=MODEL_DIR, help='Where the model bundles are')
+    parser.add_argument('--history-dir', default=HISTORY_DIR, help='Where the example logs are')
+    parser.add_argument('--once', action='store_true', help='Check once and exit')
+    args = parser.parse_args()
+    if not 0 < args.cpu_share <= 1:
+        parser.error("--cpu-share must be in (0, 1]")
+
+    # Lower priority and one BLAS/OpenMP thread (set before numpy is imported), so serving comes first
+    for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ.setdefault(variable, '1')
+    try:
+        os.nice(LEARNER_NICE)
+    except (AttributeError, OSError):
+        pass
+
+    logger.info(f"Online learner checking every {args.interval:.0f}s, using at most {args.cpu_share:.0%} of a core")
+    try:
+        Learner(args.model_dir, args.history_dir).run(args.interval, args.cpu_share, args.once)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    main()
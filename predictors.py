@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Risk models behind the /api/predict endpoints, loaded on first use and
+hot-swapped when a new version is written.
+
+joblib and scikit-learn take around a second to import and the models more
+to load, so a server that only relays telemetry and alerts never pays for
+them. The first request to each endpoint loads models/<name>.bundle (see
+model_bundle.py), or the bare .pkl files from before bundles. A model that
+fails to load is remembered as unavailable rather than retried per request.
+
+Models are checked against their feature schema (feature_schema.py): one
+built for another schema version, or expecting other columns, is refused
+until it is retrained.
+
+Once loaded, a model's bundle file is watched. A new version is loaded and
+verified in the background, warmed up, and run in shadow on the most recent
+requests next to the serving version. It replaces the serving version (a
+single reference swap, so in-flight requests finish on the old one) only if
+it predicts without errors and agrees with it on at least MIN_AGREEMENT of
+those requests.
+
+Updates from online_learning.py arrive as models/<name>.candidate.bundle and
+go through the same trial. Only one that passes is renamed over the serving
+bundle, with the version it replaces kept as models/<name>.previous.bundle;
+a rejected candidate is deleted, so a restart still loads the serving version.
+"""
+import os
+import logging
+import threading
+from collections import deque
+
+import metrics
+from model_bundle import (MODEL_DIR, BundleError, bundle_path, candidate_path, load_bundle, load_legacy,
+                          previous_path, promote_bundle, read_header)
+
+logger = logging.getLogger(__name__)
+
+# Model name -> pickles loaded when there is no bundle: the model, then its preprocessors
+LEGACY_MODEL_FILES = {
+    "hypertension": ('sensor_rf_model.pkl',),
+    "cardiac": ('cardiac_arrest_model.pkl',),
+    "anxiety": ('anxiety_model.pkl', 'anxiety_imputer.pkl')
+}
+
+WATCH_INTERVAL = 5.0             # Seconds between checks for new bundle and candidate files
+SHADOW_SAMPLES = 64              # Recent request rows kept per model for shadow comparison
+MIN_AGREEMENT = 0.8              # Share of recent requests a new version must label like the serving one
+
+MODEL_RELOADS = metrics.counter('synapse_model_reloads_total', 'New model versions tried', ['model', 'outcome'])
+SHADOW_AGREEMENT = metrics.gauge('synapse_model_shadow_agreement', 'Agreement of the last candidate with the serving model',
+                                 ['model'])
+
+
+def _schema(name):
+    from feature_schema import SCHEMAS
+    return SCHEMAS[name]
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+def _schema_mismatch(bundle):
+    """Why a bundle doesn't fit its feature schema, or None"""
+    schema = _schema(bundle.name)
+    if bundle.schema_version is not None and bundle.schema_version != schema.version:
+        return f"built for feature schema v{bundle.schema_version}, serving v{schema.version}"
+    columns = bundle.header.get("columns")
+    if columns is not None and columns != schema.columns:
+        return f"trained on different columns than schema v{schema.version}"
+    for obj in (bundle.model, *bundle.preprocessors):
+        width = getattr(obj, 'n_features_in_', None)
+        if width is not None and width != len(schema):
+            return f"expects {width} features, schema v{schema.version} has {len(schema)}"
+    return None
+
+
+class ModelSlot:
+    """The serving version of one model"""
+
+    def __init__(self, name, model_dir=MODEL_DIR):
+        self.name = name
+        self.path = bundle_path(name, model_dir)
+        self.candidate_path = candidate_path(name, model_dir)
+        self.previous_path = previous_path(name, model_dir)
+        self.bundle = None
+        self.loaded = False
+        self.recent = deque(maxlen=SHADOW_SAMPLES)
+        self._stamp = None
+        self._candidate_stamp = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The serving bundle, loading it on first use; None if unavailable"""
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self.bundle = self._load_initial()
+                    self.loaded = True
+        return self.bundle
+
+    def _load_initial(self):
+        self._stamp = _file_stamp(self.path)
+        try:
+            if self._stamp is not None:
+                bundle = load_bundle(self.path)
+            else:
+                bundle = load_legacy(self.name, LEGACY_MODEL_FILES[self.name])
+        except ImportError:
+            logger.error("Joblib not available. Prediction models will be disabled.")
+            return None
+        except Exception as e:
+            logger.error(f"Error loading {self.name} model: {e}")
+            return None
+        problem = _schema_mismatch(bundle)
+        if problem:
+            logger.error(f"Not using the {self.name} model: {problem}; retrain it with the current training script")
+            return None
+        logger.info(f"{self.name.capitalize()} model loaded successfully (version {bundle.version})")
+        return bundle
+
+    def predict(self, record):
+        """Prediction for one request record from whichever version is serving"""
+        bundle = self.bundle
+        row, features = _schema(self.name).row(record)
+        labels, probabilities = bundle.predict(row)
+        self.recent.append(row[0])
+        result = {"risk": int(labels[0]), "features": features, "model_version": bundle.version}
+        if probabilities is not None:
+            result["probability"] = float(probabilities[0])
+        return result
+
+    def check(self):
+        """Try the bundle file if it changed, then any candidate from the learner; returns True if one was swapped in"""
+        swapped = False
+        stamp = _file_stamp(self.path)
+        if stamp is not None and stamp != self._stamp:
+            self._stamp = stamp
+            candidate = self._verify(self.path)
+            if candidate is not None:
+                swapped = self._swap(candidate)
+
+        stamp = _file_stamp(self.candidate_path)
+        if stamp is not None and stamp != self._candidate_stamp:
+            self._candidate_stamp = stamp
+            candidate = self._verify(self.candidate_path)
+            try:
+                if candidate is None:
+                    # Written atomically, so it is never a copy in progress
+                    os.remove(self.candidate_path)
+                else:
+                    promote_bundle(self.candidate_path, self.path, self.previous_path)
+                    self._stamp = _file_stamp(self.path)
+            except OSError as e:
+                logger.error(f"Error promoting the {self.name} candidate: {e}")
+                MODEL_RELOADS.labels(self.name, 'error').inc()
+                return swapped
+            if candidate is not None:
+                candidate.path = self.path
+                self._swap(candidate)
+                swapped = True
+        return swapped
+
+    def _verify(self, path):
+        """The new version at path if it loads and passes its trial, otherwise None"""
+        try:
+            header = read_header(path)
+            if self.bundle is not None and header.get("sha256") == self.bundle.checksum:
+                return None
+            candidate = load_bundle(path)
+        except (OSError, BundleError) as e:
+            # Possibly a copy still in progress; the next write changes the stamp again
+            logger.error(f"New {self.name} bundle rejected: {e}")
+            MODEL_RELOADS.labels(self.name, 'corrupt').inc()
+            return None
+        except Exception as e:
+            logger.error(f"Error loading new {self.name} bundle: {e}")
+            MODEL_RELOADS.labels(self.name, 'error').inc()
+            return None
+
+        problem = _schema_mismatch(candidate) or self._trial(candidate)
+        if problem:
+            logger.error(f"Keeping {self.name} model {self.bundle.version if self.bundle else 'none'}: "
+                         f"version {candidate.version} {problem}")
+            MODEL_RELOADS.labels(self.name, 'rejected').inc()
+            return None
+        return candidate
+
+    def _swap(self, candidate):
+        previous, self.bundle = self.bundle, candidate
+        logger.info(f"Swapped {self.name} model {previous.version if previous else 'none'} -> {candidate.version}")
+        MODEL_RELOADS.labels(self.name, 'swapped').inc()
+
+    def _trial(self, candidate):
+        """Warm-up and shadow comparison; returns why the candidate failed, or None"""
+        import numpy as np
+
+        # The schema defaults plus the recent requests
+        matrix = np.vstack([_schema(self.name).row({})[0], *list(self.recent)])
+        try:
+            labels, probabilities = candidate.predict(matrix)
+        except Exception as e:
+            return f"failed its warm-up: {e}"
+        if len(labels) != len(matrix) or (probabilities is not None and not np.all(np.isfinite(probabilities))):
+            return "gave invalid warm-up predictions"
+        if self.bundle is None or len(matrix) < 2:
+            return None
+
+        serving, _ = self.bundle.predict(matrix)
+        agreement = float(np.mean(serving == labels))
+        SHADOW_AGREEMENT.labels(self.name).set(agreement)
+        logger.info(f"Shadow run of {self.name} {candidate.version}: {agreement:.0%} agreement "
+                    f"with {self.bundle.version} over {len(matrix)} rows")
+        if agreement < MIN_AGREEMENT:
+            return f"agreed with the serving model on only {agreement:.0%} of recent requests"
+        return None
+
+
+_slots = {name: ModelSlot(name) for name in LEGACY_MODEL_FILES}
+_watcher = None
+_stop_watching = threading.Event()
+
+
+def get(name):
+    """The serving ModelBundle for a model, or None if unavailable"""
+    return _slots[name].get()
+
+
+def predict(name, record):
+    """{"risk", "probability", "features", "model_version"} for one request; get(name) must have succeeded"""
+    return _slots[name].predict(record)
+
+
+def describe():
+    """Serving version of each model loaded so far"""
+    return {name: slot.bundle.describe() if slot.bundle else None
+            for name, slot in _slots.items() if slot.loaded}
+
+
+def _watch(interval):
+    while not _stop_watching.wait(interval):
+        for slot in _slots.values():
+            # Models nobody has asked for stay unloaded
+            if slot.loaded:
+                try:
+                    slot.check()
+                except Exception as e:
+                    logger.error(f"Error checking for a new {slot.name} model: {e}")
+
+
+def start_watching(interval=WATCH_INTERVAL):
+    """Poll the loaded models' bundle files for new versions in a background thread"""
+    global _watcher
+    if _watcher is not None:
+        return False
+    _stop_watching.clear()
+    _watcher = threading.Thread(target=_watch, args=(interval,), name="model-watcher", daemon=True)
+    _watcher.start()
+    return True
+
+
+def stop_watching():
+    global _watcher
+    _stop_watching.set()
+    if _watcher is not None:
+        _watcher.join(timeout=2.0)
+        _watcher = None
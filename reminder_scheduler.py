@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Event-driven dose reminders for the Synapse AR web server.
+
+Every medicine and schedule entry has its next due time kept in a heap. A single
+thread sleeps on a condition variable until the earliest one is due, fires the
+reminder (device OLED command plus any registered push channels) and then
+reschedules it for the next day. Taken/missed state is persisted to disk.
+"""
+import os
+import json
+import time
+import heapq
+import logging
+import datetime
+import threading
+
+from medicine_schedule import (parse_medicine_entry, parse_schedule_entry, parse_time_of_day,
+                               normalize_name, DOSE_WINDOW_BEFORE, DOSE_WINDOW_AFTER)
+
+logger = logging.getLogger(__name__)
+
+REMINDER_STATE_FILE = 'reminder_state.json'
+STATE_HISTORY_DAYS = 7           # Days of taken/missed history kept on disk
+
+# Reminder events
+EVENT_DUE = "due"
+EVENT_MISSED = "missed"
+
+# Dose statuses
+STATUS_PENDING = "pending"
+STATUS_REMINDED = "reminded"
+STATUS_TAKEN = "taken"
+STATUS_MISSED = "missed"
+
+
+def next_occurrence(minutes_of_day, after=None):
+    """Timestamp of the next time the clock reads minutes_of_day (strictly after 'after')"""
+    after = after if after is not None else time.time()
+    base = datetime.datetime.fromtimestamp(after)
+    due = base.replace(hour=minutes_of_day // 60, minute=minutes_of_day % 60, second=0, microsecond=0)
+    if due.timestamp() <= after:
+        due += datetime.timedelta(days=1)
+    return due.timestamp()
+
+
+class ReminderScheduler:
+    """Heap-based scheduler that fires medicine and schedule reminders on time"""
+
+    def __init__(self, send_command=None, state_path=REMINDER_STATE_FILE,
+                 missed_after=DOSE_WINDOW_AFTER, taken_before=DOSE_WINDOW_BEFORE):
+        self.send_command = send_command
+        self.state_path = state_path
+        self.missed_after = missed_after * 60
+        self.taken_before = taken_before * 60
+        self.reminders = {}
+        self.notifiers = []
+        self._heap = []
+        self._seq = 0
+        self._generation = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._state = self._load_state()
+
+    # --- Configuration -------------------------------------------------------
+
+    def add_notifier(self, callback):
+        """Register callback(reminder, event) for push channels"""
+        self.notifiers.append(callback)
+
+    def set_entries(self, medicines=None, schedule=None):
+        """Replace the reminder set from device medicine/schedule lists"""
+        reminders = {}
+        if medicines is not None:
+            for item in medicines:
+                name, time_text = parse_medicine_entry(item["name"])
+                self._add_reminder(reminders, "medicine", item["index"], name, time_text)
+        else:
+            reminders.update({k: r for k, r in self.reminders.items() if r["kind"] == "medicine"})
+
+        if schedule is not None:
+            for item in schedule:
+                time_text, activity = parse_schedule_entry(item["details"])
+                self._add_reminder(reminders, "schedule", item["index"], activity, time_text)
+        else:
+            reminders.update({k: r for k, r in self.reminders.items() if r["kind"] == "schedule"})
+
+        with self._cond:
+            if reminders.keys() == self.reminders.keys():
+                return
+            self.reminders = reminders
+            self._rebuild_heap()
+            self._cond.notify()
+
+    def _add_reminder(self, reminders, kind, index, name, time_text):
+        minutes = parse_time_of_day(time_text) if time_text else None
+        if minutes is None:
+            logger.warning(f"Skipping {kind} reminder without a valid time: {name!r}")
+            return
+        reminder_id = f"{kind}:{index}:{normalize_name(name)}:{minutes}"
+        reminders[reminder_id] = {
+            "id": reminder_id,
+            "kind": kind,
+            "index": index,
+            "name": name,
+            "time_text": time_text,
+            "minutes": minutes
+        }
+
+    def _rebuild_heap(self):
+        # Stale heap items are skipped by generation rather than removed
+        self._generation += 1
+        self._heap = []
+        now = time.time()
+        for reminder_id, reminder in self.reminders.items():
+            due = next_occurrence(reminder["minutes"], now)
+            self._push(due, reminder_id, EVENT_DUE)
+            # A dose that was due earlier today may still need its missed check
+            previous_due = due - 24 * 3600
+            if reminder["kind"] == "medicine" and previous_due + self.missed_after > now:
+                self._push(previous_due + self.missed_after, reminder_id, EVENT_MISSED)
+
+    def _push(self, due, reminder_id, event):
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, self._generation, reminder_id, event))
+
+    # --- Dose state ----------------------------------------------------------
+
+    def _load_state(self):
+        try:
+            if os.path.exists(self.state_path):
+                with open(self.state_path, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading reminder state: {e}")
+        return {}
+
+    def _save_state(self):
+        # Keep only the most recent days of history
+        for day in sorted(self._state)[:-STATE_HISTORY_DAYS]:
+            del self._state[day]
+        try:
+            tmp_path = self.state_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self._state, f, indent=4)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            logger.error(f"Error saving reminder state: {e}")
+
+    def _dose_day(self, reminder_id, now=None):
+        """Day of the dose whose window contains now (else the nearest dose), as the
+        due and missed checks key it: a 10 PM dose taken at 00:30 is yesterday's"""
+        now = now if now is not None else time.time()
+        minutes = self.reminders[reminder_id]["minutes"]
+        today = datetime.date.fromtimestamp(now)
+        occurrences = []
+        for offset in (-1, 0, 1):
+            day = today + datetime.timedelta(days=offset)
+            due = datetime.datetime.combine(day, datetime.time(minutes // 60, minutes % 60)).timestamp()
+            if due - self.taken_before <= now <= due + self.missed_after:
+                return day.isoformat()
+            occurrences.append((abs(due - now), day))
+        return min(occurrences)[1].isoformat()
+
+    def get_status(self, reminder_id, day=None):
+        with self._cond:
+            if day is None:
+                if reminder_id not in self.reminders:
+                    return STATUS_PENDING
+                day = self._dose_day(reminder_id)
+            return self._state.get(day, {}).get(reminder_id, {}).get("status", STATUS_PENDING)
+
+    def _set_status(self, reminder_id, day, status):
+        self._state.setdefault(day, {})[reminder_id] = {"status": status, "updated": time.time()}
+        self._save_state()
+
+    def mark_taken(self, reminder_id, day=None, now=None):
+        """Record that a dose was taken; returns its day, or None for unknown reminders"""
+        with self._cond:
+            if reminder_id not in self.reminders:
+                return None
+            day = day or self._dose_day(reminder_id, now)
+            self._set_status(reminder_id, day, STATUS_TAKEN)
+        logger.info(f"Marked {reminder_id} as taken for {day}")
+        return day
+
+    def snapshot(self):
+        """Reminders with their next due time and the status of their current dose"""
+        now = time.time()
+        with self._cond:
+            next_due = {}
+            for due, _, generation, reminder_id, event in self._heap:
+                if generation == self._generation and event == EVENT_DUE:
+                    next_due[reminder_id] = due
+            result = []
+            for reminder_id, reminder in self.reminders.items():
+                item = dict(reminder)
+                item["next_due"] = next_due.get(reminder_id)
+                day = self._dose_day(reminder_id, now)
+                item["status"] = self._state.get(day, {}).get(reminder_id, {}).get("status", STATUS_PENDING)
+                result.append(item)
+        result.sort(key=lambda r: r["next_due"] or float('inf'))
+        return result
+
+    # --- Scheduler thread ----------------------------------------------------
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return False
+            self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        logger.info("Reminder scheduler started")
+        return True
+
+    def stop(self):
+        with self._cond:
+            if not self._running:
+                return False
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+        logger.info("Reminder scheduler stopped")
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                # Sleep until the earliest reminder is due or the set changes
+                while self._running:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0][0] - time.time()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                if not self._running:
+                    return
+
+                due, _, generation, reminder_id, event = heapq.heappop(self._heap)
+                if generation != self._generation or reminder_id not in self.reminders:
+                    continue
+                reminder = dict(self.reminders[reminder_id])
+                # A missed check after midnight still belongs to the dose's day
+                day = datetime.date.fromtimestamp(due if event == EVENT_DUE else due - self.missed_after).isoformat()
+
+                if event == EVENT_DUE:
+                    self._push(next_occurrence(reminder["minutes"], due), reminder_id, EVENT_DUE)
+                    if reminder["kind"] == "medicine":
+                        self._push(due + self.missed_after, reminder_id, EVENT_MISSED)
+                    status = self._state.get(day, {}).get(reminder_id, {}).get("status", STATUS_PENDING)
+                    if status == STATUS_TAKEN:
+                        continue
+                    self._set_status(reminder_id, day, STATUS_REMINDED)
+                else:
+                    status = self._state.get(day, {}).get(reminder_id, {}).get("status", STATUS_PENDING)
+                    if status == STATUS_TAKEN:
+                        continue
+                    self._set_status(reminder_id, day, STATUS_MISSED)
+
+            # Fire outside the lock so slow serial/push channels never block scheduling
+            self._fire(reminder, event, due)
+
+    def _fire(self, reminder, event, due):
+        lateness = time.time() - due
+        logger.info(f"Reminder {event}: {reminder['name']} ({reminder['time_text']}), fired {lateness:.2f}s after due")
+
+        if self.send_command and event == EVENT_DUE:
+            if reminder["kind"] == "medicine":
+                status = f"Take now ({reminder['time_text']})"
+            else:
+                status = f"Now ({reminder['time_text']})"
+            try:
+                self.send_command(f"reminder {reminder['name']}|{status}")
+            except Exception as e:
+                logger.error(f"Error sending reminder to device: {e}")
+
+        for notify in self.notifiers:
+            try:
+                notify(reminder, event)
+            except Exception as e:
+                logger.error(f"Error in reminder notifier: {e}")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+In-process fan-out of sensor readings.
+
+The serial reader publishes every complete reading here. Consumers such as the
+alert engine or the /api/sensor_stream push endpoint subscribe and receive each
+reading as it arrives instead of polling the HTTP API.
+"""
+import time
+import logging
+import threading
+from queue import Queue, Empty, Full
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIPTION_QUEUE_SIZE = 256    # Readings buffered per subscriber before the oldest is dropped
+
+
+class Subscription:
+    """Bounded queue of readings for one consumer"""
+
+    def __init__(self, stream, max_pending=SUBSCRIPTION_QUEUE_SIZE):
+        self.stream = stream
+        self.queue = Queue(maxsize=max_pending)
+        self.dropped = 0
+
+    def put(self, reading):
+        # A slow consumer loses its oldest readings, never blocks the publisher
+        while True:
+            try:
+                self.queue.put_nowait(reading)
+                return
+            except Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Next reading, or None if none arrived within timeout"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except Empty:
+            return None
+
+    def close(self):
+        self.stream.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SensorStream:
+    """Publishes sensor readings to all current subscribers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = []
+        self.sequence = 0
+        self.last_reading = None
+
+    def subscribe(self, max_pending=SUBSCRIPTION_QUEUE_SIZE):
+        subscription = Subscription(self, max_pending)
+        with self._lock:
+            self._subscriptions = self._subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions = [s for s in self._subscriptions if s is not subscription]
+
+    def publish(self, reading):
+        """Deliver a copy of reading (a dict) to every subscriber"""
+        with self._lock:
+            self.sequence += 1
+            reading = dict(reading)
+            reading["seq"] = self.sequence
+            reading.setdefault("published_at", time.time())
+            self.last_reading = reading
+            subscriptions = self._subscriptions
+        for subscription in subscriptions:
+            subscription.put(reading)
+        return reading
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscriptions)
+
+
+# Stream used by the web server's serial reader
+sensor_stream = SensorStream()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+asyncio transport for Synapse AR wearables.
+
+One event loop, running in a single background thread, owns every serial
+port. Each port is an asyncio Protocol fed by pyserial-asyncio (the port's fd
+is watched by the loop, so there are no per-port threads or polling sleeps).
+Synchronous code such as Flask handlers calls into the loop with
+EventLoopThread.run(), which blocks only the calling request.
+"""
+import asyncio
+import logging
+import threading
+
+import serial_asyncio
+
+logger = logging.getLogger(__name__)
+
+BAUD_RATE = 115200
+
+
+class EventLoopThread:
+    """An asyncio loop running forever in a daemon thread"""
+
+    def __init__(self, name="serial-loop"):
+        self.name = name
+        self.loop = None
+        self._thread = None
+        self._started = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        self._started.wait()
+        return True
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._started.set()
+        logger.info("Serial event loop started")
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+            logger.info("Serial event loop stopped")
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop; returns a concurrent.futures.Future"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the loop and wait for its result"""
+        return self.submit(coro).result(timeout)
+
+    def call_soon(self, callback, *args):
+        self.start()
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self):
+        with self._lock:
+            if self._thread is None:
+                return False
+            thread, self._thread = self._thread, None
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        thread.join(timeout=2.0)
+        self._started.clear()
+        return True
+
+
+class SerialLineProtocol(asyncio.Protocol):
+    """Splits the byte stream into lines and hands them to a line handler"""
+
+    def __init__(self, on_line, on_lost=None, max_line=4096):
+        self.on_line = on_line
+        self.on_lost = on_lost
+        self.max_line = max_line
+        self.transport = None
+        self._partial = b""
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        chunks = (self._partial + data).split(b"\n")
+        self._partial = chunks.pop()
+        if len(self._partial) > self.max_line:
+            # A device that never sends a newline shouldn't grow memory without bound
+            self._partial = b""
+        for chunk in chunks:
+            try:
+                self.on_line(chunk.decode('utf-8', errors='replace').strip())
+            except Exception as e:
+                logger.error(f"Error handling serial line: {e}")
+
+    def connection_lost(self, exc):
+        self.transport = None
+        if self.on_lost:
+            self.on_lost(exc)
+
+    def write_line(self, text):
+        if self.transport is None:
+            raise ConnectionError("Serial transport is closed")
+        self.transport.write((text + "\n").encode('utf-8'))
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+
+async def open_serial(port, on_line, on_lost=None, baudrate=BAUD_RATE):
+    """Open a serial port on the running loop; returns the protocol"""
+    loop = asyncio.get_running_loop()
+    _, protocol = await serial_asyncio.create_serial_connection(
+        loop, lambda: SerialLineProtocol(on_line, on_lost), port, baudrate=baudrate
+    )
+    return protocol
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the Synapse AR web interface.
+
+    python serve.py                  # gevent server on 0.0.0.0:8081
+    python serve.py --port 9000 --access-log
+
+or under gunicorn, which patches the same way before loading the app:
+
+    gunicorn -k gevent -w 1 -b 0.0.0.0:8081 'synapse_web:create_app()'
+
+Every request, sensor stream and ?wait= long-poll runs in its own greenlet,
+so hundreds of open connections cost a few KB each rather than a thread.
+The standard library is patched before synapse_web is imported so its locks,
+queues and serial thread cooperate with the server's greenlets. The serial
+ports belong to one process: always run a single worker.
+
+`python synapse_web.py` still runs Flask's threaded development server.
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import socket
+import signal
+import logging
+import argparse
+
+import gevent
+from gevent.pywsgi import WSGIServer
+
+import synapse_web
+
+logger = logging.getLogger(__name__)
+
+
+class NoDelayWSGIServer(WSGIServer):
+    """WSGIServer that sends each response as soon as it is written.
+
+    pywsgi writes the headers and the body separately; with Nagle's algorithm
+    the body then waits for the client's delayed ACK (about 40 ms), capping a
+    keep-alive connection at around 25 requests per second.
+    """
+
+    def handle(self, sock, address):
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            # Not a TCP socket
+            pass
+        super().handle(sock, address)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the Synapse AR web interface with gevent')
+    parser.add_argument('--host', default=synapse_web.DEFAULT_HOST, help='Address to listen on')
+    parser.add_argument('--port', type=int, default=synapse_web.DEFAULT_PORT, help='Port to listen on')
+    parser.add_argument('--access-log', action='store_true', help='Log every request')
+    parser.add_argument('--online-learning', action='store_true',
+                        help='Also run the online learner (online_learning.py) as a child process')
+    args = parser.parse_args()
+
+    app = synapse_web.create_app()
+    if args.online_learning:
+        synapse_web.online_learning.start_learner()
+    server = NoDelayWSGIServer((args.host, args.port), app, log='default' if args.access_log else None)
+
+    def shutdown():
+        # Stop accepting, give in-flight requests SHUTDOWN_TIMEOUT to finish, then serve_forever returns
+        logger.info("Shutting down...")
+        server.stop(timeout=synapse_web.SHUTDOWN_TIMEOUT)
+
+    gevent.signal_handler(signal.SIGTERM, shutdown)
+    gevent.signal_handler(signal.SIGINT, shutdown)
+
+    logger.info(f"Serving Synapse AR Web Interface on http://{args.host}:{args.port} (gevent)")
+    try:
+        server.serve_forever()
+    finally:
+        synapse_web.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Signal-quality stage for the wearable's heart rate and SpO2 readings.
+
+The MAX30105 reports zeros while the finger is off the sensor and wild values
+while the wearer moves, and the firmware's validReadings flag only says a
+finger was detected at some point. Each channel therefore goes through:
+
+  1. a range gate: zeros (no finger) and values outside what a living
+     patient can show,
+  2. a Hampel filter: rejected if further than HAMPEL_THRESHOLD scaled MADs
+     from the median of the last HAMPEL_WINDOW in-range samples,
+  3. a rate-of-change gate against the last accepted sample.
+
+Every sample gets a confidence from 0 to 1. Only accepted samples feed the
+rolling averages (heartRateAvg, spo2Avg) that the alert rules use; an
+average of 0 means no sample was accepted in the window ("no valid
+reading"), never a measurement. Artifacts are brief, so a value that keeps
+being rejected but agrees with itself for PERSIST_SAMPLES samples in a row
+(a real desaturation or bradycardia, a sudden step) is taken as the
+patient's and accepted from then on, even outside the range limits.
+"""
+import time
+from collections import deque
+
+import metrics
+
+HAMPEL_WINDOW = 7                # In-range samples the median is taken over
+HAMPEL_THRESHOLD = 3.0           # Scaled MADs from the median before a sample is an outlier
+MAD_SCALE = 1.4826               # MAD to standard deviation for normally distributed noise
+RESET_GAP = 60.0                 # Seconds without samples after which a channel starts afresh
+AVERAGE_WINDOW = 10              # Seconds of accepted samples in the rolling averages
+PERSIST_SAMPLES = 5              # Consistent rejected samples in a row that are accepted as a real change
+PERSIST_CONFIDENCE = 0.5         # Confidence of a sample accepted because it persisted
+
+# Per-channel limits: physically possible range (severe bradycardia and hypoxemia
+# are inside it), largest change per second, smallest spread assumed for the
+# Hampel test (so a flat signal doesn't reject a 1-unit step)
+CHANNELS = {
+    "heartRate": {"low": 20, "high": 250, "max_rate": 15.0, "min_spread": 3.0},
+    "spo2": {"low": 50, "high": 100, "max_rate": 2.0, "min_spread": 1.0}
+}
+
+SAMPLES_REJECTED = metrics.counter('synapse_samples_rejected_total', 'Vital-sign samples rejected by the quality stage',
+                                   ['channel', 'reason'])
+
+
+class ChannelFilter:
+    """Range, Hampel and rate-of-change gates for one channel"""
+
+    def __init__(self, name, low, high, max_rate, min_spread, window=HAMPEL_WINDOW, threshold=HAMPEL_THRESHOLD):
+        self.name = name
+        self.low = low
+        self.high = high
+        self.max_rate = max_rate
+        self.min_spread = min_spread
+        self.threshold = threshold
+        self.window = deque(maxlen=window)
+        self.last_value = None           # Last accepted sample
+        self.last_time = None
+        self.last_seen = None
+        self.rejected_run = deque(maxlen=PERSIST_SAMPLES)
+        self._rejected = {reason: SAMPLES_REJECTED.labels(name, reason) for reason in ('range', 'outlier', 'rate')}
+
+    def reset(self):
+        self.window.clear()
+        self.rejected_run.clear()
+        self.last_value = None
+        self.last_time = None
+
+    def update(self, value, now):
+        """Score one sample; returns (confidence, reason), reason None if accepted"""
+        if self.last_seen is not None and now - self.last_seen > RESET_GAP:
+            self.reset()
+        self.last_seen = now
+
+        if value <= 0:
+            # No finger on the sensor: never a reading, however long it lasts
+            self.rejected_run.clear()
+            self._rejected['range'].inc()
+            return 0.0, 'range'
+
+        confidence, reason = self._gate(value, now)
+        if reason is None:
+            self.rejected_run.clear()
+            return confidence, None
+
+        run = self.rejected_run
+        run.append(value)
+        if len(run) == run.maxlen and max(run) - min(run) <= self.threshold * self.min_spread:
+            # Rejected over and over but consistent: the patient really changed. Restart from it
+            self.window.clear()
+            self.window.extend(v for v in run if self.low <= v <= self.high)
+            self.last_value = value
+            self.last_time = now
+            return PERSIST_CONFIDENCE, None
+        self._rejected[reason].inc()
+        return 0.0, reason
+
+    def _gate(self, value, now):
+        if not self.low <= value <= self.high:
+            return 0.0, 'range'
+
+        window = self.window
+        window.append(value)
+        ordered = sorted(window)
+        median = ordered[len(ordered) // 2]
+        mad = sorted(abs(v - median) for v in window)[len(window) // 2]
+        spread = max(MAD_SCALE * mad, self.min_spread)
+        deviation = abs(value - median) / (self.threshold * spread)
+        if deviation > 1.0:
+            return 0.0, 'outlier'
+
+        rate = 0.0
+        if self.last_value is not None:
+            elapsed = max(now - self.last_time, 1.0)
+            rate = abs(value - self.last_value) / elapsed / self.max_rate
+            if rate > 1.0:
+                return 0.0, 'rate'
+
+        self.last_value = value
+        self.last_time = now
+        # Less trust until the window holds enough history for the median to mean much
+        fill = len(window) / window.maxlen
+        confidence = min(1.0 - deviation, 1.0 - rate) * (0.5 + 0.5 * fill)
+        return round(confidence, 2), None
+
+
+class RollingMean:
+    """Mean of the samples added in the last `duration` seconds"""
+
+    def __init__(self, duration=AVERAGE_WINDOW):
+        self.duration = duration
+        self.buffer = deque()
+        self.total = 0.0
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def _expire(self, now):
+        buffer = self.buffer
+        while buffer and now - buffer[0][0] > self.duration:
+            self.total -= buffer.popleft()[1]
+        if not buffer:
+            self.total = 0.0
+
+    def add(self, value, now):
+        self.buffer.append((now, value))
+        self.total += value
+
+    def value(self, now):
+        self._expire(now)
+        return self.total / len(self.buffer) if self.buffer else 0
+
+
+class SignalQuality:
+    """Quality stage for one device's vital signs"""
+
+    def __init__(self, channels=CHANNELS, average_window=AVERAGE_WINDOW):
+        self.filters = {name: ChannelFilter(name, **limits) for name, limits in channels.items()}
+        self.averages = {name: RollingMean(average_window) for name in channels}
+
+    def apply(self, update, now=None):
+        """Gate the raw values in a parsed reading and replace its averages in place.
+
+        Adds <channel>Quality (confidence of this sample, 0 if rejected) and
+        replaces heartRateAvg/spo2Avg with means of accepted samples only.
+        validReadings stays true only if the firmware said so and at least one
+        channel produced a clean sample.
+        """
+        now = now or time.time()
+        clean = False
+        for name, channel in self.filters.items():
+            if name not in update:
+                continue
+            confidence, reason = channel.update(update[name], now)
+            average = self.averages[name]
+            if reason is None:
+                average.add(update[name], now)
+                clean = True
+            update[name + "Quality"] = confidence
+            update[name + "Avg"] = int(round(average.value(now)))
+        update["validReadings"] = bool(update.get("validReadings", False) and clean)
+        return update
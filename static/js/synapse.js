@@ -0,0 +1,56 @@
+// Theme toggle functionality
+document.addEventListener('DOMContentLoaded', function() {
+    const themeToggle = document.getElementById('theme-toggle');
+    const body = document.body;
+    
+    // Check for saved theme preference
+    const savedTheme = localStorage.getItem('theme');
+    if (savedTheme === 'dark') {
+        body.classList.add('dark-theme');
+        themeToggle.checked = true;
+    }
+    
+    // Handle theme toggle
+    themeToggle.addEventListener('change', function() {
+        if (this.checked) {
+            body.classList.add('dark-theme');
+            localStorage.setItem('theme', 'dark');
+        } else {
+            body.classList.remove('dark-theme');
+            localStorage.setItem('theme', 'light');
+        }
+    });
+});
+
+// Follow a vitals API with long-polling: each request waits on the server
+// for the next reading after the one we have (ETag), so new values show
+// up as they arrive and nothing is re-sent when they haven't changed
+function watchApi(url, onData, onError) {
+    let etag = null;
+    const separator = url.includes('?') ? '&' : '?';
+    const poll = () => {
+        const headers = etag ? {'If-None-Match': etag} : {};
+        fetch(url + separator + 'wait=25', {headers: headers, cache: 'no-store'})
+            .then(response => {
+                if (response.status === 304) {
+                    return null;
+                }
+                etag = response.headers.get('ETag');
+                return response.json();
+            })
+            .then(data => {
+                if (data) {
+                    onData(data);
+                }
+                poll();
+            })
+            .catch(error => {
+                if (onError) {
+                    onError(error);
+                }
+                // Server unreachable: retry less eagerly
+                setTimeout(poll, 5000);
+            });
+    };
+    poll();
+}
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Static assets for the web interface, served without the network.
+
+Third-party libraries (Bootstrap, Font Awesome, Leaflet, the Poppins font)
+are vendored into static/vendor/ once, on a machine with internet access:
+
+    python static_assets.py fetch    # download VENDOR_ASSETS and the fonts/images their CSS uses
+    python static_assets.py build    # hash and precompress everything under static/
+
+`build` copies every file under static/ to static/build/ with a content hash
+in its name (bootstrap.min.3f2a9c1e4b7d.css), rewrites url() references in
+CSS to the hashed names, writes .gz (and .br, if the brotli package is
+installed) variants of text files and records the mapping in
+static/build/manifest.json. Hashed files never change, so the web server
+sends them with a one-year immutable Cache-Control and repeat visits load
+them from the browser cache. The web server rebuilds at startup when a
+source file is newer than the manifest.
+
+Templates use asset_url('vendor/bootstrap/bootstrap.min.css'), which falls
+back to the unhashed file and then to the CDN, so pages still work before
+the first fetch.
+"""
+import os
+import re
+import sys
+import gzip
+import json
+import shutil
+import hashlib
+import logging
+import argparse
+import posixpath
+import urllib.request
+from urllib.parse import urljoin, urlparse
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = 'static'
+BUILD_DIR = os.path.join(STATIC_DIR, 'build')
+MANIFEST_FILE = 'manifest.json'
+HASH_LENGTH = 12
+COMPRESS_TYPES = ('.css', '.js', '.svg', '.json', '.html', '.ttf', '.eot', '.map')
+COMPRESS_MIN_SIZE = 512          # Smaller files aren't worth an extra variant
+CACHE_MAX_AGE = 365 * 24 * 3600  # Hashed assets never change
+FETCH_TIMEOUT = 30
+
+# Google Fonts picks the font format from the User-Agent; ask for woff2
+FETCH_HEADERS = {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                               "Chrome/120.0 Safari/537.36"}
+
+# Path under static/ -> where it is downloaded from (and linked to until it has been)
+VENDOR_ASSETS = {
+    "vendor/bootstrap/bootstrap.min.css":
+        "https://cdn.jsdelivr.net/npm/bootstrap@5.3.0-alpha1/dist/css/bootstrap.min.css",
+    "vendor/bootstrap/bootstrap.bundle.min.js":
+        "https://cdn.jsdelivr.net/npm/bootstrap@5.3.0-alpha1/dist/js/bootstrap.bundle.min.js",
+    "vendor/fontawesome/css/all.min.css":
+        "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css",
+    "vendor/leaflet/leaflet.css": "https://unpkg.com/leaflet@1.9.3/dist/leaflet.css",
+    "vendor/leaflet/leaflet.js": "https://unpkg.com/leaflet@1.9.3/dist/leaflet.js",
+    "vendor/poppins/poppins.css":
+        "https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700&display=swap"
+}
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def _is_local(ref):
+    return not (ref.startswith('data:') or ref.startswith('#') or urlparse(ref).scheme or ref.startswith('//'))
+
+
+def _split_ref(ref):
+    """'../webfonts/fa.woff2?v=6#iefix' -> ('../webfonts/fa.woff2', '?v=6#iefix')"""
+    match = re.match(r'([^?#]*)(.*)', ref)
+    return match.group(1), match.group(2)
+
+
+def _download(url):
+    request = urllib.request.Request(url, headers=FETCH_HEADERS)
+    with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+        return response.read()
+
+
+def fetch(static_dir=STATIC_DIR):
+    """Download VENDOR_ASSETS plus the files their CSS references into static/"""
+    for path, url in VENDOR_ASSETS.items():
+        data = _download(url)
+        if path.endswith('.css'):
+            data = _fetch_css_references(data.decode('utf-8'), url, path, static_dir).encode('utf-8')
+        _write(os.path.join(static_dir, path), data)
+        logger.info(f"Fetched {url} -> {path} ({len(data)} bytes)")
+
+
+def _fetch_css_references(css, css_url, css_path, static_dir):
+    """Download the fonts/images a stylesheet uses next to it; absolute URLs are made relative"""
+    fetched = {}
+
+    def replace(match):
+        quote, ref = match.group(1), match.group(2)
+        if ref.startswith('data:'):
+            return match.group(0)
+        target, suffix = _split_ref(ref)
+        if _is_local(ref):
+            local_ref = target
+        else:
+            # e.g. fonts.gstatic.com/s/poppins/v20/xyz.woff2 -> files/xyz.woff2
+            local_ref = 'files/' + posixpath.basename(urlparse(target).path)
+            suffix = ''
+        local_path = posixpath.normpath(posixpath.join(posixpath.dirname(css_path), local_ref))
+        if local_path not in fetched:
+            fetched[local_path] = True
+            _write(os.path.join(static_dir, local_path), _download(urljoin(css_url, target)))
+        return f"url({quote}{local_ref}{suffix}{quote})"
+
+    return CSS_URL.sub(replace, css)
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _sources(static_dir, build_dir):
+    """Files under static/ (outside the build directory) as posix paths relative to static/"""
+    build_dir = os.path.abspath(build_dir)
+    for root, dirs, files in os.walk(static_dir):
+        if os.path.abspath(root) == build_dir:
+            dirs[:] = []
+            continue
+        dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != build_dir]
+        for name in files:
+            yield os.path.relpath(os.path.join(root, name), static_dir).replace(os.sep, '/')
+
+
+def _hashed_name(path, data):
+    base, ext = posixpath.splitext(path)
+    return f"{base}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def build(static_dir=STATIC_DIR, build_dir=BUILD_DIR):
+    """Hash, rewrite and precompress every static file; returns the manifest"""
+    sources = sorted(_sources(static_dir, build_dir))
+    if os.path.isdir(build_dir):
+        shutil.rmtree(build_dir)
+    manifest = {}
+
+    # CSS last, so the files it references already have their hashed names
+    for path in sorted(sources, key=lambda p: p.endswith('.css')):
+        with open(os.path.join(static_dir, path), 'rb') as f:
+            data = f.read()
+        if path.endswith('.css'):
+            data = _rewrite_css(data.decode('utf-8'), path, manifest).encode('utf-8')
+        hashed = _hashed_name(path, data)
+        output = os.path.join(build_dir, hashed)
+        _write(output, data)
+        if path.endswith(COMPRESS_TYPES) and len(data) >= COMPRESS_MIN_SIZE:
+            _write(output + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+            if BROTLI_AVAILABLE:
+                _write(output + '.br', brotli.compress(data))
+        manifest[path] = hashed
+
+    _write(os.path.join(build_dir, MANIFEST_FILE), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    logger.info(f"Built {len(manifest)} static assets into {build_dir}"
+                f"{'' if BROTLI_AVAILABLE else ' (no brotli package: gzip only)'}")
+    return manifest
+
+
+def _rewrite_css(css, css_path, manifest):
+    """Point relative url() references at the referenced files' hashed names"""
+    directory = posixpath.dirname(css_path)
+
+    def replace(match):
+        quote, ref = match.group(1), match.group(2)
+        if not _is_local(ref):
+            return match.group(0)
+        target, suffix = _split_ref(ref)
+        hashed = manifest.get(posixpath.normpath(posixpath.join(directory, target)))
+        if hashed is None:
+            return match.group(0)
+        return f"url({quote}{posixpath.relpath(hashed, directory or '.')}{suffix}{quote})"
+
+    return CSS_URL.sub(replace, css)
+
+
+class AssetManifest:
+    """Maps template asset names to URLs and finds the file (and variant) to serve"""
+
+    def __init__(self, static_dir=STATIC_DIR, build_dir=BUILD_DIR):
+        self.static_dir = static_dir
+        self.build_dir = build_dir
+        self.files = {}
+        self._hashed = set()
+
+    def load(self, rebuild_if_stale=True):
+        """Read the manifest, building first if it is missing or older than a source file"""
+        manifest_path = os.path.join(self.build_dir, MANIFEST_FILE)
+        try:
+            if rebuild_if_stale and self._stale(manifest_path):
+                self.files = build(self.static_dir, self.build_dir)
+            elif os.path.exists(manifest_path):
+                with open(manifest_path, 'r') as f:
+                    self.files = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading static asset manifest: {e}")
+            self.files = {}
+        self._hashed = set(self.files.values())
+        return self
+
+    def _stale(self, manifest_path):
+        if not os.path.isdir(self.static_dir):
+            return False
+        if not os.path.exists(manifest_path):
+            return True
+        built = os.path.getmtime(manifest_path)
+        return any(os.path.getmtime(os.path.join(self.static_dir, path)) > built
+                   for path in _sources(self.static_dir, self.build_dir))
+
+    def url(self, path, hashed_prefix='/assets/', static_prefix='/static/'):
+        """Hashed URL if built, else the plain static file, else the CDN URL for vendored assets"""
+        if path in self.files:
+            return hashed_prefix + self.files[path]
+        if path in VENDOR_ASSETS and not os.path.exists(os.path.join(self.static_dir, path)):
+            return VENDOR_ASSETS[path]
+        return static_prefix + path
+
+    def locate(self, hashed, accept_encodings=()):
+        """(file name under build_dir, content encoding or None) for a hashed asset, or None if unknown"""
+        if hashed not in self._hashed:
+            return None
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if encoding in accept_encodings and os.path.exists(os.path.join(self.build_dir, hashed + suffix)):
+                return hashed + suffix, encoding
+        return hashed, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vendor, hash and precompress the web interface assets')
+    parser.add_argument('command', choices=['fetch', 'build'], help='fetch vendored libraries, or build static/build/')
+    args = parser.parse_args()
+
+    if args.command == 'fetch':
+        try:
+            fetch()
+        except OSError as e:
+            logger.error(f"Fetching assets failed: {e}")
+            sys.exit(1)
+    build()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    main()
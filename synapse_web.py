@@ -4,68 +4,49 @@ import serial
 import serial.tools.list_ports
 import time
 import os
+import sys
 import json
 import threading
 import logging
-import cv2
-import math
-import numpy as np
-from flask import Response
-import datetime
-
-# Try to import mediapipe, but make it optional
-try:
-    import mediapipe as mp
-    MEDIAPIPE_AVAILABLE = True
-except ImportError:
-    MEDIAPIPE_AVAILABLE = False
+import atexit
+import signal
+import argparse
+import importlib.util
+from flask import Response, send_from_directory, session as flask_session
+import mimetypes
+from medicine_schedule import (parse_medicine_entry, parse_time_of_day, minutes_until,
+                               current_minutes, DOSE_WINDOW_BEFORE, DOSE_WINDOW_AFTER)
+from reminder_scheduler import ReminderScheduler
+from sensor_stream import sensor_stream
+import metrics
+from gps_feed import parse_gps_response, NOT_ACQUIRED
+from gps_track import simplify, SIMPLIFY_TOLERANCE
+from geofence import GeofenceIndex
+from static_assets import AssetManifest, CACHE_MAX_AGE
+import predictors
+import online_learning
+from online_learning import PatientAggregates, ExampleLog
+from device_sessions import DeviceRegistry, DEFAULT_DEVICE_ID, COMMAND_TIMEOUT, BUFFER_DURATION
+
+# OpenCV, MediaPipe, joblib and the models are imported on first use (gesture_control.py,
+# predictors.py), so serving telemetry and alerts doesn't wait for them
+MEDIAPIPE_AVAILABLE = importlib.util.find_spec('mediapipe') is not None
+if not MEDIAPIPE_AVAILABLE:
     print("MediaPipe not available. Gesture detection will be disabled.")
-
-# Try to import joblib for ML models
-try:
-    import joblib
-    JOBLIB_AVAILABLE = True
-    
-    # Try to load the ML models
-    try:
-        hypertension_model = joblib.load('sensor_rf_model.pkl')
-        print("Hypertension model loaded successfully")
-    except Exception as e:
-        print(f"Error loading hypertension model: {e}")
-        hypertension_model = None
-        
-    try:
-        cardiac_model = joblib.load('cardiac_arrest_model.pkl')
-        print("Cardiac arrest model loaded successfully")
-    except Exception as e:
-        print(f"Error loading cardiac arrest model: {e}")
-        cardiac_model = None
-        
-    try:
-        anxiety_model = joblib.load('anxiety_model.pkl')
-        anxiety_imputer = joblib.load('anxiety_imputer.pkl')
-        print("Anxiety model loaded successfully")
-    except Exception as e:
-        print(f"Error loading anxiety model: {e}")
-        anxiety_model = None
-        anxiety_imputer = None
-except ImportError:
-    JOBLIB_AVAILABLE = False
-    hypertension_model = None
-    cardiac_model = None
-    anxiety_model = None
-    anxiety_imputer = None
-    print("Joblib not available. Prediction models will be disabled.")
+gesture_control = None
 
 app = Flask(__name__)
 app.secret_key = "synapse_ar_secret_key"  # Required for flash messages
 
+# Vendored, content-hashed static files (see static_assets.py); loaded by start_background()
+asset_manifest = AssetManifest()
+app.jinja_env.globals['asset_url'] = asset_manifest.url
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Global variables
-ser = None
 connected = False
 available_ports = []
 current_port = None
@@ -84,31 +65,33 @@ heart_rate_data = {
     "last_updated": None
 }
 
-# GPS data
-gps_data = {
-    "latitude": 13.0827,  # Default (Chennai)
-    "longitude": 80.2707, # Default (Chennai)
-    "altitude": 0.0,
-    "satellites": 0,
-    "valid": False,
-    "last_updated": None
-}
+# Longer reply timeout for the GPS command, which waits on the GPS module
+GPS_COMMAND_TIMEOUT = 6.0
 
-# Add new global variables for sensor data
-sensor_data = {
-    "heartRate": 0,
-    "heartRateAvg": 0,
-    "spo2": 0,
-    "spo2Avg": 0,
-    "temperature": 0,
-    "fallDetected": False,
-    "validReadings": False,
-    "last_updated": None
-}
+# Firmware without GPS_DATA pushes is polled with "6" when its fix is older than this
+GPS_POLL_FALLBACK = 5
+gps_polls_pending = set()
+
+# Fixes pushed out of each device's in-memory track are appended here
+GPS_TRACK_DIR = 'gps_tracks'
+
+# Seconds between keepalive comments on idle sensor streams
+SENSOR_STREAM_KEEPALIVE = 15
+
+# Longest a ?wait= long-poll request is held open, in seconds
+LONG_POLL_MAX = 30
+
+# Serving defaults; serve.py runs the same app under gevent
+DEFAULT_HOST = '0.0.0.0'
+DEFAULT_PORT = 8081
+SHUTDOWN_TIMEOUT = 5.0           # Seconds in-flight requests get to finish on shutdown
 
-# Add heart rate buffer for 10-second averaging
-heart_rate_buffer = []
-BUFFER_DURATION = 10  # seconds
+# Hot-path metrics served at /metrics; verbose per-event logs are sampled instead
+PREDICTION_SECONDS = metrics.histogram('synapse_prediction_seconds', 'Model prediction time', ['model'])
+STREAM_SUBSCRIBERS = metrics.gauge('synapse_sensor_stream_subscribers', 'Open sensor stream subscriptions')
+STREAM_SUBSCRIBERS.set_function(lambda: sensor_stream.subscriber_count)
+log_sensor_parse = metrics.SampledLog(logger, every=100)
+log_gps_parse = metrics.SampledLog(logger, every=20)
 
 # Add gesture detection globals
 gesture_enabled = False
@@ -131,60 +114,24 @@ def scan_ports():
 
 def connect_to_device(port_name):
     """Connect to the specified port"""
-    global ser, connected, current_port
-    
-    if connected and ser and ser.is_open:
-        try:
-            ser.close()
-        except Exception as e:
-            logger.warning(f"Error closing previous connection: {e}")
-        finally:
-            connected = False
+    global connected, current_port
     
     try:
         logger.info(f"Attempting to connect to {port_name} at 115200 baud")
-        # Increase timeout to 3 seconds and set parameters explicitly
-        ser = serial.Serial(
-            port=port_name,
-            baudrate=115200,
-            bytesize=serial.EIGHTBITS,
-            parity=serial.PARITY_NONE,
-            stopbits=serial.STOPBITS_ONE,
-            timeout=3,
-            write_timeout=3
-        )
-        
-        # Check if the port is actually open
-        if not ser.is_open:
-            logger.error(f"Port {port_name} failed to open")
-            return False, "Failed to open serial port"
-            
+        # The port is opened on the serial event loop; commands wait out the device reset
+        device_registry.connect(DEFAULT_DEVICE_ID, port_name)
         connected = True
         current_port = port_name
         logger.info(f"Connected to {port_name}")
         
-        # Give time for device reset - increased to 3 seconds
-        time.sleep(3)
-        
-        # Clear input buffer
-        ser.reset_input_buffer()
-        
-        # Send a carriage return to wake up the device
-        ser.write(b"\r\n")
-        time.sleep(0.5)
-        
         # Try multiple commands for initialization
         success = False
+        response = ""
         for attempt in range(3):
             logger.info(f"Initialization attempt {attempt+1}/3")
             
-            # Send an empty line first to ensure proper state
-            ser.write(b"\r\n")
-            time.sleep(0.5)
-            ser.reset_input_buffer()
-            
             # Try different commands to get a response
-            commands = ["6", "ping", "status"]
+            commands = ["ping", "status", "6"]
             cmd = commands[attempt % len(commands)]
             
             # Send command
@@ -200,9 +147,6 @@ def connect_to_device(port_name):
             
             if any(pattern in response for pattern in success_patterns):
                 logger.info(f"Device responded with valid data to '{cmd}' command")
-                # Start monitoring threads
-                monitor_thread = threading.Thread(target=monitor_serial, daemon=True)
-                monitor_thread.start()
                 success = True
                 break
             else:
@@ -210,24 +154,15 @@ def connect_to_device(port_name):
                 # Log the first few characters of the response for debugging
                 if response:
                     logger.info(f"Response preview: {response[:50]}...")
-                time.sleep(1)
-        
-        # Even if we didn't get a recognized response, consider it connected if we got any response at all
-        if not success and ser and ser.is_open:
-            if len(response) > 0:
-                logger.warning("Device responded but with unrecognized format. Assuming connected anyway.")
-                connected = True
-                # Start monitoring thread
-                monitor_thread = threading.Thread(target=monitor_serial, daemon=True)
-                monitor_thread.start()
-                return True, "Connected but device response format is unexpected"
         
         if success:
             return True, "Connected successfully"
+        elif response:
+            logger.warning("Device responded but with unrecognized format. Assuming connected anyway.")
+            return True, "Connected but device response format is unexpected"
         else:
             logger.warning("Connected to port but device not responding properly")
             # Still return True since we did connect to the port
-            connected = True
             return True, "Connected to port but device communication may be unreliable"
         
     except serial.SerialException as e:
@@ -243,141 +178,50 @@ def connect_to_device(port_name):
 
 def disconnect_device():
     """Disconnect from the current device"""
-    global ser, connected, current_port
+    global connected, current_port
     
     # Stop gesture detection if running
     if gesture_enabled:
         stop_gesture_detection()
     
     with connection_lock:
-        if connected and ser and ser.is_open:
-            ser.close()
-            logger.info(f"Disconnected from {current_port}")
+        device_registry.disconnect(DEFAULT_DEVICE_ID)
         
         connected = False
         current_port = None
-        ser = None
 
 def send_command(command):
     """Send a command to the device and get response"""
-    global ser, connected
-    
-    with connection_lock:
-        if not connected or not ser or not ser.is_open:
-            logger.warning("Attempted to send command while not connected")
-            return "Error: Not connected to any device"
-        
-        try:
-            # Special handling for GPS command
-            if command == "6":
-                # GPS commands may require multiple attempts
-                return send_gps_command()
-            
-            # Clear input buffer first
-            ser.reset_input_buffer()
-            
-            # Send command with newline
-            logger.info(f"Sending command: {command}")
-            ser.write((command + "\n").encode('utf-8'))
-            
-            # Wait for response - increased to 1.5 seconds
-            time.sleep(1.5)
-            
-            # Read response
-            response = ""
-            start_time = time.time()
-            timeout = 4.0  # Increased timeout to 4 seconds
-            
-            while time.time() - start_time < timeout:
-                if ser.in_waiting:
-                    byte_data = ser.read(ser.in_waiting)
-                    try:
-                        line = byte_data.decode('utf-8', errors='replace')  # Use 'replace' for better error handling
-                        response += line
-                    except UnicodeDecodeError:
-                        # Handle decode errors by skipping problematic bytes
-                        logger.warning(f"Unicode decode error, skipping some bytes")
-                        response += "[decode error]"
-                else:
-                    # No more data, break out if we have some response or wait a bit
-                    if response and len(response) > 10:
-                        break
-                    time.sleep(0.2)  # Increased delay before checking again
-            
-            if not response:
-                logger.warning(f"No response received for command: {command}")
-                return "No response from device"
-                
-            logger.info(f"Received response of {len(response)} bytes")
-            if len(response) < 100:  # Only log small responses to avoid cluttering logs
-                logger.info(f"Response content: {response}")
-            else:
-                logger.info(f"Response preview: {response[:50]}...")
-            
-            return response
-        except Exception as e:
-            logger.error(f"Error sending command: {e}")
-            return f"Error: {str(e)}"
-
-def send_gps_command():
-    """Special function to handle GPS command with retries and more patience"""
-    global ser
-    
-    # Clear input buffer first
-    ser.reset_input_buffer()
-    
-    # Send GPS command
-    logger.info("Sending GPS command with extended timeout")
-    ser.write(b"6\n")
-    
-    # Give more time for GPS response
-    time.sleep(2.0)
-    
-    # Read response with extended timeout
-    response = ""
-    start_time = time.time()
-    timeout = 6.0  # Longer timeout for GPS
-    
-    while time.time() - start_time < timeout:
-        if ser.in_waiting:
-            byte_data = ser.read(ser.in_waiting)
-            try:
-                line = byte_data.decode('utf-8', errors='replace')
-                response += line
-            except UnicodeDecodeError:
-                logger.warning("Unicode decode error in GPS response")
-                response += "[decode error]"
-        else:
-            # Check if we have useful GPS data already
-            if response and (
-                "GPS signal not acquired yet" in response or 
-                "Satellites:" in response or 
-                "Latitude:" in response or 
-                "Longitude:" in response or
-                "Lat:" in response or
-                "Lng:" in response
-            ):
-                break  # We have useful data, no need to wait more
-            time.sleep(0.3)  # Longer delay for GPS
-    
-    # Even if we didn't get a normal response, check for these special markers
-    if not response:
-        logger.warning("No response received for GPS command")
-        # Return a default fallback response that will be recognized
-        return "GPS signal not acquired yet"
-    elif len(response.strip()) < 5:
-        logger.warning(f"Very short GPS response: '{response}'")
-        # Return a default fallback response that will be recognized
-        return "GPS signal not acquired yet"
-    
-    logger.info(f"GPS response received, length: {len(response)}")
-    if len(response) < 100:
-        logger.info(f"GPS response content: {response}")
-    else:
-        logger.info(f"GPS response preview: {response[:50]}...")
-    
+    session = device_registry.get(DEFAULT_DEVICE_ID)
+    if not connected or not session or not session.connected:
+        logger.warning("Attempted to send command while not connected")
+        return "Error: Not connected to any device"
+    
+    logger.debug(f"Sending command: {command}")
+    # GPS replies wait on the GPS module, so give them longer
+    timeout = GPS_COMMAND_TIMEOUT if command == "6" else COMMAND_TIMEOUT
+    response = session.send_command(command, timeout=timeout)
+    
+    if not response.strip():
+        logger.warning(f"No response received for command: {command}")
+        if command == "6":
+            # A fallback the GPS parser recognises
+            return NOT_ACQUIRED
+        return "No response from device"
+    
+    logger.debug(f"Received response of {len(response)} bytes for: {command}")
     return response
 
+def send_reminder_command(command):
+    """Forward a scheduled reminder to the device OLED when connected"""
+    if not connected:
+        logger.info(f"Device not connected, reminder not shown on device: {command}")
+        return None
+    return send_command(command)
+
+# Dose reminders fire on their own schedule instead of on page loads
+reminder_scheduler = ReminderScheduler(send_command=send_reminder_command)
+
 def fetch_medicine_list():
     """Get the current medicine list from the device"""
     # First check if we're connected
@@ -395,7 +239,6 @@ def fetch_medicine_list():
     # Clear buffer and get fresh data
     try:
         response = send_command("menu")  # First refresh to main menu
-        time.sleep(0.5)
         response = send_command("1")    # Then request medicines
         return parse_medicine_response(response)
     except Exception as e:
@@ -441,6 +284,9 @@ def parse_medicine_response(response):
     # Sort by index to ensure order
     medicines.sort(key=lambda x: x["index"])
     
+    # Keep reminders in step with what the device holds
+    reminder_scheduler.set_entries(medicines=medicines)
+    
     return medicines
 
 def fetch_schedule_list():
@@ -460,7 +306,6 @@ def fetch_schedule_list():
     # Clear buffer and get fresh data
     try:
         response = send_command("menu")  # First refresh to main menu
-        time.sleep(0.5)
         response = send_command("2")     # Then request schedule
         return parse_schedule_response(response)
     except Exception as e:
@@ -510,368 +355,42 @@ def parse_schedule_response(response):
     # Sort by index to ensure order
     schedule.sort(key=lambda x: x["index"])
     
+    # Keep reminders in step with what the device holds
+    reminder_scheduler.set_entries(schedule=schedule)
+    
     return schedule
 
-def fetch_gps_data():
-    """Get current GPS data from device"""
-    global connected, ser, gps_data
-    
-    if not connected or not ser or not ser.is_open:
-        logger.warning("Cannot fetch GPS data - device not connected")
-        return gps_data
-    
+def fetch_gps_data(session=None):
+    """Latest GPS fix for a device (default device if None), served from memory.
+    
+    The firmware pushes GPS_DATA lines, so nothing blocks on the serial port here.
+    Older firmware that never pushes is refreshed with a background "6" command.
+    """
+    session = session or default_session
+    if session.connected and session.gps_pushed_at is None:
+        last_updated = session.gps_data.get("last_updated") or 0
+        if time.time() - last_updated > GPS_POLL_FALLBACK and session.device_id not in gps_polls_pending:
+            request_gps_poll(session)
+    return session.gps_data
+
+def request_gps_poll(session):
+    """Ask a polling-only device for its GPS fix without waiting for the reply"""
+    def on_reply(response):
+        log_gps_parse("Raw GPS response: %r", response)
+        gps = parse_gps_response(response if response.strip() else NOT_ACQUIRED, previous=session.gps_data)
+        session.set_gps_data(gps)
+        if gps["valid"]:
+            reading = session.apply_fix(gps["latitude"], gps["longitude"], gps["altitude"])
+            if reading is not None and session.publish:
+                session.publish(reading)
+    
+    gps_polls_pending.add(session.device_id)
     try:
-        # Clear any pending data
-        ser.reset_input_buffer()
-        
-        # Request GPS data
-        logger.info("Requesting GPS data...")
-        response = send_command("6")  # Now uses special GPS handler
-        logger.info(f"Raw GPS response: {response}")
-        
-        # Parse and return GPS data
-        updated_data = parse_gps_response(response)
-        
-        # Keep existing valid coordinates if new data is invalid but we had good data before
-        if not updated_data["valid"] and gps_data["valid"]:
-            updated_data["latitude"] = gps_data["latitude"]
-            updated_data["longitude"] = gps_data["longitude"]
-            updated_data["altitude"] = gps_data["altitude"]
-            logger.info("Keeping previous valid coordinates")
-            
-            # Mark as valid if we have non-zero coordinates
-            if updated_data["latitude"] != 0 and updated_data["longitude"] != 0:
-                updated_data["valid"] = True
-        
-        # Update global variable
-        gps_data = updated_data
-        return updated_data
-        
+        future = session.send_command_nowait("6", callback=on_reply, timeout=GPS_COMMAND_TIMEOUT)
+        future.add_done_callback(lambda f: gps_polls_pending.discard(session.device_id))
     except Exception as e:
-        logger.error(f"Error fetching GPS data: {e}")
-        return gps_data
-
-def parse_gps_response(response):
-    """Parse GPS data from device response"""
-    global gps_data
-    
-    # Initialize with existing data
-    updated_data = gps_data.copy()
-    
-    try:
-        # Check if GPS signal is not acquired yet
-        if "GPS signal not acquired yet" in response:
-            logger.info("Device reports GPS signal not acquired yet")
-            updated_data["valid"] = False
-            updated_data["last_updated"] = time.time()
-            
-            # For better user experience, provide default coordinates
-            if updated_data["latitude"] == 0 and updated_data["longitude"] == 0:
-                updated_data["latitude"] = 13.0827  # Chennai default
-                updated_data["longitude"] = 80.2707
-                logger.info("Using default coordinates for Chennai")
-            
-            return updated_data
-        
-        # Check for satellites-only response (partial data)
-        if "Satellites:" in response and len(response) < 50:
-            logger.info("Received satellites-only data")
-            try:
-                # Try to extract the satellite count
-                sat_parts = response.split("Satellites:")
-                if len(sat_parts) > 1:
-                    sat_str = sat_parts[1].strip()
-                    # Extract just the first digit if there's extra text
-                    import re
-                    sat_match = re.search(r'\d+', sat_str)
-                    if sat_match:
-                        satellites = int(sat_match.group())
-                        updated_data["satellites"] = satellites
-                        logger.info(f"Updated satellites count to {satellites}")
-                        
-                # Update timestamp but don't mark as valid without coordinates
-                updated_data["last_updated"] = time.time()
-                
-                # For better user experience, provide default coordinates if needed
-                if updated_data["latitude"] == 0 and updated_data["longitude"] == 0:
-                    updated_data["latitude"] = 13.0827  # Chennai default
-                    updated_data["longitude"] = 80.2707
-                    logger.info("Using default coordinates for Chennai")
-                
-                return updated_data
-            except Exception as e:
-                logger.error(f"Error parsing satellites data: {e}")
-        
-        # Look for the specific format we're getting from ESP32
-        if "GPS Location Updated!" in response:
-            lines = response.split('\n')
-            for line in lines:
-                if "Lat:" in line:
-                    lat_str = line.split("Lat:")[1].strip()
-                    updated_data["latitude"] = float(lat_str)
-                elif "Lng:" in line:
-                    lng_str = line.split("Lng:")[1].strip()
-                    updated_data["longitude"] = float(lng_str)
-                elif "Satellites:" in line and not "$" in line:  # Avoid NMEA sentences
-                    sat_str = line.split("Satellites:")[1].strip()
-                    updated_data["satellites"] = int(sat_str)
-                    
-                # Look for altitude in GPGGA sentence
-                elif "$GPGGA" in line:
-                    parts = line.split(',')
-                    if len(parts) >= 10:
-                        try:
-                            alt = float(parts[9])
-                            updated_data["altitude"] = alt
-                        except ValueError:
-                            pass
-            
-            # If we have valid coordinates, mark as valid
-            if updated_data["latitude"] != 0 and updated_data["longitude"] != 0:
-                updated_data["valid"] = True
-                updated_data["last_updated"] = time.time()
-                logger.info(f"Successfully parsed GPS data: {updated_data}")
-            else:
-                logger.warning("Got GPS data but coordinates are 0,0")
-        else:
-            # Check for newer format where GPS data comes after "Latitude:" and "Longitude:"
-            lines = response.split('\n')
-            found_coords = False
-            
-            for line in lines:
-                if "Latitude:" in line:
-                    try:
-                        lat_str = line.split("Latitude:")[1].strip()
-                        updated_data["latitude"] = float(lat_str)
-                        found_coords = True
-                    except (ValueError, IndexError):
-                        logger.warning(f"Failed to parse latitude from: {line}")
-                        
-                elif "Longitude:" in line:
-                    try:
-                        lng_str = line.split("Longitude:")[1].strip()
-                        updated_data["longitude"] = float(lng_str)
-                        found_coords = True
-                    except (ValueError, IndexError):
-                        logger.warning(f"Failed to parse longitude from: {line}")
-                        
-                elif "Altitude:" in line:
-                    try:
-                        # Extract just the number from "X.X meters"
-                        alt_str = line.split("Altitude:")[1].strip().split(" ")[0]
-                        updated_data["altitude"] = float(alt_str)
-                    except (ValueError, IndexError):
-                        logger.warning(f"Failed to parse altitude from: {line}")
-                        
-                elif "Satellites:" in line:
-                    try:
-                        sat_str = line.split("Satellites:")[1].strip()
-                        updated_data["satellites"] = int(sat_str)
-                    except (ValueError, IndexError):
-                        logger.warning(f"Failed to parse satellites from: {line}")
-            
-            if found_coords and updated_data["latitude"] != 0 and updated_data["longitude"] != 0:
-                updated_data["valid"] = True
-                updated_data["last_updated"] = time.time()
-                logger.info(f"Successfully parsed GPS data (new format): {updated_data}")
-            elif not "GPS signal not acquired yet" in response:
-                logger.warning("GPS response didn't contain recognizable coordinate format")
-    except Exception as e:
-        logger.error(f"Error parsing GPS data: {e}")
-        # Keep existing data on parsing error
-    
-    # Update global GPS data
-    gps_data = updated_data    
-    return updated_data
-
-def monitor_heart_rate():
-    """Background thread to monitor heart rate data from device"""
-    global ser, connected, heart_rate_data
-    
-    logger.info("Starting heart rate monitoring thread")
-    
-    while connected and ser and ser.is_open:
-        try:
-            # Check for heart rate data in serial buffer
-            if ser.in_waiting > 0:
-                try:
-                    line = ser.readline().decode('utf-8', errors='replace').strip()
-                    
-                    # Check for sensor data
-                    if line.startswith("SENSOR_DATA:"):
-                        try:
-                            # Parse SENSOR_DATA:heartRate,heartRateAvg,spo2,spo2Avg,temp,fall,valid format
-                            parts = line[12:].split(',')
-                            if len(parts) >= 7:
-                                sensor_data.update({
-                                    "heartRate": float(parts[0]),
-                                    "heartRateAvg": int(parts[1]),
-                                    "spo2": int(parts[2]),
-                                    "spo2Avg": int(parts[3]),
-                                    "temperature": float(parts[4]),
-                                    "fallDetected": parts[5] == "1",
-                                    "validReadings": parts[6] == "1",
-                                    "last_updated": time.time()
-                                })
-                                logger.debug(f"Updated sensor data: {sensor_data}")
-                                
-                                # Update heart rate data for compatibility
-                                heart_rate_data.update({
-                                    "bpm": sensor_data["heartRate"],
-                                    "quality": 100 if sensor_data["validReadings"] else 0,
-                                    "valid": sensor_data["validReadings"],
-                                    "last_updated": time.time()
-                                })
-                        except (ValueError, IndexError) as e:
-                            logger.warning(f"Error parsing sensor data: {e}, raw data: {line}")
-                    
-                    # Handle other existing data formats...
-                    elif line.startswith("HR_DATA:"):
-                        # Keep existing HR_DATA handling for backward compatibility
-                        try:
-                            parts = line[8:].split(',')
-                            if len(parts) >= 2 and parts[0].strip() and parts[0].strip().replace('.', '', 1).isdigit():
-                                bpm = float(parts[0])
-                                quality = int(parts[1]) if parts[1].strip().isdigit() else 0
-                                
-                                heart_rate_data.update({
-                                    "bpm": bpm,
-                                    "quality": quality,
-                                    "valid": True,
-                                    "last_updated": time.time()
-                                })
-                        except (ValueError, IndexError) as e:
-                            logger.warning(f"Error parsing heart rate data: {e}, raw data: {line}")
-                except Exception as e:
-                    logger.warning(f"Error reading line: {e}")
-            
-            # Sleep briefly to avoid high CPU usage
-            time.sleep(0.1)
-            
-        except Exception as e:
-            logger.error(f"Error in heart rate monitoring thread: {e}")
-            time.sleep(1)  # Wait before retrying
-    
-    logger.info("Heart rate monitoring thread stopped")
-
-def monitor_gps():
-    """Background thread to monitor GPS data from device"""
-    global ser, connected, gps_data
-    
-    logger.info("Starting GPS monitoring thread")
-    
-    while connected and ser and ser.is_open:
-        try:
-            # Request GPS data every 5 seconds
-            logger.info("Requesting GPS data...")
-            response = send_command("6")  # GPS data command
-            logger.info(f"Raw GPS response: {response}")
-            
-            # Parse GPS data from response
-            if "GPS signal not acquired yet" in response:
-                logger.info("GPS signal not acquired yet")
-                gps_data["valid"] = False
-                gps_data["last_updated"] = time.time()
-            elif "Satellites:" in response and len(response) < 50:
-                # Handle satellites-only response
-                logger.info("Received satellites-only data")
-                try:
-                    # Extract satellites count
-                    sat_parts = response.split("Satellites:")
-                    if len(sat_parts) > 1:
-                        sat_str = sat_parts[1].strip()
-                        # Use regex to extract just the number
-                        import re
-                        sat_match = re.search(r'\d+', sat_str)
-                        if sat_match:
-                            gps_data["satellites"] = int(sat_match.group())
-                            logger.info(f"Updated satellites count to {gps_data['satellites']}")
-                    
-                    # Update timestamp
-                    gps_data["last_updated"] = time.time()
-                    
-                    # If we don't have coordinates yet, use defaults for better UX
-                    if gps_data["latitude"] == 0 and gps_data["longitude"] == 0:
-                        gps_data["latitude"] = 13.0827  # Chennai default
-                        gps_data["longitude"] = 80.2707
-                        logger.info("Using default coordinates for Chennai")
-                except Exception as e:
-                    logger.error(f"Error parsing satellites data: {e}")
-            elif "Latitude:" in response and "Longitude:" in response:
-                try:
-                    # Extract GPS coordinates
-                    lines = response.strip().split('\n')
-                    for line in lines:
-                        logger.debug(f"Processing GPS line: {line}")
-                        if "Latitude:" in line:
-                            lat_str = line.split("Latitude:")[1].strip()
-                            gps_data["latitude"] = float(lat_str)
-                            logger.info(f"Parsed latitude: {lat_str}")
-                        elif "Longitude:" in line:
-                            lng_str = line.split("Longitude:")[1].strip()
-                            gps_data["longitude"] = float(lng_str)
-                            logger.info(f"Parsed longitude: {lng_str}")
-                        elif "Altitude:" in line:
-                            # Extract just the number from "X.X meters"
-                            alt_str = line.split("Altitude:")[1].strip().split(" ")[0]
-                            gps_data["altitude"] = float(alt_str)
-                            logger.info(f"Parsed altitude: {alt_str}")
-                        elif "Satellites:" in line:
-                            sat_str = line.split("Satellites:")[1].strip()
-                            gps_data["satellites"] = int(sat_str)
-                            logger.info(f"Parsed satellites: {sat_str}")
-                    
-                    # If we have valid coordinates, mark as valid
-                    if gps_data["latitude"] != 0 and gps_data["longitude"] != 0:
-                        gps_data["valid"] = True
-                        gps_data["last_updated"] = time.time()
-                        logger.info(f"Updated GPS data: {gps_data}")
-                    else:
-                        logger.warning("Got GPS data but coordinates are 0,0")
-                except Exception as e:
-                    logger.error(f"Error parsing GPS data: {e}")
-                    logger.error(f"Problematic response: {response}")
-            elif "Lat:" in response and "Lng:" in response:
-                # Handle the alternative format
-                try:
-                    # Extract GPS coordinates
-                    lines = response.strip().split('\n')
-                    for line in lines:
-                        logger.debug(f"Processing GPS line: {line}")
-                        if "Lat:" in line:
-                            lat_str = line.split("Lat:")[1].strip()
-                            gps_data["latitude"] = float(lat_str)
-                            logger.info(f"Parsed latitude: {lat_str}")
-                        elif "Lng:" in line:
-                            lng_str = line.split("Lng:")[1].strip()
-                            gps_data["longitude"] = float(lng_str)
-                            logger.info(f"Parsed longitude: {lng_str}")
-                        elif "Satellites:" in line and not "$" in line:
-                            sat_str = line.split("Satellites:")[1].strip()
-                            gps_data["satellites"] = int(sat_str)
-                            logger.info(f"Parsed satellites: {sat_str}")
-                    
-                    # If we have valid coordinates, mark as valid
-                    if gps_data["latitude"] != 0 and gps_data["longitude"] != 0:
-                        gps_data["valid"] = True
-                        gps_data["last_updated"] = time.time()
-                        logger.info(f"Updated GPS data: {gps_data}")
-                    else:
-                        logger.warning("Got GPS data but coordinates are 0,0")
-                except Exception as e:
-                    logger.error(f"Error parsing GPS data: {e}")
-                    logger.error(f"Problematic response: {response}")
-            else:
-                logger.warning(f"Unrecognized GPS response format. Response length: {len(response)}")
-            
-            # Sleep for 5 seconds before next update
-            time.sleep(5)
-            
-        except Exception as e:
-            logger.error(f"Error in GPS monitoring thread: {e}")
-            time.sleep(1)  # Wait before retrying
-    
-    logger.info("GPS monitoring thread stopped")
+        gps_polls_pending.discard(session.device_id)
+        logger.error(f"Error requesting GPS data: {e}")
 
 def fetch_heart_rate():
     """Get the current heart rate data from the device"""
@@ -987,7 +506,6 @@ def parse_sensor_data(response):
                 # Check for YES, YES!, Y, 1, TRUE as positive indicators
                 is_fall_detected = any(keyword in fall_text for keyword in ["YES", "Y", "1", "TRUE"])
                 data["fallDetected"] = is_fall_detected
-                logger.info(f"Fall detection parsed from '{fall_text}' -> {is_fall_detected}")
             
             # Parse readings validity
             elif "Readings Valid:" in line:
@@ -997,7 +515,7 @@ def parse_sensor_data(response):
         if data["spo2"] > 0 or data["heartRate"] > 0:
             data["validReadings"] = True
         
-        logger.debug(f"Parsed sensor data: {data}")
+        log_sensor_parse("Parsed sensor data: %s", data)
         return data
         
     except Exception as e:
@@ -1005,114 +523,54 @@ def parse_sensor_data(response):
         logger.error(f"Raw response: {response}")
         return None
 
-def monitor_serial():
-    """Background thread to monitor serial data from device"""
-    global ser, connected, sensor_data, heart_rate_buffer
-    
-    logger.info("Starting serial monitoring thread")
-    reading_lines = []
-    last_cleanup = time.time()
-    last_fall_detection_time = 0
-    fall_detection_timeout = 30  # Seconds to maintain fall detection state
-    
-    while connected and ser and ser.is_open:
-        try:
-            # Check for data in serial buffer
-            if ser.in_waiting > 0:
-                try:
-                    line = ser.readline().decode('utf-8', errors='replace').strip()
-                    
-                    # Handle both data formats
-                    if "SENSOR_DATA:" in line:
-                        # Direct sensor data format
-                        try:
-                            parts = line.split("SENSOR_DATA:")[1].strip().split(',')
-                            if len(parts) >= 7:
-                                current_time = time.time()
-                                
-                                # Add heart rate to buffer with timestamp
-                                heart_rate_buffer.append({
-                                    "value": float(parts[0]),
-                                    "timestamp": current_time
-                                })
-                                
-                                # Clean up old readings (older than BUFFER_DURATION seconds)
-                                heart_rate_buffer = [
-                                    hr for hr in heart_rate_buffer 
-                                    if (current_time - hr["timestamp"]) <= BUFFER_DURATION
-                                ]
-                                
-                                # Calculate 10-second average
-                                if heart_rate_buffer:
-                                    avg_heart_rate = sum(hr["value"] for hr in heart_rate_buffer) / len(heart_rate_buffer)
-                                else:
-                                    avg_heart_rate = 0
-                                
-                                # Prepare update data
-                                update_data = {
-                                    "heartRate": float(parts[0]),
-                                    "heartRateAvg": int(avg_heart_rate),  # Use calculated 10-second average
-                                    "spo2": int(parts[2]),
-                                    "spo2Avg": int(parts[3]),
-                                    "temperature": float(parts[4]),
-                                    "validReadings": parts[6] == "1",
-                                    "last_updated": current_time
-                                }
-                                
-                                # Only update fall detection if no fall was recently detected in text format
-                                # or if the binary format is indicating a fall (parts[5] == "1")
-                                fall_in_binary = parts[5] == "1"
-                                if fall_in_binary or (current_time - last_fall_detection_time > fall_detection_timeout):
-                                    update_data["fallDetected"] = fall_in_binary
-                                    # If binary format detected a fall, update the timestamp
-                                    if fall_in_binary:
-                                        last_fall_detection_time = current_time
-                                        logger.info(f"Fall detected in binary format")
-                                        
-                                # Update sensor data with our prepared data
-                                sensor_data.update(update_data)
-                                logger.debug(f"Updated sensor data (direct format): {sensor_data}")
-                        except Exception as e:
-                            logger.error(f"Error parsing direct sensor data: {e}")
-                            
-                    elif line.startswith("--- Received Sensor Data ---"):
-                        # Start of a new accumulated reading
-                        reading_lines = []
-                    elif line.startswith("-------------------------"):
-                        # End of reading, parse accumulated lines
-                        if reading_lines:
-                            response = "\n".join(reading_lines)
-                            logger.info(f"Received response of {len(response)} bytes")
-                            logger.info(f"Response content: {response}")
-                            
-                            # Parse the sensor data
-                            parsed_data = parse_sensor_data(response)
-                            if parsed_data:
-                                # If a fall was detected in the text format, remember the time
-                                if parsed_data.get("fallDetected", False):
-                                    last_fall_detection_time = time.time()
-                                    logger.info("Fall detected in text format")
-                                
-                                sensor_data.update(parsed_data)
-                                sensor_data["last_updated"] = time.time()
-                                logger.debug(f"Updated sensor data (accumulated format): {sensor_data}")
-                    else:
-                        # Add line to current reading
-                        reading_lines.append(line)
-                        
-                except UnicodeDecodeError as e:
-                    logger.error(f"Error decoding serial data: {e}")
-                except Exception as e:
-                    logger.error(f"Error processing serial data: {e}")
-            
-            # Small delay to prevent CPU overload
-            time.sleep(0.1)
-            
-        except Exception as e:
-            logger.error(f"Error in serial monitoring thread: {e}")
-            time.sleep(1)  # Wait before retrying
-    
-    logger.info("Serial monitoring thread stopped")
+# Every wearable gets a session keyed by device ID, all read by one thread.
+# The single-device pages and routes use the DEFAULT_DEVICE_ID session.
+device_registry = DeviceRegistry(publish=sensor_stream.publish, text_parser=parse_sensor_data,
+                                 geofences=GeofenceIndex.load(), track_dir=GPS_TRACK_DIR)
+default_session = device_registry.add(DEFAULT_DEVICE_ID)
+# default_session.sensor_data is replaced by every reading: read it once per request
+heart_rate_buffer = default_session.heart_rate_buffer
+
+def on_default_session_state(session):
+    """Keep the single-device globals in step when the supervisor reconnects or loses the device"""
+    global connected, current_port
+    connected = session.connected
+    current_port = session.port if session.wanted else None
+
+default_session.on_state_change = on_default_session_state
+
+# Per-patient telemetry aggregates and recorded outcomes for online learning (see online_learning.py)
+patient_aggregates = PatientAggregates()
+example_log = ExampleLog()
+
+def sensor_version(session):
+    """ETag of a device's sensor_data: its reading sequence number"""
+    return str(session.sensor_data["sequence"])
+
+def vitals_version(session):
+    """ETag of the vitals APIs, which also change when the device connects or drops"""
+    return sensor_version(session) + ("" if session.connected else "-offline")
+
+def gps_version(session):
+    return str(session.gps_sequence)
+
+def versioned_response(session, version, build):
+    """Conditional GET and long-poll handling for the polling APIs.
+    
+    version(session) names the data build() returns and is sent as the ETag.
+    A client that already has it (If-None-Match, or ?since=) gets 304 Not
+    Modified; with ?wait=<seconds> the request first blocks until the data
+    changes, so pages see each reading as it arrives without a polling delay.
+    """
+    known = request.args.get('since') or next(iter(request.if_none_match), None)
+    wait = request.args.get('wait', type=float)
+    if wait and known is not None and known == version(session):
+        session.wait_for_change(lambda: version(session) != known, min(wait, LONG_POLL_MAX))
+    current = version(session)
+    response = Response(status=304) if current == known else build()
+    response.set_etag(current)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/')
 def index():
@@ -1127,92 +585,18 @@ def index():
                           current_port=current_port,
                           available_ports=available_ports)
 
-def initialize_device():
-    """Initialize the device and verify communication"""
-    global ser, connected
-    
-    if not ser or not ser.is_open:
-        logger.error("Serial port not open")
-        return False
-        
-    try:
-        # Clear any pending data
-        ser.reset_input_buffer()
-        ser.reset_output_buffer()
-        
-        # Wait for device to stabilize
-        time.sleep(2)
-        
-        # Try to get a response from the device
-        for attempt in range(3):
-            logger.info(f"Initialization attempt {attempt + 1}/3")
-            
-            # Send a command and wait for response
-            ser.write(b'6\n')  # Request GPS data
-            time.sleep(1)
-            
-            if ser.in_waiting > 0:
-                response = ser.read(ser.in_waiting).decode('utf-8', errors='replace')
-                # Check for several valid response patterns
-                if "GPS signal not acquired yet" in response or "GPS Location Updated" in response or "CMD_RECEIVED" in response:
-                    logger.info("Device responding correctly with valid GPS command response")
-                    return True
-                else:
-                    logger.warning(f"Unexpected response format: {response[:100]}...")
-            else:
-                logger.warning("No response from device")
-            
-            time.sleep(1)
-        
-        # Even if we didn't get the exact response we expected, still mark as connected
-        # if we got any response that seems like our device
-        logger.warning("Connected to port but device not responding with expected pattern")
-        return True
-        
-    except Exception as e:
-        logger.error(f"Error during device initialization: {e}")
-        return False
-
 @app.route('/connect', methods=['POST'])
 def connect():
     """Connect to the selected serial port"""
-    global ser, connected, current_port
-    
     port = request.form.get('port')
     if not port:
         flash("No port selected", "error")
         return redirect(url_for('index'))
     
-    try:
-        # Close existing connection if any
-        if ser and ser.is_open:
-            ser.close()
-            connected = False
-        
-        # Open new connection
-        ser = serial.Serial(port, 115200, timeout=1)
-        logger.info(f"Attempting to connect to {port} at 115200 baud")
-        
-        # Initialize device
-        if initialize_device():
-            connected = True
-            current_port = port
-            
-            # Start monitoring thread
-            monitor_thread = threading.Thread(target=monitor_serial, daemon=True)
-            monitor_thread.start()
-            
-            flash(f"Connected to {port}", "success")
-        else:
-            ser.close()
-            connected = False
-            flash("Device not responding properly", "error")
-            
-    except Exception as e:
-        logger.error(f"Error connecting to {port}: {e}")
-        flash(f"Error connecting to {port}: {str(e)}", "error")
-        connected = False
-        
+    # Opening the port happens in the background; the supervisor retries until the device is there
+    device_registry.request_connect(DEFAULT_DEVICE_ID, port)
+    flash(f"Connecting to {port}...", "info")
+    
     return redirect(url_for('index'))
 
 @app.route('/disconnect', methods=['POST'])
@@ -1229,32 +613,19 @@ def scan():
     available_ports = scan_ports()
     return redirect(url_for('index'))
 
-def check_medicine_time(medicine_str):
+def check_medicine_time(medicine_str, now=None):
     """Parse medicine string to check if it's time to take it"""
     try:
-        parts = medicine_str.split()
-        # Find the time part (assuming the last two parts are the time and AM/PM)
-        if len(parts) >= 2:
-            time_parts = parts[-2:]
-            hour = int(time_parts[0])
-            am_pm = time_parts[1].upper()
-            
-            # Get current hour
-            current_hour = datetime.datetime.now().hour
-            
-            # Convert medicine time to 24-hour format
-            medicine_hour = hour
-            if am_pm == 'PM' and hour < 12:
-                medicine_hour += 12
-            elif am_pm == 'AM' and hour == 12:
-                medicine_hour = 0
-                
+        # Parsing is cached per string, so repeated page loads don't re-split
+        name, time_text = parse_medicine_entry(medicine_str)
+        dose_minutes = parse_time_of_day(time_text) if time_text else None
+        if dose_minutes is not None:
             # Check if it's time to take (within 2 hours before or 3 hours after)
-            time_diff = current_hour - medicine_hour
-            if -2 <= time_diff <= 3:
-                return True, f"Take now ({hour} {am_pm})"
+            elapsed = -minutes_until(current_minutes(now), dose_minutes)
+            if -DOSE_WINDOW_BEFORE <= elapsed <= DOSE_WINDOW_AFTER:
+                return True, f"Take now ({time_text})"
             else:
-                return False, f"Next dose: {hour} {am_pm}"
+                return False, f"Next dose: {time_text}"
     except Exception as e:
         logging.error(f"Error parsing medicine time: {e}")
     
@@ -1295,7 +666,6 @@ def update_medicine():
     try:
         # Try a menu command first to ensure we're in the right state
         send_command("menu")
-        time.sleep(0.5)
         
         # Now send the medicine update command
         command = f"med {index} {name}"
@@ -1312,7 +682,6 @@ def update_medicine():
             flash(f"Update may not have succeeded. Please check the device.", "warning")
         
         # Refresh the medicines list
-        time.sleep(0.5)
         send_command("1")
     except Exception as e:
         logger.error(f"Error during medicine update: {e}")
@@ -1347,7 +716,6 @@ def update_schedule():
     try:
         # Try a menu command first to ensure we're in the right state
         send_command("menu")
-        time.sleep(0.5)
         
         # Now send the schedule update command
         command = f"sch {index} {details}"
@@ -1364,7 +732,6 @@ def update_schedule():
             flash(f"Update may not have succeeded. Please check the device.", "warning")
         
         # Refresh the schedule list
-        time.sleep(0.5)
         send_command("2")
     except Exception as e:
         logger.error(f"Error during schedule update: {e}")
@@ -1398,7 +765,6 @@ def update_emergency():
     try:
         # Try a menu command first to ensure we're in the right state
         send_command("menu")
-        time.sleep(0.5)
         
         # Now send the emergency contact update command
         command = f"emergency {name} {number}"
@@ -1450,7 +816,8 @@ def api_status():
     return jsonify({
         "connected": connected,
         "port": current_port,
-        "available_ports": available_ports
+        "available_ports": available_ports,
+        "device": default_session.status()
     })
 
 @app.route('/api/medicines')
@@ -1471,28 +838,35 @@ def api_schedule():
     schedule = fetch_schedule_list()
     return jsonify(schedule)
 
+@app.route('/api/reminders')
+def api_reminders():
+    """API endpoint for upcoming reminders and today's dose status"""
+    return jsonify(reminder_scheduler.snapshot())
+
+@app.route('/api/reminders/taken', methods=['POST'])
+def api_reminder_taken():
+    """Mark a medicine reminder's current dose (the one whose window contains now) as taken"""
+    data = request.get_json(silent=True) or request.form
+    reminder_id = data.get('id')
+    if not reminder_id:
+        return jsonify({"success": False, "error": "Reminder id is required"}), 400
+    
+    day = reminder_scheduler.mark_taken(reminder_id)
+    if day is None:
+        return jsonify({"success": False, "error": "Unknown reminder"}), 404
+    return jsonify({"success": True, "day": day})
+
 @app.route('/gps')
 def gps_page():
     """Render the GPS location page"""
-    global connected
-    # Fetch latest GPS data
-    if connected:
-        fetch_gps_data()
     return render_template('gps.html', connected=connected, current_port=current_port)
 
 @app.route('/api/gps')
 def api_gps():
-    """Return GPS data as JSON"""
+    """Return the cached GPS fix as JSON (ETag and ?wait=, see versioned_response)"""
     try:
-        if connected:
-            # Get fresh GPS data
-            gps_info = fetch_gps_data()
-            logger.info(f"Sending GPS data to frontend: {gps_info}")
-            return jsonify(gps_info)
-        else:
-            # Return cached data
-            logger.info(f"Device not connected, sending cached GPS data: {gps_data}")
-            return jsonify(gps_data)
+        fetch_gps_data(default_session)
+        return versioned_response(default_session, gps_version, lambda: jsonify(default_session.gps_data))
     except Exception as e:
         logger.error(f"Error in GPS API endpoint: {e}")
         return jsonify({
@@ -1505,6 +879,33 @@ def api_gps():
             "last_updated": None
         })
 
+@app.route('/api/gps/track')
+def api_gps_track():
+    """Recent GPS track, simplified for the map, plus the geofences to draw.
+    
+    Query parameters: device (default device if omitted), since (unix time;
+    older fixes are read back from the spill file) and tolerance (metres).
+    """
+    session, error = get_device_or_404(request.args.get('device', DEFAULT_DEVICE_ID))
+    if error:
+        return error
+    since = request.args.get('since', type=float)
+    tolerance = request.args.get('tolerance', SIMPLIFY_TOLERANCE, type=float)
+    try:
+        points = session.track.history(since) if since is not None else session.track.points()
+        simplified = simplify(points, tolerance)
+        return jsonify({
+            "device_id": session.device_id,
+            "points": [[lat, lng, t] for t, lat, lng, _ in simplified],
+            "count": len(points),
+            "wandering": session.sensor_data.get("wandering", False),
+            "inside": session.sensor_data.get("geofences", []),
+            "geofences": device_registry.geofences.describe(session.device_id)
+        })
+    except Exception as e:
+        logger.error(f"Error in GPS track endpoint: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
 @app.route('/spo2')
 def spo2_page():
     """Render the SPO2 monitoring page"""
@@ -1515,7 +916,7 @@ def spo2_page():
         flash("Not connected to a device. SPO2 monitoring not available.", "warning")
         
     # Get current sensor data
-    current_data = sensor_data
+    current_data = default_session.sensor_data
     
     # Include time module for template
     return render_template('spo2.html', 
@@ -1526,53 +927,69 @@ def spo2_page():
 
 @app.route('/api/spo2')
 def api_spo2():
-    """Return SPO2 data as JSON"""
-    try:
-        if connected:
-            # Get fresh SPO2 data from sensor_data
-            return jsonify({
-                "spo2": sensor_data["spo2"],
-                "spo2Avg": sensor_data["spo2Avg"],
-                "valid": sensor_data["validReadings"],
-                "last_updated": sensor_data["last_updated"]
-            })
-        else:
-            # Return default data when not connected
+    """Return SPO2 data as JSON (ETag and ?wait=, see versioned_response)"""
+    def build():
+        try:
+            if connected:
+                # One snapshot, so every field comes from the same reading
+                sensor_data = default_session.sensor_data
+                return jsonify({
+                    "spo2": sensor_data["spo2"],
+                    "spo2Avg": sensor_data["spo2Avg"],
+                    "valid": sensor_data["validReadings"],
+                    "last_updated": sensor_data["last_updated"]
+                })
+            else:
+                # Return default data when not connected
+                return jsonify({
+                    "spo2": 0,
+                    "spo2Avg": 0,
+                    "valid": False,
+                    "last_updated": None
+                })
+        except Exception as e:
+            logger.error(f"Error in SPO2 API endpoint: {e}")
             return jsonify({
+                "error": str(e),
                 "spo2": 0,
                 "spo2Avg": 0,
                 "valid": False,
                 "last_updated": None
             })
-    except Exception as e:
-        logger.error(f"Error in SPO2 API endpoint: {e}")
-        return jsonify({
-            "error": str(e),
-            "spo2": 0,
-            "spo2Avg": 0,
-            "valid": False,
-            "last_updated": None
-        })
+    
+    return versioned_response(default_session, vitals_version, build)
 
 @app.route('/api/heart_rate')
 def api_heart_rate():
-    """Return heart rate data as JSON"""
-    global sensor_data, heart_rate_buffer
-    try:
-        if connected and sensor_data:
-            # Calculate number of readings in the buffer
-            readings_count = len(heart_rate_buffer)
+    """Return heart rate data as JSON (ETag and ?wait=, see versioned_response)"""
+    def build():
+        try:
+            sensor_data = default_session.sensor_data
+            if connected and sensor_data:
+                # Calculate number of readings in the buffer
+                readings_count = len(heart_rate_buffer)
             
+                return jsonify({
+                    "bpm": sensor_data["heartRateAvg"],  # 10-second average
+                    "valid": sensor_data["validReadings"],
+                    "quality": int(sensor_data.get("heartRateQuality", 0) * 100),
+                    "last_updated": sensor_data["last_updated"],
+                    "readings_count": readings_count,
+                    "averaging_period": BUFFER_DURATION
+                })
+            else:
+                return jsonify({
+                    "bpm": 0,
+                    "valid": False,
+                    "quality": 0,
+                    "last_updated": None,
+                    "readings_count": 0,
+                    "averaging_period": BUFFER_DURATION
+                })
+        except Exception as e:
+            logger.error(f"Error in heart rate API endpoint: {e}")
             return jsonify({
-                "bpm": sensor_data["heartRateAvg"],  # 10-second average
-                "valid": sensor_data["validReadings"],
-                "quality": 100 if sensor_data["validReadings"] else 0,
-                "last_updated": sensor_data["last_updated"],
-                "readings_count": readings_count,
-                "averaging_period": BUFFER_DURATION
-            })
-        else:
-            return jsonify({
+                "error": str(e),
                 "bpm": 0,
                 "valid": False,
                 "quality": 0,
@@ -1580,17 +997,8 @@ def api_heart_rate():
                 "readings_count": 0,
                 "averaging_period": BUFFER_DURATION
             })
-    except Exception as e:
-        logger.error(f"Error in heart rate API endpoint: {e}")
-        return jsonify({
-            "error": str(e),
-            "bpm": 0,
-            "valid": False,
-            "quality": 0,
-            "last_updated": None,
-            "readings_count": 0,
-            "averaging_period": BUFFER_DURATION
-        })
+    
+    return versioned_response(default_session, vitals_version, build)
 
 @app.route('/heart_rate')
 def heart_rate_page():
@@ -1619,15 +1027,98 @@ def health_redirect():
     flash("The Health page has been moved to Heart Rate page", "info")
     return redirect(url_for('heart_rate_page'))
 
+# Background work (serial devices, reminders) runs once per process, however
+# many times the app is created or the module is imported
+_background_lock = threading.Lock()
+_background_started = False
+_cleaned_up = False
+
+def start_background():
+    """Create templates, open the configured devices and start reminders; returns False if already started"""
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return False
+        _background_started = True
+    
+    create_templates()
+    asset_manifest.load()
+    
+    # Open any wearables listed in devices.json
+    device_registry.load()
+    
+    # Seed reminders with the current lists and start firing them
+    reminder_scheduler.set_entries(medicines=fetch_medicine_list(), schedule=fetch_schedule_list())
+    reminder_scheduler.start()
+    
+    # Aggregate each patient's vitals for model inputs and online learning
+    patient_aggregates.load().start(sensor_stream)
+    
+    # Swap in retrained models without a restart
+    predictors.start_watching()
+    atexit.register(cleanup)
+    logger.info(f"Background services started (pid {os.getpid()})")
+    return True
+
+def create_app():
+    """WSGI entry point: the app with its background services running"""
+    start_background()
+    return app
+
 # Clean up on exit
 def cleanup():
+    global _cleaned_up
+    with _background_lock:
+        if _cleaned_up:
+            return
+        _cleaned_up = True
+    reminder_scheduler.stop()
+    predictors.stop_watching()
+    patient_aggregates.stop()
+    online_learning.stop_learner()
     disconnect_device()
+    device_registry.stop()
+
+@app.route('/assets/<path:filename>')
+def hashed_asset(filename):
+    """Content-hashed static file, precompressed when the browser accepts it, cached for a year"""
+    found = asset_manifest.locate(filename, request.accept_encodings)
+    if found is None:
+        return "Not found", 404
+    path, encoding = found
+    response = send_from_directory(asset_manifest.build_dir, path, max_age=CACHE_MAX_AGE,
+                                   mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f'public, max-age={CACHE_MAX_AGE}, immutable'
+    return response
+
+@app.after_request
+def revalidate_pages(response):
+    """ETag on rendered pages, so an unchanged repeat view is a 304 with no body"""
+    if (request.method == 'GET' and response.status_code == 200 and response.mimetype == 'text/html'
+            and not response.direct_passthrough):
+        response.add_etag()
+        response.headers['Cache-Control'] = 'no-cache'
+        response.make_conditional(request)
+    return response
+
+# Templates rendered without context are the same on every call, so each is rendered once
+rendered_shells = {}
 
 # Templates directory
 @app.route('/templates/<path:path>')
 def serve_template(path):
     # This should be handled by Flask's template system, but added for completeness
-    return render_template(path)
+    if path in rendered_shells:
+        return rendered_shells[path]
+    # A pending flash message would otherwise be cached into the page
+    cacheable = '_flashes' not in flask_session
+    shell = render_template(path)
+    if cacheable:
+        rendered_shells[path] = shell
+    return shell
 
 # Make sure all templates are created
 def create_templates():
@@ -2291,63 +1782,20 @@ def create_templates():
 {% endblock %}
 """)
 
-# Function to generate dotted line for gesture visualization
-def drawline(img, pt1, pt2, color, thickness=1, style='dotted', gap=20):
-    if not MEDIAPIPE_AVAILABLE:
-        return
-        
-    dist = ((pt1[0] - pt2[0]) ** 2 + (pt1[1] - pt2[1]) ** 2) ** .5
-    pts = []
-    for i in np.arange(0, dist, gap):
-        r = i / dist
-        x = int((pt1[0] * (1 - r) + pt2[0] * r) + .5)
-        y = int((pt1[1] * (1 - r) + pt2[1] * r) + .5)
-        p = (x, y)
-        pts.append(p)
-    if style == 'dotted':
-        for p in pts:
-            cv2.circle(img, p, thickness, color, -1)
-    else:
-        s = pts[0]
-        e = pts[0]
-        i = 0
-        for p in pts:
-            s = e
-            e = p
-            if i % 2 == 1:
-                cv2.line(img, s, e, color, thickness)
-            i += 1
-
-# Function to draw page indicators
-def draw_page_indicators(img, current_page, max_pages):
-    if not MEDIAPIPE_AVAILABLE:
-        return
-        
-    start_x = 10
-    y = 70
-    circle_radius = 10
-    spacing = 30
-    
-    for i in range(max_pages):
-        center = (start_x + i * spacing, y)
-        if i == current_page:
-            cv2.circle(img, center, circle_radius, (0, 255, 0), -1)  # Filled circle for current page
-        else:
-            cv2.circle(img, center, circle_radius, (128, 128, 128), 2)  # Empty circle for other pages
-
 # Function to switch pages via serial command
-def switch_page(arduino_ser):
-    global current_page
-    try:
-        # Use the existing send_command function instead of direct serial access
-        response = send_command("button_press")
-        logger.info(f"Page switch command response: {response}")
+def switch_page():
+    """Queue a page switch without stalling the camera loop on the reply"""
+    def on_reply(response):
+        global current_page
+        logger.debug(f"Page switch command response: {response}")
         
         # Check for successful page change
         if "Page changed successfully" in response:
             current_page = (current_page + 1) % MAX_PAGES
             logger.info(f"Updated page counter to: {current_page}")
-        
+    
+    try:
+        default_session.send_command_nowait("button_press", callback=on_reply)
         return True
     except Exception as e:
         logger.error(f"Error sending page switch command: {e}")
@@ -2355,126 +1803,18 @@ def switch_page(arduino_ser):
 
 # Main gesture detection thread function
 def gesture_detection_thread(stop_event):
-    global ser, current_page
-    
-    if not MEDIAPIPE_AVAILABLE:
-        logger.error("MediaPipe is not available. Cannot run gesture detection.")
-        return
-        
-    if not connected or not ser:
+    if not connected or not default_session.connected:
         logger.error("Cannot start gesture detection - not connected to device")
         return
     
-    logger.info("Starting gesture detection thread")
-    
-    # Mediapipe setup
-    mp_drawing = mp.solutions.drawing_utils
-    hand_mpDraw = mp.solutions.drawing_utils
-    mp_hands = mp.solutions.hands
-    
-    # Initialize camera
-    cap = cv2.VideoCapture(0)  # Try 0 first, can be changed to other camera indices
-    if not cap.isOpened():
-        logger.error("Failed to open camera with index 0, trying index 1")
-        cap = cv2.VideoCapture(1)
-        if not cap.isOpened():
-            logger.error("Failed to open camera with index 1, trying index 2")
-            cap = cv2.VideoCapture(2)
-            if not cap.isOpened():
-                logger.error("Failed to open any camera")
-                return
-    
-    distance = -1
-    last_switch_time = 0  # For debouncing
-    
-    # Start MediaPipe Hands
-    with mp_hands.Hands(
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5,
-            max_num_hands=2) as hands:
-            
-        while not stop_event.is_set() and cap.isOpened():
-            # Read frame
-            success, image = cap.read()
-            if not success:
-                logger.error("Failed to read frame from camera")
-                time.sleep(0.1)
-                continue
-                
-            # Process image
-            image = cv2.flip(image, 1)
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            image.flags.writeable = False
-            results = hands.process(image)
-            image.flags.writeable = True
-            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-            
-            # Draw instructions and page indicators
-            cv2.putText(image, "Join index finger and thumb to switch pages", (10, 30),
-                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-            draw_page_indicators(image, current_page, MAX_PAGES)
-            cv2.putText(image, f"Current Page: {current_page}", (10, 100),
-                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-            
-            # Process hand landmarks
-            if results.multi_hand_landmarks:
-                for hand_landmarks in results.multi_hand_landmarks:
-                    lmList = []
-                    for id, lm in enumerate(hand_landmarks.landmark):
-                        h, w, c = image.shape
-                        cx, cy = int(lm.x * w), int(lm.y * h)
-                        lmList.append([id, cx, cy])
-                        tips = [0, 4, 8, 12, 16, 20]
-                        if id in tips:
-                            cv2.circle(image, (cx, cy), 15, (0, 255, 0), cv2.FILLED)
-                    
-                    # Check if we have enough landmarks for index and thumb
-                    if len(lmList) > 8:
-                        # Calculate distance between index and thumb
-                        distance = math.hypot(lmList[8][1] - lmList[4][1], lmList[8][2] - lmList[4][2])
-                        
-                        # Check if fingers are close enough to trigger page switch
-                        current_time = time.time()
-                        if distance < 50 and (current_time - last_switch_time) > 1.0:
-                            logger.info(f"Fingers close! Distance: {distance}")
-                            
-                            # Use lock when accessing serial
-                            with connection_lock:
-                                switch_page(ser)
-                                
-                            last_switch_time = current_time
-                        
-                        # Draw line between index and thumb
-                        drawline(image, (lmList[4][1], lmList[4][2]), (lmList[8][1], lmList[8][2]), (0, 0, 255),
-                               thickness=1, style='dotted', gap=10)
-                        
-                        # Add distance text to screen
-                        cv2.putText(image, f"Distance: {int(distance)}", (10, 150),
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                    
-                    # Draw landmarks
-                    mp_drawing.draw_landmarks(
-                        image, hand_landmarks, mp_hands.HAND_CONNECTIONS,
-                        landmark_drawing_spec=hand_mpDraw.DrawingSpec(color=(0, 255, 0)),
-                        connection_drawing_spec=hand_mpDraw.DrawingSpec(color=(255, 0, 0)))
-            
-            # Display the frame
-            cv2.imshow('AR Gesture Control', image)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-                
-            # Small delay to prevent high CPU usage
-            time.sleep(0.01)
-    
-    # Release resources
-    cap.release()
-    cv2.destroyAllWindows()
-    logger.info("Gesture detection thread stopped")
+    gesture_control.run(stop_event, switch_page, lambda: current_page, MAX_PAGES)
 
 # Function to start gesture detection
 def start_gesture_detection():
     global gesture_enabled, gesture_thread, gesture_stop_event
     
+    global gesture_control
+    
     if not MEDIAPIPE_AVAILABLE:
         logger.error("MediaPipe is not available. Cannot start gesture detection.")
         return False
@@ -2487,6 +1827,14 @@ def start_gesture_detection():
         logger.error("Cannot start gesture detection - not connected to device")
         return False
     
+    # OpenCV and MediaPipe are only loaded once gesture detection is first used
+    if gesture_control is None:
+        try:
+            import gesture_control
+        except ImportError as e:
+            logger.error(f"Cannot load gesture detection: {e}")
+            return False
+    
     # Create and start thread
     gesture_stop_event.clear()
     gesture_thread = threading.Thread(
@@ -2527,38 +1875,34 @@ def gesture_page():
 @app.route('/predictions')
 def predictions_page():
     """Render the predictions page with current sensor data"""
-    return render_template('predictions.html', sensor_data=sensor_data)
+    return render_template('predictions.html', sensor_data=default_session.sensor_data)
+
+def patient_record(name, data):
+    """(prediction inputs, patient ID): with a "device" or "patient", inputs the request
+    leaves out are filled from that patient's telemetry aggregates"""
+    record = dict(data or {})
+    device_id = record.pop('device', None)
+    patient_id = record.pop('patient', None)
+    if patient_id is None and device_id is not None:
+        session = device_registry.get(device_id)
+        patient_id = session.patient_id if session else device_id
+    if patient_id is None:
+        return record, None
+    return patient_aggregates.features(name, patient_id, record), patient_id
 
 @app.route('/api/predict/hypertension', methods=['POST'])
 def predict_hypertension():
     """API endpoint for hypertension risk prediction"""
-    if not JOBLIB_AVAILABLE or hypertension_model is None:
+    if predictors.get('hypertension') is None:
         return jsonify({"error": "Hypertension model not available"}), 503
     
     try:
-        data = request.json
-        # Extract features
-        features = {
-            'age': data.get('age', 45),
-            'male': data.get('male', 0),
-            'sysBP': data.get('sysBP', 120),
-            'diaBP': data.get('diaBP', 80),
-            'heartRate': data.get('heartRate', 75)
-        }
-        
-        # Create feature array for prediction
-        import pandas as pd
-        features_df = pd.DataFrame([features])
-        
-        # Make prediction
-        prediction = int(hypertension_model.predict(features_df)[0])
-        probability = float(hypertension_model.predict_proba(features_df)[0][1])
+        # Features are built by the schema the model was trained with (see feature_schema.py)
+        start = time.perf_counter()
+        result = predictors.predict('hypertension', patient_record('hypertension', request.json)[0])
+        PREDICTION_SECONDS.labels('hypertension').observe(time.perf_counter() - start)
         
-        return jsonify({
-            "risk": prediction,
-            "probability": probability,
-            "features": features
-        })
+        return jsonify(result)
     except Exception as e:
         logger.error(f"Error in hypertension prediction: {e}")
         return jsonify({"error": str(e)}), 500
@@ -2566,57 +1910,16 @@ def predict_hypertension():
 @app.route('/api/predict/cardiac', methods=['POST'])
 def predict_cardiac():
     """API endpoint for cardiac arrest risk prediction"""
-    if not JOBLIB_AVAILABLE or cardiac_model is None:
+    if predictors.get('cardiac') is None:
         return jsonify({"error": "Cardiac arrest model not available"}), 503
     
     try:
-        data = request.json
-        # Extract features
-        features = {
-            'Age': data.get('Age', 45),
-            'Gender': data.get('Gender', 'Male'),
-            'Heart_Rate': data.get('Heart_Rate', 75),
-            'Systolic_BP': data.get('Systolic_BP', 120),
-            'Diastolic_BP': data.get('Diastolic_BP', 80),
-            'BMI': data.get('BMI', 24.5),
-            'Age_BMI': data.get('Age', 45) * data.get('BMI', 24.5)
-        }
+        # Derived features and age/BMI buckets are computed by the schema, exactly as in training
+        start = time.perf_counter()
+        result = predictors.predict('cardiac', patient_record('cardiac', request.json)[0])
+        PREDICTION_SECONDS.labels('cardiac').observe(time.perf_counter() - start)
         
-        # Add derived features
-        features['Pulse_Pressure'] = features['Systolic_BP'] - features['Diastolic_BP']
-        
-        # Add categorical features
-        age_value = features['Age']
-        if age_value <= 35:
-            features['Age_Bucket'] = 'young'
-        elif age_value <= 50:
-            features['Age_Bucket'] = 'mid'
-        elif age_value <= 65:
-            features['Age_Bucket'] = 'senior'
-        else:
-            features['Age_Bucket'] = 'elder'
-            
-        bmi_value = features['BMI']
-        if bmi_value <= 18.5:
-            features['BMI_Category'] = 'underweight'
-        elif bmi_value <= 24.9:
-            features['BMI_Category'] = 'normal'
-        elif bmi_value <= 29.9:
-            features['BMI_Category'] = 'overweight'
-        else:
-            features['BMI_Category'] = 'obese'
-        
-        # Create feature array for prediction
-        import pandas as pd
-        features_df = pd.DataFrame([features])
-        
-        # Make prediction
-        prediction = int(cardiac_model.predict(features_df)[0])
-        
-        return jsonify({
-            "risk": prediction,
-            "features": features
-        })
+        return jsonify(result)
     except Exception as e:
         logger.error(f"Error in cardiac arrest prediction: {e}")
         return jsonify({"error": str(e)}), 500
@@ -2624,50 +1927,53 @@ def predict_cardiac():
 @app.route('/api/predict/anxiety', methods=['POST'])
 def predict_anxiety():
     """API endpoint for anxiety assessment"""
-    if not JOBLIB_AVAILABLE or anxiety_model is None or anxiety_imputer is None:
+    if predictors.get('anxiety') is None:
         return jsonify({"error": "Anxiety model not available"}), 503
     
     try:
-        data = request.json
-        # Extract features
-        features = {
-            'Age': data.get('Age', 12),
-            'Number of Siblings': data.get('Siblings', 1),
-            'Number of Bio. Parents': data.get('BioParents', 2),
-            'Poverty Status': data.get('Poverty', 0),
-            'Number of Impairments': data.get('Impairments', 0),
-            'Number of Type A Stressors': data.get('StressorsA', 0),
-            'Number of Type B Stressors': data.get('StressorsB', 0),
-            'Frequency Temper Tantrums': data.get('Tantrums', 0),
-            'Frequency Irritable Mood': data.get('Irritable', 0),
-            'Number of Sleep Disturbances': data.get('Sleep', 0),
-            'Number of Physical Symptoms': data.get('Physical', 0),
-            'Number of Sensory Sensitivities': data.get('Sensory', 0),
-            'Family History - Substance Abuse': data.get('Substance', 0),
-            'Family History - Psychiatric Diagnosis': data.get('Psychiatric', 0)
-        }
-        
-        # Create feature array for prediction
-        import pandas as pd
-        import numpy as np
-        features_df = pd.DataFrame([features])
-        
-        # Apply the same imputation as during training
-        features_imputed = anxiety_imputer.transform(features_df)
+        # The bundle applies the imputer fitted during training before the model
+        start = time.perf_counter()
+        result = predictors.predict('anxiety', patient_record('anxiety', request.json)[0])
+        PREDICTION_SECONDS.labels('anxiety').observe(time.perf_counter() - start)
         
-        # Make prediction
-        prediction = int(anxiety_model.predict(features_imputed)[0])
-        probability = float(anxiety_model.predict_proba(features_imputed)[0][1])
-        
-        return jsonify({
-            "risk": prediction,
-            "probability": probability,
-            "features": features
-        })
+        return jsonify(result)
     except Exception as e:
         logger.error(f"Error in anxiety prediction: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/models')
+def api_models():
+    """Serving version, checksum and training metadata of each model loaded so far"""
+    return jsonify(predictors.describe())
+
+@app.route('/api/models/<name>/outcomes', methods=['POST'])
+def api_model_outcome(name):
+    """Record a patient's observed outcome (risk 0/1) as a labelled example for online learning"""
+    if name not in online_learning.TELEMETRY_FEATURES:
+        return jsonify({"error": f"Unknown model: {name}"}), 404
+    data = request.json or {}
+    risk = data.pop('risk', None)
+    if risk not in (0, 1):
+        return jsonify({"error": "risk must be 0 or 1"}), 400
+    
+    try:
+        record, patient_id = patient_record(name, data)
+        example = example_log.append(name, record, risk, patient_id)
+        return jsonify({"status": "success", "model": name, "example": example})
+    except Exception as e:
+        logger.error(f"Error recording {name} outcome: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/aggregates')
+def api_aggregates():
+    """Telemetry aggregates of every patient (?patient= for one)"""
+    return jsonify(patient_aggregates.describe(request.args.get('patient')))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Counters, gauges and latency histograms in the Prometheus text format"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/api/gesture/start', methods=['POST'])
 def api_start_gesture():
     """Start gesture detection"""
@@ -2697,16 +2003,12 @@ def api_gesture_status():
 
 @app.route('/api/sensor_data', methods=['GET'])
 def api_sensor_data():
-    """API endpoint to get current sensor data"""
+    """API endpoint to get current sensor data (ETag and ?wait=, see versioned_response)"""
     try:
-        # Get current vital signs
-        current_time = time.time()
-        
-        # Use the global sensor_data instead of non-existent vital_signs variable
-        return jsonify({
+        return versioned_response(default_session, sensor_version, lambda: jsonify({
             "status": "success",
-            "sensor_data": sensor_data
-        })
+            "sensor_data": default_session.sensor_data
+        }))
     except Exception as e:
         app.logger.error(f"Error fetching sensor data: {e}")
         return jsonify({
@@ -2714,27 +2016,134 @@ def api_sensor_data():
             "message": str(e)
         }), 500
 
+@app.route('/api/sensor_stream')
+def api_sensor_stream():
+    """Server-sent events stream with one event per sensor reading (?device= to filter)"""
+    device_id = request.args.get('device')
+    subscription = sensor_stream.subscribe()
+    
+    def wanted(reading):
+        return device_id is None or reading.get("device_id") == device_id
+    
+    def generate():
+        try:
+            # Send the latest reading straight away so clients start with current state
+            if device_id is not None:
+                session = device_registry.get(device_id)
+                latest = session.latest_reading() if session else None
+            else:
+                latest = sensor_stream.last_reading
+            if latest is not None:
+                yield f"data: {json.dumps(latest)}\n\n"
+            while True:
+                reading = subscription.get(timeout=SENSOR_STREAM_KEEPALIVE)
+                if reading is None:
+                    # Comment line keeps proxies and idle clients from timing out
+                    yield ": keepalive\n\n"
+                elif wanted(reading):
+                    yield f"data: {json.dumps(reading)}\n\n"
+        finally:
+            subscription.close()
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Device-scoped API: one session per wearable, keyed by device ID
+
+def get_device_or_404(device_id):
+    session = device_registry.get(device_id)
+    if session is None:
+        return None, (jsonify({"status": "error", "message": f"Unknown device: {device_id}"}), 404)
+    return session, None
+
+@app.route('/api/devices', methods=['GET'])
+def api_devices():
+    """List registered devices and their connection state"""
+    return jsonify({"status": "success", "devices": device_registry.snapshot()})
+
+@app.route('/api/devices', methods=['POST'])
+def api_add_device():
+    """Register a device and start connecting to its serial port"""
+    data = request.get_json(silent=True) or {}
+    device_id = data.get("device_id")
+    port = data.get("port")
+    if not device_id or not port:
+        return jsonify({"status": "error", "message": "device_id and port are required"}), 400
+    
+    # The supervisor opens the port in the background and keeps it connected
+    session = device_registry.request_connect(device_id, port, data.get("patient"))
+    return jsonify({"status": "success", "device": session.status()}), 202
+
+@app.route('/api/devices/<device_id>', methods=['DELETE'])
+def api_remove_device(device_id):
+    """Disconnect and forget a device"""
+    if device_id == DEFAULT_DEVICE_ID:
+        disconnect_device()
+        return jsonify({"status": "success"})
+    if not device_registry.remove(device_id):
+        return jsonify({"status": "error", "message": f"Unknown device: {device_id}"}), 404
+    return jsonify({"status": "success"})
+
+@app.route('/api/devices/<device_id>/sensor_data')
+def api_device_sensor_data(device_id):
+    """Current sensor data for one device"""
+    session, error = get_device_or_404(device_id)
+    if error:
+        return error
+    return versioned_response(session, sensor_version, lambda: jsonify({
+        "status": "success", "device_id": device_id, "sensor_data": session.sensor_data
+    }))
+
+@app.route('/api/devices/<device_id>/gps')
+def api_device_gps(device_id):
+    """Cached GPS fix for one device"""
+    session, error = get_device_or_404(device_id)
+    if error:
+        return error
+    fetch_gps_data(session)
+    return versioned_response(session, gps_version, lambda: jsonify(session.gps_data))
+
+@app.route('/api/devices/<device_id>/command', methods=['POST'])
+def api_device_command(device_id):
+    """Send a terminal command to one device"""
+    session, error = get_device_or_404(device_id)
+    if error:
+        return error
+    data = request.get_json(silent=True) or request.form
+    command = data.get("command")
+    if not command:
+        return jsonify({"status": "error", "message": "Command cannot be empty"}), 400
+    if not session.connected:
+        return jsonify({"status": "error", "message": "Device not connected"}), 400
+    return jsonify({"status": "success", "response": session.send_command(command)})
+
 # Add the following route for updating vital signs programmatically
 
 @app.route('/update_vital_signs', methods=['POST'])
 def update_vital_signs():
     """API endpoint to update vital signs programmatically for testing"""
     try:
-        global sensor_data
         # Get vital sign data from request
         data = request.json
         
-        if not data:
+        if not isinstance(data, dict) or not data:
             return jsonify({
                 "status": "error",
                 "message": "No data provided"
             }), 400
         
-        # Update the global sensor_data dict with received data
-        sensor_data.update(data)
+        # Same fields and signal quality checks as a reading from the wearable
+        data = dict(data)
+        session, error = get_device_or_404(data.pop("device_id", DEFAULT_DEVICE_ID))
+        if error:
+            return error
+        try:
+            sensor_stream.publish(session.apply_values(data))
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
         
         # Log the update
-        app.logger.info(f"Vital signs updated: {data}")
+        app.logger.debug(f"Vital signs updated: {data}")
         
         return jsonify({
             "status": "success",
@@ -2747,15 +2156,29 @@ def update_vital_signs():
             "message": str(e)
         }), 500
 
-if __name__ == "__main__":
-    # Create templates
-    create_templates()
+def main():
+    """Development server: threaded, without the reloader (which imports everything twice)"""
+    parser = argparse.ArgumentParser(description='Synapse AR web interface (development server; see serve.py)')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='Address to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port to listen on')
+    parser.add_argument('--debug', action='store_true', help='Flask debug mode (debugger, no reloader)')
+    parser.add_argument('--online-learning', action='store_true',
+                        help='Also run the online learner (online_learning.py) as a child process')
+    args = parser.parse_args()
+    
+    start_background()
+    if args.online_learning:
+        online_learning.start_learner()
+    # SIGTERM unwinds like Ctrl+C so devices and reminders are stopped cleanly
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     
-    # Start the Flask app
     try:
         logger.info("Starting Synapse AR Web Interface...")
-        app.run(host='0.0.0.0', port=8081, debug=True)
+        app.run(host=args.host, port=args.port, debug=args.debug, use_reloader=False, threaded=True)
     except KeyboardInterrupt:
         logger.info("Shutting down...")
     finally:
-        cleanup() 
\ No newline at end of file
+        cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,10 @@ from telebot import types
 import threading
 import requests
 import datetime
+import metrics
+from notification_queue import NotificationQueue
+from alert_rules import RuleSet
+from device_sessions import load_device_config, DEFAULT_DEVICE_ID
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
@@ -18,6 +22,17 @@ logger = logging.getLogger(__name__)
 BOT_TOKEN = '7611464404:AAHng-spGfoE86FwGa_G9JcQy0Hx4TawMMw'
 GROUP_CHAT_ID = '-4736660190'
 
+# Override the Bot API endpoint, e.g. to point at fake_telegram.py during tests
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL')
+
+# Synapse AR web server endpoints
+SENSOR_API_URL = 'http://localhost:8081/api/sensor_data'
+SENSOR_STREAM_URL = 'http://localhost:8081/api/sensor_stream'
+STREAM_RECONNECT_MAX = 30        # Max seconds between stream reconnect attempts
+
+# Port for this process's Prometheus /metrics endpoint
+METRICS_PORT = int(os.environ.get('ALERTS_METRICS_PORT', 8083))
+
 
 TEMP_HIGH_THRESHOLD = 38.0       # Alert when temperature exceeds 38.0°C
 HR_HIGH_THRESHOLD = 120          # Alert when heart rate exceeds 120 BPM
@@ -29,23 +44,44 @@ TEMP_ALERT_COOLDOWN = 300        # 5 minutes between temperature alerts
 HR_ALERT_COOLDOWN = 180          # 3 minutes between heart rate alerts
 SPO2_ALERT_COOLDOWN = 300        # 5 minutes between SpO2 alerts
 FALL_ALERT_COOLDOWN = 60         # 1 minute between fall alerts
+WANDER_ALERT_COOLDOWN = 300      # 5 minutes between reminders while outside the safe area
 
-# Store last alert times
-last_alerts = {
-    'temp_high': 0,
-    'hr_high': 0,
-    'hr_low': 0,
-    'spo2_low': 0,
-    'fall': 0
-}
+# Rules used when alert_rules.json is missing; same behaviour as the fixed thresholds above
+DEFAULT_ALERT_RULES = [
+    {"name": "temp_high", "when": f"temperature > {TEMP_HIGH_THRESHOLD}", "cooldown": TEMP_ALERT_COOLDOWN},
+    {"name": "hr_high", "when": f"heartRateAvg > {HR_HIGH_THRESHOLD}", "cooldown": HR_ALERT_COOLDOWN},
+    {"name": "hr_low", "when": f"heartRateAvg < {HR_LOW_THRESHOLD}", "cooldown": HR_ALERT_COOLDOWN,
+     "min_valid": 0},
+    {"name": "spo2_low", "when": f"spo2Avg < {SPO2_LOW_THRESHOLD}", "cooldown": SPO2_ALERT_COOLDOWN,
+     "min_valid": 0},
+    {"name": "fall", "when": "fallDetected", "cooldown": FALL_ALERT_COOLDOWN},
+    # GPS doesn't depend on the vital-sign sensors' validReadings flag
+    {"name": "wander", "when": "wandering", "cooldown": WANDER_ALERT_COOLDOWN, "require_valid": False}
+]
+
+READINGS_PROCESSED = metrics.counter('synapse_alert_readings_total', 'Readings evaluated against alert rules')
+EVALUATION_SECONDS = metrics.histogram('synapse_alert_evaluation_seconds', 'Rule evaluation time per reading')
+ALERTS_FIRED = metrics.counter('synapse_alerts_fired_total', 'Alert rules that fired', ['rule'])
+ALERT_LATENCY = metrics.histogram('synapse_alert_queue_latency_seconds', 'Reading timestamp to alert queued')
 
 # Initialize the bot
+if TELEGRAM_API_URL:
+    telebot.apihelper.API_URL = TELEGRAM_API_URL
 bot = telebot.TeleBot(BOT_TOKEN)
 
-class TelegramAlertSystem:
-    def __init__(self):
-        self.running = False
-        self.thread = None
+def deliver_telegram_message(chat_id, text, parse_mode):
+    """Send one message through the Bot API (raises on failure so it can be retried)"""
+    bot.send_message(chat_id, text, parse_mode=parse_mode)
+
+class PatientMonitor:
+    """Alert rules, latest reading and messages for one patient's wearable"""
+    
+    def __init__(self, device_id, user_info, chat_id, engine, outbox):
+        self.device_id = device_id
+        self.user_info = user_info
+        self.chat_id = chat_id
+        self.engine = engine
+        self.outbox = outbox
         self.sensor_data = {
             "heartRate": 0,
             "heartRateAvg": 0,
@@ -53,110 +89,44 @@ class TelegramAlertSystem:
             "spo2Avg": 0,
             "temperature": 0,
             "fallDetected": False,
+            "wandering": False,
             "validReadings": False,
             "last_updated": None
         }
-        self.user_info = {
-            "name": "Patient",
-            "age": 45,
-            "gender": "Not specified",
-            "medical_conditions": ["None specified"]
+        self.alert_handlers = {
+            'temp_high': self.send_temperature_alert,
+            'hr_high': self.send_high_hr_alert,
+            'hr_low': self.send_low_hr_alert,
+            'spo2_low': self.send_spo2_alert,
+            'fall': self.send_fall_alert,
+            'wander': self.send_wander_alert
         }
-        
-        # Attempt to load user info from file
-        try:
-            if os.path.exists('user_info.json'):
-                with open('user_info.json', 'r') as f:
-                    self.user_info = json.load(f)
-                logger.info("Loaded user information from file")
-        except Exception as e:
-            logger.error(f"Error loading user info: {e}")
-    
-    def save_user_info(self):
-        """Save user information to a file"""
-        try:
-            with open('user_info.json', 'w') as f:
-                json.dump(self.user_info, f, indent=4)
-            logger.info("Saved user information to file")
-        except Exception as e:
-            logger.error(f"Error saving user info: {e}")
     
-    def get_sensor_data(self):
-        """Get the latest sensor data from Synapse AR web server"""
-        try:
-            response = requests.get('http://localhost:8081/api/sensor_data')
-            if response.status_code == 200:
-                data = response.json()
-                if 'sensor_data' in data:
-                    self.sensor_data = data['sensor_data']
-                    logger.debug(f"Retrieved sensor data: {self.sensor_data}")
-                    return True
-            return False
-        except Exception as e:
-            logger.error(f"Error getting sensor data: {e}")
-            return False
+    @property
+    def patient_id(self):
+        return self.user_info.get('id')
     
     def check_alerts(self):
-        """Check if any health metrics exceed alert thresholds"""
-        current_time = time.time()
-        
-        # Check if readings are valid
-        if not self.sensor_data.get('validReadings', False):
-            return
-        
-        # Check temperature
-        if self.sensor_data['temperature'] > TEMP_HIGH_THRESHOLD:
-            if current_time - last_alerts['temp_high'] > TEMP_ALERT_COOLDOWN:
-                self.send_temperature_alert()
-                last_alerts['temp_high'] = current_time
-        
-        # Check heart rate
-        if self.sensor_data['heartRateAvg'] > HR_HIGH_THRESHOLD:
-            if current_time - last_alerts['hr_high'] > HR_ALERT_COOLDOWN:
-                self.send_high_hr_alert()
-                last_alerts['hr_high'] = current_time
-        elif self.sensor_data['heartRateAvg'] < HR_LOW_THRESHOLD and self.sensor_data['heartRateAvg'] > 20:
-            if current_time - last_alerts['hr_low'] > HR_ALERT_COOLDOWN:
-                self.send_low_hr_alert()
-                last_alerts['hr_low'] = current_time
-        
-        # Check SpO2
-        if self.sensor_data['spo2Avg'] < SPO2_LOW_THRESHOLD and self.sensor_data['spo2Avg'] > 0:
-            if current_time - last_alerts['spo2_low'] > SPO2_ALERT_COOLDOWN:
-                self.send_spo2_alert()
-                last_alerts['spo2_low'] = current_time
-        
-        # Check for fall detection with improved handling
-        fall_detected = False
-        
-        # Properly check the fallDetected field with type awareness
-        if 'fallDetected' in self.sensor_data:
-            fall_value = self.sensor_data['fallDetected']
-            
-            # Handle different possible data types for the fall detection value
-            if isinstance(fall_value, bool):
-                fall_detected = fall_value
-            elif isinstance(fall_value, int) or isinstance(fall_value, float):
-                fall_detected = fall_value > 0
-            elif isinstance(fall_value, str):
-                fall_detected = fall_value.lower() in ('yes', 'true', '1', 'y')
-            
-            # Log for debugging
-            logger.info(f"Fall detection check: raw={fall_value}, type={type(fall_value).__name__}, interpreted={fall_detected}")
-        
-        if fall_detected:
-            # Log that fall was detected
-            logger.info(f"Fall detected in sensor data: {fall_detected}")
-            
-            if current_time - last_alerts['fall'] > FALL_ALERT_COOLDOWN:
-                # Log attempt to send fall alert
-                logger.info("Attempting to send fall alert due to detected fall")
-                self.send_fall_alert()
-                last_alerts['fall'] = current_time
+        """Feed the current reading to the rule engine and send any alerts that fire"""
+        start = time.perf_counter()
+        fired = self.engine.evaluate(self.sensor_data)
+        EVALUATION_SECONDS.observe(time.perf_counter() - start)
+        for rule, value in fired:
+            logger.info(f"Alert rule '{rule['name']}' fired ({rule.get('when', rule['type'])}, value={value})")
+            ALERTS_FIRED.labels(rule['name']).inc()
+            handler = self.alert_handlers.get(rule['name'])
+            if handler:
+                handler(rule, value)
+            else:
+                self.send_rule_alert(rule, value)
+            reading_time = self.sensor_data.get('last_updated')
+            if reading_time:
+                ALERT_LATENCY.observe(max(time.time() - reading_time, 0.0))
     
-    def send_temperature_alert(self):
+    def send_temperature_alert(self, rule=None, value=None):
         """Send high temperature alert to Telegram group"""
         temp = self.sensor_data['temperature']
+        threshold = rule.get('value', TEMP_HIGH_THRESHOLD) if rule else TEMP_HIGH_THRESHOLD
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         message = (
@@ -164,15 +134,16 @@ class TelegramAlertSystem:
             f"Patient: {self.user_info['name']}\n"
             f"Temperature: *{temp:.1f}°C*\n"
             f"Time: {timestamp}\n\n"
-            f"❗ Temperature exceeds safe threshold of {TEMP_HIGH_THRESHOLD}°C"
+            f"❗ Temperature exceeds safe threshold of {threshold:g}°C"
         )
         
         self.send_telegram_message(message)
         logger.info(f"Sent high temperature alert: {temp:.1f}°C")
     
-    def send_high_hr_alert(self):
+    def send_high_hr_alert(self, rule=None, value=None):
         """Send high heart rate alert to Telegram group"""
         hr = self.sensor_data['heartRateAvg']
+        threshold = rule.get('value', HR_HIGH_THRESHOLD) if rule else HR_HIGH_THRESHOLD
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         message = (
@@ -180,15 +151,16 @@ class TelegramAlertSystem:
             f"Patient: {self.user_info['name']}\n"
             f"Heart Rate: *{hr} BPM*\n"
             f"Time: {timestamp}\n\n"
-            f"❗ Heart rate exceeds safe threshold of {HR_HIGH_THRESHOLD} BPM"
+            f"❗ Heart rate exceeds safe threshold of {threshold:g} BPM"
         )
         
         self.send_telegram_message(message)
         logger.info(f"Sent high heart rate alert: {hr} BPM")
     
-    def send_low_hr_alert(self):
+    def send_low_hr_alert(self, rule=None, value=None):
         """Send low heart rate alert to Telegram group"""
         hr = self.sensor_data['heartRateAvg']
+        threshold = rule.get('value', HR_LOW_THRESHOLD) if rule else HR_LOW_THRESHOLD
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         message = (
@@ -196,15 +168,16 @@ class TelegramAlertSystem:
             f"Patient: {self.user_info['name']}\n"
             f"Heart Rate: *{hr} BPM*\n"
             f"Time: {timestamp}\n\n"
-            f"❗ Heart rate below safe threshold of {HR_LOW_THRESHOLD} BPM"
+            f"❗ Heart rate below safe threshold of {threshold:g} BPM"
         )
         
         self.send_telegram_message(message)
         logger.info(f"Sent low heart rate alert: {hr} BPM")
     
-    def send_spo2_alert(self):
+    def send_spo2_alert(self, rule=None, value=None):
         """Send low SpO2 alert to Telegram group"""
         spo2 = self.sensor_data['spo2Avg']
+        threshold = rule.get('value', SPO2_LOW_THRESHOLD) if rule else SPO2_LOW_THRESHOLD
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         message = (
@@ -212,67 +185,259 @@ class TelegramAlertSystem:
             f"Patient: {self.user_info['name']}\n"
             f"SpO2: *{spo2}%*\n"
             f"Time: {timestamp}\n\n"
-            f"❗ Oxygen saturation below safe threshold of {SPO2_LOW_THRESHOLD}%"
+            f"❗ Oxygen saturation below safe threshold of {threshold:g}%"
         )
         
         self.send_telegram_message(message)
         logger.info(f"Sent low SpO2 alert: {spo2}%")
     
-    def send_fall_alert(self):
+    def send_fall_alert(self, rule=None, value=None):
         """Send fall detection alert to Telegram group"""
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
+        confidence = self.sensor_data.get('fallConfidence')
+        
         message = (
             f"🚨 *FALL DETECTED* 🚨\n\n"
             f"Patient: {self.user_info['name']}\n"
-            f"Time: {timestamp}\n\n"
-            f"❗ Fall detected! Immediate assistance may be required."
+            f"Time: {timestamp}\n"
         )
+        if confidence:
+            # Set when the fall was detected on the host from the raw IMU stream
+            message += f"Confidence: {confidence:.0%}\n"
+        message += "\n❗ Fall detected! Immediate assistance may be required."
         
         result = self.send_telegram_message(message)
         if result:
-            logger.info("Successfully sent fall detection alert")
+            logger.info("Queued fall detection alert")
         else:
-            logger.error("Failed to send fall detection alert")
+            logger.error("Failed to queue fall detection alert")
+    
+    def send_wander_alert(self, rule=None, value=None):
+        """Send alert when the patient leaves their safe area or enters a restricted one"""
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        location = self.sensor_data.get('geofenceLocation')
+        inside = self.sensor_data.get('geofences') or []
+        
+        message = (
+            f"🧭 *WANDERING ALERT* 🧭\n\n"
+            f"Patient: {self.user_info['name']}\n"
+            f"Time: {timestamp}\n"
+        )
+        if inside:
+            message += f"Inside: {', '.join(inside)}\n"
+        if location:
+            lat, lng = location
+            message += f"Location: https://maps.google.com/?q={lat:.6f},{lng:.6f}\n"
+        message += "\n❗ Patient is outside their safe area. Please check on them."
+        
+        self.send_telegram_message(message)
+        logger.info(f"Sent wander alert: {location}")
+    
+    def send_rule_alert(self, rule, value):
+        """Send an alert for a configured rule without a dedicated message"""
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        title = rule.get('title', rule['name'].replace('_', ' ').upper())
+        
+        message = (
+            f"🔴 *{title} ALERT* 🔴\n\n"
+            f"Patient: {self.user_info['name']}\n"
+            f"Value: *{value:g}*\n"
+            f"Time: {timestamp}\n\n"
+            f"❗ Condition met: {rule.get('when', rule['type'])}"
+        )
+        
+        self.send_telegram_message(message)
+        logger.info(f"Sent {rule['name']} alert: {value:g}")
+    
+    def describe_rules(self):
+        """One bullet line per active alert rule"""
+        return "\n".join(
+            f"• {evaluator.name.replace('_', ' ')}: {evaluator.rule.get('when', evaluator.rule['type'])}"
+            for evaluator in self.engine.evaluators
+        )
     
     def send_telegram_message(self, message):
-        """Send a message to the Telegram group"""
+        """Queue a message for this patient's chat"""
         try:
-            bot.send_message(
-                GROUP_CHAT_ID,
-                message,
-                parse_mode='Markdown'
-            )
+            self.outbox.enqueue(self.chat_id, message, parse_mode='Markdown')
             return True
         except Exception as e:
-            logger.error(f"Failed to send Telegram message: {e}")
+            logger.error(f"Failed to queue Telegram message: {e}")
             return False
+
+class TelegramAlertSystem:
+    def __init__(self, stream=None):
+        # With a SensorStream the engine runs in-process; otherwise it follows
+        # the web server's /api/sensor_stream push channel
+        self.stream = stream
+        self.running = False
+        self.thread = None
+        self.readings_processed = 0
+        # Alerts are queued and delivered in the background so a slow API never blocks evaluation
+        self.outbox = NotificationQueue(deliver_telegram_message)
+        user_info = {
+            "name": "Patient",
+            "age": 45,
+            "gender": "Not specified",
+            "medical_conditions": ["None specified"]
+        }
+        
+        # Attempt to load user info from file
+        try:
+            if os.path.exists('user_info.json'):
+                with open('user_info.json', 'r') as f:
+                    user_info = json.load(f)
+                logger.info("Loaded user information from file")
+        except Exception as e:
+            logger.error(f"Error loading user info: {e}")
+        
+        # Alert rules (with any per-patient overrides) compiled into incremental evaluators
+        self.rule_set = RuleSet.load(default_rules=DEFAULT_ALERT_RULES)
+        
+        # One monitor per wearable, created on its first reading; devices.json
+        # maps device IDs to patients and their care team's chat
+        self.devices = {entry['device_id']: entry for entry in load_device_config() if entry.get('device_id')}
+        self.patients = {}
+        self.default_patient = self.add_patient(DEFAULT_DEVICE_ID, user_info, GROUP_CHAT_ID)
+    
+    @property
+    def user_info(self):
+        return self.default_patient.user_info
+    
+    @property
+    def sensor_data(self):
+        return self.default_patient.sensor_data
+    
+    def add_patient(self, device_id, user_info, chat_id):
+        patient = PatientMonitor(device_id, user_info, chat_id,
+                                 self.rule_set.engine_for(user_info.get('id')), self.outbox)
+        self.patients[device_id] = patient
+        return patient
+    
+    def patient_for(self, device_id):
+        """Monitor for a device, created from devices.json on first use"""
+        patient = self.patients.get(device_id)
+        if patient is None:
+            entry = self.devices.get(device_id, {})
+            user_info = entry.get('patient') or {"name": f"Patient ({device_id})"}
+            patient = self.add_patient(device_id, user_info, entry.get('chat_id', GROUP_CHAT_ID))
+            logger.info(f"Monitoring new device {device_id} for {user_info.get('name')}")
+        return patient
+    
+    def reload_rules(self):
+        """Re-read alert_rules.json; windowed state starts afresh"""
+        self.rule_set = RuleSet.load(default_rules=DEFAULT_ALERT_RULES)
+        for patient in self.patients.values():
+            patient.engine = self.rule_set.engine_for(patient.patient_id)
+        return len(self.default_patient.engine.evaluators)
+    
+    def describe_rules(self):
+        return self.default_patient.describe_rules()
+    
+    def patient_names(self):
+        names = [self.user_info['name']]
+        names += [entry.get('patient', {}).get('name', device_id) for device_id, entry in self.devices.items()
+                  if device_id != DEFAULT_DEVICE_ID]
+        return ", ".join(names)
+    
+    def check_alerts(self):
+        self.default_patient.check_alerts()
+    
+    def send_telegram_message(self, message):
+        """Queue a message for the Telegram group"""
+        try:
+            self.outbox.enqueue(GROUP_CHAT_ID, message, parse_mode='Markdown')
+            return True
+        except Exception as e:
+            logger.error(f"Failed to queue Telegram message: {e}")
+            return False
+    
+    def save_user_info(self):
+        """Save user information to a file"""
+        try:
+            with open('user_info.json', 'w') as f:
+                json.dump(self.user_info, f, indent=4)
+            logger.info("Saved user information to file")
+        except Exception as e:
+            logger.error(f"Error saving user info: {e}")
+    
+    def get_sensor_data(self):
+        """Get the latest sensor data from Synapse AR web server"""
+        try:
+            response = requests.get(SENSOR_API_URL, timeout=5)
+            if response.status_code == 200:
+                data = response.json()
+                if 'sensor_data' in data:
+                    self.default_patient.sensor_data = data['sensor_data']
+                    logger.debug(f"Retrieved sensor data: {self.sensor_data}")
+                    return True
+            return False
+        except Exception as e:
+            logger.error(f"Error getting sensor data: {e}")
+            return False
+    
+    def process_reading(self, reading):
+        """Evaluate the alert rules of the reading's patient against it"""
+        patient = self.patient_for(reading.get('device_id', DEFAULT_DEVICE_ID))
+        patient.sensor_data = reading
+        self.readings_processed += 1
+        READINGS_PROCESSED.inc()
+        patient.check_alerts()
+    
+    def stream_readings(self):
+        """Yield readings from the web server's server-sent events stream"""
+        with requests.get(SENSOR_STREAM_URL, stream=True, timeout=(5, 60)) as response:
+            response.raise_for_status()
+            logger.info("Connected to sensor stream")
+            for line in response.iter_lines(decode_unicode=True):
+                if not self.running:
+                    return
+                if line and line.startswith("data:"):
+                    yield json.loads(line[5:])
     
     def monitoring_loop(self):
         """Main monitoring loop to check for health alerts"""
         logger.info("Starting health monitoring for Telegram alerts")
         
+        if self.stream is not None:
+            self.in_process_loop()
+            return
+        
+        retry_delay = 1
         while self.running:
             try:
-                # Get latest sensor data
+                # Every reading is pushed to us as soon as the server parses it
+                for reading in self.stream_readings():
+                    self.process_reading(reading)
+                    retry_delay = 1
+            except Exception as e:
+                if not self.running:
+                    break
+                logger.error(f"Sensor stream unavailable: {e}")
+                # Fall back to a single poll so a reading isn't missed while reconnecting
                 if self.get_sensor_data():
-                    # Debug log the received data for troubleshooting 
-                    logger.info(f"Current sensor data: {self.sensor_data}")
-                    
-                    # Check for alert conditions
                     self.check_alerts()
-                
-                # Wait before next check
-                time.sleep(10)  # Check every 10 seconds
-                
-            except Exception as e:
-                logger.error(f"Error in monitoring loop: {e}")
-                time.sleep(30)  # Wait longer after an error
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, STREAM_RECONNECT_MAX)
+    
+    def in_process_loop(self):
+        """Consume readings directly from an in-process SensorStream"""
+        with self.stream.subscribe() as subscription:
+            while self.running:
+                reading = subscription.get(timeout=1.0)
+                if reading is None:
+                    continue
+                try:
+                    self.process_reading(reading)
+                except Exception as e:
+                    logger.error(f"Error in monitoring loop: {e}")
     
     def start(self):
         """Start the monitoring thread"""
         if not self.running:
             self.running = True
+            self.outbox.start()
             self.thread = threading.Thread(target=self.monitoring_loop)
             self.thread.daemon = True
             self.thread.start()
@@ -281,13 +446,9 @@ class TelegramAlertSystem:
             # Send a startup message to the group
             startup_msg = (
                 f"🟢 *Synapse AR Health Monitor Started* 🟢\n\n"
-                f"Monitoring health data for: {self.user_info['name']}\n"
+                f"Monitoring health data for: {self.patient_names()}\n"
                 f"Alerts configured for:\n"
-                f"• High temperature (>{TEMP_HIGH_THRESHOLD}°C)\n"
-                f"• High heart rate (>{HR_HIGH_THRESHOLD} BPM)\n"
-                f"• Low heart rate (<{HR_LOW_THRESHOLD} BPM)\n"
-                f"• Low SpO2 (<{SPO2_LOW_THRESHOLD}%)\n"
-                f"• Fall detection\n\n"
+                f"{self.describe_rules()}\n\n"
                 f"Bot is now active and will send alerts when critical thresholds are exceeded."
             )
             self.send_telegram_message(startup_msg)
@@ -307,6 +468,9 @@ class TelegramAlertSystem:
             shutdown_msg = "🔴 *Synapse AR Health Monitor Stopped* 🔴\n\nHealth monitoring has been deactivated."
             self.send_telegram_message(shutdown_msg)
             
+            # Give queued alerts a chance to go out before the sender stops
+            self.outbox.stop(drain_timeout=5.0)
+            
             return True
         return False
 
@@ -328,7 +492,8 @@ def handle_help(message):
         "/start - Start the bot\n"
         "/help - Show this help message\n"
         "/status - Check monitoring status\n"
-        "/thresholds - View alert thresholds\n"
+        "/thresholds - View alert rules\n"
+        "/reloadrules - Reload alert_rules.json\n"
         "/setname [name] - Set patient name\n"
         "/setinfo [age] [gender] - Set patient information\n"
         "/addcondition [condition] - Add medical condition\n"
@@ -354,6 +519,8 @@ def handle_status(message):
         update_time = datetime.datetime.fromtimestamp(alert_system.sensor_data['last_updated'])
         last_update = update_time.strftime("%Y-%m-%d %H:%M:%S")
     
+    queue_metrics = alert_system.outbox.get_metrics()
+    
     status_text = (
         f"*Synapse AR Monitor Status*\n\n"
         f"Monitor: {status}\n"
@@ -362,7 +529,10 @@ def handle_status(message):
         f"Current Readings:\n"
         f"• Heart Rate: {alert_system.sensor_data['heartRateAvg']} BPM\n"
         f"• SpO2: {alert_system.sensor_data['spo2Avg']}%\n"
-        f"• Temperature: {alert_system.sensor_data['temperature']:.1f}°C\n"
+        f"• Temperature: {alert_system.sensor_data['temperature']:.1f}°C\n\n"
+        f"Alert Queue: {queue_metrics['depth']} pending, "
+        f"{queue_metrics['delivered']} delivered, "
+        f"avg delivery {queue_metrics['avg_latency']:.1f}s\n"
     )
     
     bot.reply_to(message, status_text, parse_mode='Markdown')
@@ -371,14 +541,17 @@ def handle_status(message):
 def handle_thresholds(message):
     """Handle the /thresholds command"""
     thresholds_text = (
-        "*Alert Thresholds*\n\n"
-        f"• High Temperature: > {TEMP_HIGH_THRESHOLD}°C\n"
-        f"• High Heart Rate: > {HR_HIGH_THRESHOLD} BPM\n"
-        f"• Low Heart Rate: < {HR_LOW_THRESHOLD} BPM\n"
-        f"• Low SpO2: < {SPO2_LOW_THRESHOLD}%\n"
+        "*Alert Rules*\n\n"
+        f"{alert_system.describe_rules()}\n"
     )
     
-    bot.reply_to(message, thresholds_text, parse_mode='Markdown')
+    bot.reply_to(message, thresholds_text)
+
+@bot.message_handler(commands=['reloadrules'])
+def handle_reload_rules(message):
+    """Handle the /reloadrules command"""
+    count = alert_system.reload_rules()
+    bot.reply_to(message, f"Reloaded {count} alert rules.")
 
 @bot.message_handler(commands=['setname'])
 def handle_set_name(message):
@@ -505,6 +678,11 @@ if __name__ == "__main__":
     # Create and start the alert system
     alert_system = TelegramAlertSystem()
     
+    try:
+        metrics.serve(METRICS_PORT)
+    except OSError as e:
+        logger.error(f"Metrics endpoint unavailable on port {METRICS_PORT}: {e}")
+    
     # Start health monitoring
     alert_system.start()
     
@@ -196,6 +196,37 @@ def simulate_fall_detection():
         print_error(f"Error updating vital signs: {e}")
         return False
 
+def measure_fall_latency(port, timeout):
+    """Measure fall-to-dispatch latency against a local fake Telegram API"""
+    from fake_telegram import FakeTelegramServer
+    
+    server = FakeTelegramServer(port).start()
+    print_info(f"Fake Telegram API listening on port {port}.")
+    print_info(f"Run the alert system with TELEGRAM_API_URL='{server.api_url}'")
+    
+    try:
+        reset_vital_signs()
+        time.sleep(1)
+        
+        sent_at = time.time()
+        if not simulate_fall_detection():
+            return None
+        
+        message = server.wait_for_message("FALL DETECTED", timeout=timeout, after=sent_at)
+        if message is None:
+            print_error(f"No fall alert reached the fake Telegram API within {timeout} seconds.")
+            return None
+        
+        latency = message["received_at"] - sent_at
+        if latency < 1.0:
+            print_success(f"Fall alert dispatched {latency * 1000:.0f} ms after the reading.")
+        else:
+            print_warning(f"Fall alert dispatched {latency:.2f} s after the reading (target < 1 s).")
+        return latency
+    finally:
+        reset_vital_signs()
+        server.stop()
+
 def reset_vital_signs():
     """Reset vital signs to normal values"""
     print_info("Resetting vital signs to normal values...")
@@ -225,10 +256,12 @@ def reset_vital_signs():
 def parse_arguments():
     """Parse command line arguments"""
     parser = argparse.ArgumentParser(description='Test the Telegram alert system by simulating abnormal vital signs.')
-    parser.add_argument('--scenario', choices=['high_temp', 'high_hr', 'low_hr', 'low_spo2', 'fall', 'all', 'reset'], 
+    parser.add_argument('--scenario', choices=['high_temp', 'high_hr', 'low_hr', 'low_spo2', 'fall', 'all', 'reset', 'latency'], 
                        help='The scenario to simulate')
     parser.add_argument('--delay', type=int, default=60, 
                        help='Delay in seconds between scenarios when running "all" (default: 60)')
+    parser.add_argument('--fake-telegram-port', type=int, default=8082,
+                       help='Port for the fake Telegram API used by the "latency" scenario (default: 8082)')
     
     return parser.parse_args()
 
@@ -261,6 +294,8 @@ def main():
         simulate_fall_detection()
     elif args.scenario == 'reset':
         reset_vital_signs()
+    elif args.scenario == 'latency':
+        measure_fall_latency(args.fake_telegram_port, timeout=30)
     elif args.scenario == 'all' or args.scenario is None:
         # If no scenario is specified or 'all' is selected, run all scenarios
         if args.scenario is None:
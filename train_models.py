@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Trains the risk models behind /api/predict in one run.
+
+    python train_models.py                            # every model, one worker per core
+    python train_models.py cardiac anxiety --jobs 4
+    python train_models.py --data anxiety="~/data/Testing Data.xlsx"
+    python train_models.py --refresh                  # re-parse the datasets
+
+Parsing the CSV/XLSX files (pandas, and openpyxl for Excel) is the slow part
+of a small model's training, so each dataset is parsed once, turned into its
+feature schema's float32 matrix and cached in .train_cache/ as .npz. The cache
+is keyed by the file's SHA-256 and the schema's version and columns, so a
+changed dataset or schema is re-parsed automatically.
+
+All models' grid searches share one process pool of --jobs workers. Each
+(model, fold) preprocessing step and each (model, candidate, fold) fit is one
+task, so a model with a small grid never holds cores while a larger one
+queues, and forests are built single-threaded to stay within the budget.
+Preprocessing (scaling, imputation, SMOTE) does not depend on the candidate,
+so it is fitted once per fold and shared by every candidate, where
+GridSearchCV would refit it for each. The best candidate of each model is
+refitted on the training split, scored on the held-out split and written as
+models/<name>.bundle (see model_bundle.py); a running web server swaps it in.
+
+The time spent in each stage is printed per model and saved with the scores
+in models/training_report.json.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from feature_schema import HYPERTENSION_SCHEMA, CARDIAC_SCHEMA, ANXIETY_SCHEMA
+from model_bundle import MODEL_DIR, bundle_path, save_bundle
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = '.train_cache'
+CACHE_FORMAT = 1                 # Bump when a loader changes what it extracts from its dataset
+REPORT_FILE = 'training_report.json'
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+
+
+def _load_hypertension(path):
+    import pandas as pd
+
+    data = pd.read_csv(path)
+    data = data[HYPERTENSION_SCHEMA.columns + ['Risk']].dropna()
+    return data.to_dict('records'), data['Risk'].to_numpy()
+
+
+def _load_cardiac(path):
+    import pandas as pd
+
+    # Only the columns the schema reads (Blood Pressure becomes Systolic/Diastolic BP)
+    inputs = ['Age', 'Sex', 'Heart Rate', 'Diabetes', 'Smoking', 'Obesity', 'Alcohol Consumption', 'BMI']
+    data = pd.read_csv(path, usecols=inputs + ['Blood Pressure', 'Heart Attack Risk'])
+    pressure = data['Blood Pressure'].str.split('/', expand=True).astype(float)
+    data['Systolic BP'] = pressure[0]
+    data['Diastolic BP'] = pressure[1]
+    data = data.drop(columns=['Blood Pressure']).dropna()
+    return data.to_dict('records'), data['Heart Attack Risk'].to_numpy()
+
+
+def _load_anxiety(path):
+    import pandas as pd
+
+    # Missing inputs stay NaN for the imputer; rows without a diagnosis can't be used
+    data = pd.read_excel(path).dropna(subset=['GAD'])
+    return data.to_dict('records'), data['GAD'].to_numpy()
+
+
+def _random_forest(**params):
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(random_state=RANDOM_STATE, n_jobs=1, **params)
+
+
+def _standard_scaler():
+    from sklearn.preprocessing import StandardScaler
+    return StandardScaler()
+
+
+def _mean_imputer():
+    from sklearn.impute import SimpleImputer
+    return SimpleImputer(strategy='mean')
+
+
+def _smote():
+    from imblearn.over_sampling import SMOTE
+    return SMOTE(random_state=RANDOM_STATE)
+
+
+class ModelSpec:
+    """How one model is trained: its dataset, preprocessing and hyperparameter grid"""
+
+    def __init__(self, name, schema, dataset, load, classifier, grid, preprocessors=(), resampler=None,
+                 folds=5, shuffle=False, stratify=True):
+        self.name = name
+        self.schema = schema
+        self.dataset = dataset
+        self.load = load
+        self.classifier = classifier
+        self.grid = grid
+        self.preprocessors = list(preprocessors)
+        self.resampler = resampler
+        self.folds = folds
+        self.shuffle = shuffle
+        self.stratify = stratify
+
+    def candidates(self):
+        """Every parameter combination of the grid"""
+        keys = sorted(self.grid)
+        return [dict(zip(keys, values)) for values in itertools.product(*(self.grid[key] for key in keys))]
+
+    def searched(self):
+        return len(self.candidates()) > 1
+
+
+MODELS = {spec.name: spec for spec in (
+    ModelSpec("hypertension", HYPERTENSION_SCHEMA, "Hypertension-risk-model-main.csv", _load_hypertension,
+              _random_forest, {'n_estimators': [100]}, stratify=False),
+    ModelSpec("cardiac", CARDIAC_SCHEMA, "heart_attack_prediction_dataset.csv", _load_cardiac,
+              lambda **params: _random_forest(class_weight='balanced', **params),
+              {'n_estimators': [100], 'max_depth': [10, 15], 'min_samples_split': [2, 5],
+               'min_samples_leaf': [1], 'max_features': ['sqrt']},
+              preprocessors=[_standard_scaler]),
+    ModelSpec("anxiety", ANXIETY_SCHEMA, "Testing Data.xlsx", _load_anxiety, _random_forest,
+              {'n_estimators': [100, 300], 'max_depth': [10, 20, None], 'min_samples_split': [2, 5],
+               'min_samples_leaf': [1, 2], 'bootstrap': [True]},
+              preprocessors=[_mean_imputer], resampler=_smote, shuffle=True)
+)}
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_dataset(spec, path, cache_dir=CACHE_DIR, refresh=False):
+    """(X, y, cached) for a model's dataset, from the cache when the file and schema are unchanged"""
+    key = hashlib.sha256(json.dumps([CACHE_FORMAT, _sha256(path), spec.schema.name, spec.schema.version,
+                                     spec.schema.columns]).encode('utf-8')).hexdigest()[:16]
+    cache_path = os.path.join(cache_dir, f"{spec.name}-{key}.npz")
+    if not refresh and os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            return cached['X'], cached['y'], True
+
+    records, y = spec.load(path)
+    X = spec.schema.matrix(records)
+    os.makedirs(cache_dir, exist_ok=True)
+    temporary = f"{cache_path}.{os.getpid()}.tmp.npz"
+    np.savez(temporary, X=X, y=y)
+    os.replace(temporary, cache_path)
+    # Older entries for this model are for a previous file or schema
+    for name in os.listdir(cache_dir):
+        if name.startswith(spec.name + '-') and name.endswith('.npz') and name != os.path.basename(cache_path):
+            os.remove(os.path.join(cache_dir, name))
+    return X, y, False
+
+
+def _preprocess(spec, X_fit, y_fit, X_other):
+    """Fit the model's preprocessors (and resampler) on one split and apply them to the other"""
+    preprocessors = [factory() for factory in spec.preprocessors]
+    for preprocessor in preprocessors:
+        X_fit = preprocessor.fit_transform(X_fit, y_fit)
+        X_other = preprocessor.transform(X_other)
+    if spec.resampler is not None:
+        # Only the data a model learns from is resampled, never the data it is scored on
+        X_fit, y_fit = spec.resampler().fit_resample(X_fit, y_fit)
+    return preprocessors, X_fit, y_fit, X_other
+
+
+# Pool tasks: module-level so they pickle by name; each returns its own duration
+
+def _prepare_fold(name, X_fit, y_fit, X_score):
+    start = time.perf_counter()
+    _, X_fit, y_fit, X_score = _preprocess(MODELS[name], X_fit, y_fit, X_score)
+    return (X_fit, y_fit, X_score), time.perf_counter() - start
+
+
+def _score_candidate(name, params, fold, y_score):
+    from sklearn.metrics import accuracy_score
+
+    start = time.perf_counter()
+    X_fit, y_fit, X_score = fold
+    model = MODELS[name].classifier(**params).fit(X_fit, y_fit)
+    return accuracy_score(y_score, model.predict(X_score)), time.perf_counter() - start
+
+
+def _refit(name, params, X_train, y_train, X_test, y_test, metadata, model_dir):
+    from sklearn.metrics import accuracy_score, classification_report
+
+    spec = MODELS[name]
+    start = time.perf_counter()
+    preprocessors, X_fit, y_fit, X_test = _preprocess(spec, X_train, y_train, X_test)
+    model = spec.classifier(**params).fit(X_fit, y_fit)
+    fitted = time.perf_counter()
+    predictions = model.predict(X_test)
+    accuracy = accuracy_score(y_test, predictions)
+    header = save_bundle(bundle_path(name, model_dir), name, model, preprocessors, schema=spec.schema,
+                         metadata=dict(metadata, accuracy=accuracy))
+    return {
+        "accuracy": accuracy,
+        "report": classification_report(y_test, predictions),
+        "version": header["version"],
+        "refit_seconds": fitted - start,
+        "save_seconds": time.perf_counter() - fitted
+    }
+
+
+class Training:
+    """Progress of one model through the shared pool"""
+
+    def __init__(self, spec, X, y, dataset, cached, load_seconds):
+        from sklearn.model_selection import KFold, StratifiedKFold, train_test_split
+
+        self.spec = spec
+        self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(
+            X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y if spec.stratify else None)
+        self.candidates = spec.candidates()
+        self.splits = []
+        if spec.searched():
+            splitter = (StratifiedKFold if spec.stratify else KFold)(
+                n_splits=spec.folds, shuffle=spec.shuffle, random_state=RANDOM_STATE if spec.shuffle else None)
+            self.splits = list(splitter.split(self.X_train, self.y_train))
+        self.scores = {}
+        self.started = time.perf_counter()
+        self.timings = {"load": load_seconds, "preprocess": 0.0, "search": 0.0, "refit": 0.0, "save": 0.0}
+        self.metadata = {"dataset": os.path.basename(dataset), "rows": int(len(y)), "cached": cached}
+        self.result = None
+        self.error = None
+
+    def fold_tasks(self):
+        """(task, args) preparing each CV fold"""
+        return [(_prepare_fold, (self.spec.name, self.X_train[fit], self.y_train[fit], self.X_train[score]))
+                for fit, score in self.splits]
+
+    def candidate_tasks(self, fold_index, fold):
+        """(task, args) scoring every candidate on one prepared fold"""
+        y_score = self.y_train[self.splits[fold_index][1]]
+        return [(_score_candidate, (self.spec.name, params, fold, y_score)) for params in self.candidates]
+
+    def searched(self):
+        return len(self.scores) == len(self.candidates) * len(self.splits)
+
+    def best(self):
+        """(params, mean CV accuracy) of the best candidate; CV is skipped for a single candidate"""
+        if not self.splits:
+            return self.candidates[0], None
+        means = [np.mean([self.scores[i, fold] for fold in range(len(self.splits))])
+                 for i in range(len(self.candidates))]
+        best = int(np.argmax(means))
+        return self.candidates[best], float(means[best])
+
+    def refit_task(self, model_dir):
+        params, cv_accuracy = self.best()
+        self.metadata.update(params=params, cv_accuracy=cv_accuracy, candidates=len(self.candidates),
+                             folds=len(self.splits))
+        return (_refit, (self.spec.name, params, self.X_train, self.y_train, self.X_test, self.y_test,
+                         self.metadata, model_dir))
+
+
+def train(names, data_paths, jobs, model_dir=MODEL_DIR, cache_dir=CACHE_DIR, refresh=False):
+    """Train the named models in one process pool; returns the report"""
+    started = time.perf_counter()
+    trainings = {}
+    failed = {}
+    for name in names:
+        spec = MODELS[name]
+        path = os.path.expanduser(data_paths.get(name, spec.dataset))
+        start = time.perf_counter()
+        try:
+            X, y, cached = load_dataset(spec, path, cache_dir, refresh)
+        except Exception as e:
+            logger.error(f"Not training {name}: can't load {path}: {e}")
+            failed[name] = str(e)
+            continue
+        trainings[name] = Training(spec, X, y, path, cached, time.perf_counter() - start)
+        logger.info(f"{name}: {len(y)} rows from {path}{' (cached)' if cached else ''}, "
+                    f"{len(trainings[name].candidates)} candidates x {len(trainings[name].splits)} folds")
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = {}
+
+        def submit(training, stage, task, args, key=None):
+            pending[pool.submit(task, *args)] = (training, stage, key)
+
+        for training in trainings.values():
+            if training.splits:
+                for fold_index, (task, args) in enumerate(training.fold_tasks()):
+                    submit(training, 'preprocess', task, args, fold_index)
+            else:
+                submit(training, 'refit', *training.refit_task(model_dir))
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                training, stage, key = pending.pop(future)
+                if training.error is not None:
+                    continue
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Training {training.spec.name} failed ({stage}): {e}")
+                    training.error = f"{stage}: {e}"
+                    continue
+
+                if stage == 'preprocess':
+                    fold, seconds = result
+                    training.timings['preprocess'] += seconds
+                    for candidate, (task, args) in enumerate(training.candidate_tasks(key, fold)):
+                        submit(training, 'search', task, args, (candidate, key))
+                elif stage == 'search':
+                    score, seconds = result
+                    training.timings['search'] += seconds
+                    training.scores[key] = score
+                    if training.searched():
+                        submit(training, 'refit', *training.refit_task(model_dir))
+                else:
+                    training.result = result
+                    training.timings['refit'] = result.pop('refit_seconds')
+                    training.timings['save'] = result.pop('save_seconds')
+                    training.timings['wall'] = time.perf_counter() - training.started
+
+    report = {
+        "trained_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "jobs": jobs,
+        "wall_seconds": time.perf_counter() - started,
+        "models": {}
+    }
+    for name, training in trainings.items():
+        entry = {"metadata": training.metadata, "timings": training.timings}
+        if training.result is not None:
+            entry.update(training.result)
+        else:
+            entry["error"] = training.error
+        report["models"][name] = entry
+    for name, error in failed.items():
+        report["models"][name] = {"error": error}
+
+    os.makedirs(model_dir, exist_ok=True)
+    with open(os.path.join(model_dir, REPORT_FILE), 'w') as f:
+        json.dump({**report, "models": {name: {k: v for k, v in entry.items() if k != 'report'}
+                                        for name, entry in report["models"].items()}}, f, indent=2)
+    return report
+
+
+def print_report(report):
+    """Scores, classification reports and per-stage seconds (search is summed over workers)"""
+    for name, entry in report["models"].items():
+        if "error" in entry:
+            continue
+        metadata = entry["metadata"]
+        cv = f", CV accuracy {metadata['cv_accuracy']:.4f}" if metadata.get('cv_accuracy') is not None else ''
+        print(f"\n{name}: accuracy {entry['accuracy']:.4f}{cv}, params {metadata['params']}")
+        print(entry["report"])
+
+    print(f"{'model':<14}{'rows':>7}{'load':>8}{'prep':>8}{'search':>9}{'refit':>8}{'save':>7}{'wall':>8}  result")
+    for name, entry in report["models"].items():
+        timings = entry.get("timings", {})
+        rows = entry.get("metadata", {}).get("rows", '')
+        result = f"{name}.bundle {entry['version']}" if "version" in entry else f"FAILED: {entry['error']}"
+        columns = ''.join(f"{timings[stage]:>{width}.1f}" if stage in timings else f"{'-':>{width}}"
+                          for stage, width in (('load', 8), ('preprocess', 8), ('search', 9), ('refit', 8),
+                                               ('save', 7), ('wall', 8)))
+        print(f"{name:<14}{rows:>7}{columns}  {result}")
+    print(f"Total {report['wall_seconds']:.1f}s with {report['jobs']} workers")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Train the prediction models and write their bundles')
+    parser.add_argument('models', nargs='*', metavar='model',
+                        help=f"Models to train (default: all of {', '.join(MODELS)})")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes shared by all models (default: one per core)')
+    parser.add_argument('--data', action='append', default=[], metavar='MODEL=PATH',
+                        help='Dataset file for a model, e.g. anxiety="Testing Data.xlsx"')
+    parser.add_argument('--model-dir', default=MODEL_DIR, help='Where bundles and the report are written')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='Where parsed datasets are cached')
+    parser.add_argument('--refresh', action='store_true', help='Re-parse datasets even if cached')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    for name in args.models:
+        if name not in MODELS:
+            parser.error(f"Unknown model {name!r}; choose from {', '.join(MODELS)}")
+    data_paths = {}
+    for item in args.data:
+        name, _, path = item.partition('=')
+        if name not in MODELS or not path:
+            parser.error(f"--data expects MODEL=PATH with MODEL one of {', '.join(MODELS)}: {item!r}")
+        data_paths[name] = path
+
+    report = train(args.models or list(MODELS), data_paths, max(1, args.jobs), args.model_dir, args.cache_dir,
+                   args.refresh)
+    print_report(report)
+    return 1 if any("error" in entry for entry in report["models"].values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())